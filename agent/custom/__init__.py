@@ -1,2 +1,17 @@
-from .action import *
-from .reco import *
\ No newline at end of file
+import importlib
+
+# 按需导入：访问时才加载对应模块，避免 agent 启动时加载全部依赖
+_LAZY_EXPORTS = {
+    "ShopAction": ".action",
+    "UToolCalcRepeat": ".action",
+    "ShopRecognition": ".reco",
+    "TowerRecognition": ".reco",
+}
+
+__all__ = list(_LAZY_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _LAZY_EXPORTS:
+        return getattr(importlib.import_module(_LAZY_EXPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,5 +1,15 @@
-from .climb_tower import ShopAction
+import importlib
 
-__all__ = [
-    "ShopAction"
-]
+# 按需导入，见 custom/__init__.py
+_LAZY_EXPORTS = {
+    "ShopAction": ".climb_tower",
+    "UToolCalcRepeat": ".utool",
+}
+
+__all__ = list(_LAZY_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _LAZY_EXPORTS:
+        return getattr(importlib.import_module(_LAZY_EXPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,11 +1,19 @@
-from maa.agent.agent_server import AgentServer
 from maa.custom_action import CustomAction
 from maa.context import Context
 import json
+import logging
 import time
 
+from .frame_diff import FrameDiff
+from .frame_provider import FrameProvider
+from .recognition_dispatch import RecognitionDispatcher
+from .recognition_memo import RecognitionMemo
+from .shop_state import ShopStateClassifier
+from .timing import FlowTimer, TimedContext
+
+logger = logging.getLogger(__name__)
+
 
-@AgentServer.custom_action("shop_action")
 class ShopAction(CustomAction):
     """商店动作器"""
 
@@ -28,14 +36,45 @@ class ShopAction(CustomAction):
     FIXED_BACK_BUTTON = [50, 17, 37, 38]
 
     # 等待时间常量（秒）
-    WAIT_SHORT = 0.5
-    WAIT_SHORT = 1.0
+    WAIT_SHORT = 1.0  # 等待界面切换的超时时间
+    WAIT_POLL_INTERVAL = 0.1  # 等待界面切换时的截图间隔
+
+    # 商店状态识别顺序：(识别结果键, 节点名)，排在前面的状态优先
+    SHOP_STATE_PROBES = [
+        ("buff_reco_result", "星塔_节点_选择buff_推荐_agent"),
+        ("item_detail_result", "星塔_节点_商店_购物_格子主界面_agent"),
+        ("blank_result", "星塔_点击空白处关闭"),
+        ("shop_main_result", "星塔_节点_商店_主界面_agent"),
+        ("shop_shopping_result", "星塔_节点_商店_商店购物_agent"),
+        ("end_strengthen_result", "星塔_节点_商店_结束强化_agent"),
+        ("not_enough_money_result", "星塔_节点_商店_购物_货币不足_agent"),
+        ("strengthen_result", "星塔_节点_商店_强化_agent"),
+        ("shop_next_floor_result", "星塔_节点_商店_下一层_agent"),
+        ("final_leave_result", "星塔_节点_最终商店_离开星塔_agent"),
+        ("leave_result", "星塔_离开星塔_agent"),
+    ]
+
+    # 状态识别模式："batched" 先跑模板再合并 OCR；"sequential" 逐个节点识别
+    STATE_PROBE_MODE = "batched"
+
+    # 并发识别线程数，0 表示逐个顺序识别；可通过参数 recognition_workers 覆盖
+    RECOGNITION_WORKERS = 0
 
     def __init__(self):
         super().__init__()
         self._shop_processed = False  # 商店流程已处理标志位
         self._strengthen_processed = False  # 强化流程已处理标志位
         self._last_recognition_results = {}  # 保存识别结果，避免重复识别
+        self._state_classifier = ShopStateClassifier()
+        # 顺序识别；线程池只在流程开始时按参数创建，流程结束时关闭
+        self._dispatcher = RecognitionDispatcher()
+        self._frame_diff = FrameDiff()  # 画面变化检测，画面未变时复用识别结果
+        self._last_shop_state = None  # 上一次识别出的商店状态
+        self._last_state_flags = None  # 上一次识别时的标志位
+        self._timer = FlowTimer()  # 每轮循环的截图/识别/点击/等待耗时
+        self._frames = FrameProvider(self._timer)  # 截图共享，只在输入操作后重新截图
+        # 同一帧上重复识别同一节点时直接复用结果，有新截图即失效
+        self._memo = RecognitionMemo(self._frames)
 
     def _success_result(self) -> CustomAction.RunResult:
         """返回成功结果的辅助方法"""
@@ -59,6 +98,64 @@ class ShopAction(CustomAction):
         click_y = y + h // 2
         return click_x, click_y
 
+    def _wait_until(self, context, predicate=None, reference=None, timeout=None):
+        """等待界面切换完成，代替固定时长的 sleep
+
+        按 WAIT_POLL_INTERVAL 轮询截图，最多等待 timeout 秒。传入 predicate 时
+        只在命中后返回，画面稳定但目标还没出现时继续等待；不传时等画面相对
+        reference 发生变化并重新稳定后返回。
+        下一帧在判断当前帧时已在后台截取，截图耗时不再叠加在轮询间隔上。
+
+        Args:
+            context: 上下文对象
+            predicate: predicate(img) -> bool，命中目标状态时返回 True
+            reference: 点击前的截图，不传则以点击后的第一帧为准
+            timeout: 超时时间，默认 WAIT_SHORT
+
+        Returns:
+            最后一次截图
+        """
+        if timeout is None:
+            timeout = self.WAIT_SHORT
+        # 画面稳定不代表目标已经出现（例如按钮在动画结束后才显示）
+        settle = predicate is None
+        deadline = time.time() + timeout
+
+        frame_diff = FrameDiff()
+        has_baseline = reference is not None
+        if has_baseline:
+            frame_diff.changed(reference)
+
+        img = None
+        transitioned = False
+        # 截图在后台进行，与轮询间隔重叠
+        self._frames.prefetch(context, self.WAIT_POLL_INTERVAL)
+        while True:
+            img = self._frames.capture(context)
+            # 判断这一帧的同时截下一帧
+            self._frames.prefetch(context, self.WAIT_POLL_INTERVAL)
+
+            if predicate is not None and predicate(img):
+                break
+
+            changed = frame_diff.changed(img)
+            if not has_baseline:
+                # 没有参考帧时，点击后的第一帧作为基准
+                has_baseline = True
+            elif settle and transitioned and not changed:
+                # 画面变化后已稳定，界面切换完成
+                break
+            elif changed:
+                transitioned = True
+
+            if time.time() >= deadline:
+                if settle:
+                    logger.warning("等待界面切换超时（%.1f 秒）", timeout)
+                break
+
+        self._frames.cancel_prefetch()
+        return img
+
     def _recognize_and_click(
         self,
         context: Context,
@@ -83,7 +180,7 @@ class ShopAction(CustomAction):
         """
         # 如果没有提供截图，获取最新截图
         if img is None:
-            img = context.tasker.controller.post_screencap().wait().get()
+            img = self._frames.frame(context)
 
         # 执行识别
         reco_result = context.run_recognition(recognize_name, img)
@@ -91,28 +188,28 @@ class ShopAction(CustomAction):
         if reco_result and reco_result.hit and reco_result.best_result:
             # 获取识别到的坐标并执行点击
             box = reco_result.best_result.box
-            print(f"{success_msg}，位置: {box}")
+            logger.info("%s，位置: %s", success_msg, box)
 
             # 计算点击坐标（使用box的中心）
             click_x, click_y = self._calculate_click_coords(box)
 
             # 执行点击操作
-            result = context.tasker.controller.post_click(click_x, click_y).wait()
-            print(f"{success_msg}结果: {result}")
+            self._frames.click(context, click_x, click_y)
+            logger.info("%s，已点击 (%s, %s)", success_msg, click_x, click_y)
 
             return self._success_result()
         elif fixed_coords:
             # 如果提供了固定坐标，使用固定坐标点击
-            print(f"{failure_msg}，使用固定坐标点击")
+            logger.info("%s，使用固定坐标点击", failure_msg)
             click_x, click_y = self._calculate_click_coords(fixed_coords)
 
             # 执行点击操作
-            result = context.tasker.controller.post_click(click_x, click_y).wait()
-            print(f"{success_msg}结果: {result}")
+            self._frames.click(context, click_x, click_y)
+            logger.info("%s，已点击 (%s, %s)", success_msg, click_x, click_y)
 
             return self._success_result()
         else:
-            print(failure_msg)
+            logger.info(failure_msg)
             return self._failure_result()
 
     def run(
@@ -123,13 +220,21 @@ class ShopAction(CustomAction):
         """执行商店动作"""
 
         config = argv.custom_action_param
-        print(f"商店动作器参数: {config}")
+        logger.info("商店动作器参数: %s", config)
 
         try:
             # 重置标志位
             self._shop_processed = False
             self._strengthen_processed = False
-            print("重置标志位: _shop_processed=False, _strengthen_processed=False")
+            logger.debug(
+                "重置标志位: _shop_processed=False, _strengthen_processed=False"
+            )
+            self._last_recognition_results = {}
+            self._frame_diff.reset()
+            self._last_shop_state = None
+            self._last_state_flags = None
+            self._frames.reset()
+            self._memo.reset()
 
             # 如果 config 是字符串，尝试解析为 JSON 对象
             if isinstance(config, str):
@@ -143,17 +248,20 @@ class ShopAction(CustomAction):
                 return self._complete_shop_flow(context, argv, shop_config)
 
             # 默认返回失败
-            print(f"Unknown action type: {action_type}")
+            logger.warning("Unknown action type: %s", action_type)
             return CustomAction.RunResult(success=False)
 
         except Exception as e:
-            print(f"商店动作器错误: {e}")
+            logger.exception("商店动作器错误: %s", e)
             return CustomAction.RunResult(success=False)
 
-    def _process_grid(self, context, argv, shop_config):
-        """处理商店格子（点击、检查售罄/货币不足）"""
+    def _process_grid(self, context, argv, shop_config, img=None):
+        """处理商店格子（点击、检查售罄/货币不足）
+
+        img 为点击前的截图，用于判断界面切换是否完成
+        """
         grid_index = shop_config.get("grid_index", 1)
-        print(f"正在点击商店格子 {grid_index}")
+        logger.info("正在点击商店格子 %s", grid_index)
 
         roi = self.GRID_ROIS.get(grid_index, self.GRID_ROIS[1])
 
@@ -161,19 +269,16 @@ class ShopAction(CustomAction):
         click_x, click_y = self._calculate_click_coords(roi)
 
         # 执行点击操作
-        result = context.tasker.controller.post_click(click_x, click_y).wait()
-        print(f"点击商店格子 {grid_index} 结果: {result}")
+        self._frames.click(context, click_x, click_y)
+        logger.info("点击商店格子 %s: (%s, %s)", grid_index, click_x, click_y)
 
-        # 等待界面切换
-        time.sleep(self.WAIT_SHORT)  # 等待0.5秒，确保界面切换完成
-
-        # 获取最新截图
-        img = context.tasker.controller.post_screencap().wait().get()
+        # 等待界面切换，并使用最新截图
+        img = self._wait_until(context, reference=img)
 
         sold_out_result = context.run_recognition("星塔_节点_商店_购物_售罄_agent", img)
 
         if sold_out_result and sold_out_result.hit:
-            print(f"格子 {grid_index} 售罄，处理下一个格子")
+            logger.info("格子 %s 售罄，处理下一个格子", grid_index)
             # 售罄，直接处理下一个格子，无需关闭
             return False
 
@@ -183,36 +288,16 @@ class ShopAction(CustomAction):
         )
 
         if not_enough_result and not_enough_result.hit:
-            print(f"格子 {grid_index} 货币不足，处理下一个格子")
+            logger.info("格子 %s 货币不足，处理下一个格子", grid_index)
             # 货币不足，直接处理下一个格子，无需关闭
             return False
 
         # 检查是否进入了物品详情界面，并返回物品类型
         return self._get_item_type(context, img)
 
-    def _is_item_detail(self, context, img):
-        """检查是否进入了物品详情界面
-
-        Returns:
-            bool: 是否为物品详情界面
-        """
-        print("检查是否进入了物品详情界面")
-
-        # 1. 识别是否物品详情界面
-        item_detail_result = context.run_recognition(
-            "星塔_节点_商店_购物_格子主界面_agent", img
-        )
-
-        if item_detail_result and item_detail_result.hit:
-            print("识别到物品详情界面")
-            return True
-
-        print("未识别到物品详情界面")
-        return False
-
     def _get_item_type(self, context, img):
         """获取物品类型（buff或note）"""
-        print("识别物品类型")
+        logger.debug("识别物品类型")
 
         # 识别是否有buff相关特征
         buff_result = context.run_recognition(
@@ -220,7 +305,7 @@ class ShopAction(CustomAction):
         )
 
         if buff_result and buff_result.hit:
-            print("识别到buff特征")
+            logger.debug("识别到buff特征")
             return "buff_interface"
 
         # 识别是否有note相关文字
@@ -229,11 +314,11 @@ class ShopAction(CustomAction):
         )
 
         if note_result and note_result.hit:
-            print("识别到note特征")
+            logger.debug("识别到note特征")
             return "note_interface"
 
         # 默认返回buff_interface，因为buff更常见
-        print("未明确识别到物品类型，返回undef_type")
+        logger.debug("未明确识别到物品类型，返回undef_type")
         return "undef_type"
 
     def _check_discount(self, context, img, item_type=None):
@@ -247,31 +332,31 @@ class ShopAction(CustomAction):
         Returns:
             bool: 是否有优惠
         """
-        print(f"检查是否有优惠，物品类型: {item_type}")
+        logger.debug("检查是否有优惠，物品类型: %s", item_type)
 
         # 根据物品类型选择不同的优惠识别节点
         if item_type == "buff_interface":
             # buff使用星塔_节点_商店_购物_格子_buff优惠_agent
             discount_node = "星塔_节点_商店_购物_格子_buff优惠_agent"
-            print(f"使用buff优惠识别节点: {discount_node}")
+            logger.debug("使用buff优惠识别节点: %s", discount_node)
         else:
             # note或其他类型使用原来的优惠识别节点
             discount_node = "星塔_节点_商店_购物_格子_优惠_agent"
-            print(f"使用普通优惠识别节点: {discount_node}")
+            logger.debug("使用普通优惠识别节点: %s", discount_node)
 
         # 识别是否有优惠
         discount_result = context.run_recognition(discount_node, img)
 
         if discount_result and discount_result.hit:
-            print("识别到优惠")
+            logger.debug("识别到优惠")
             return True
 
-        print("未识别到优惠")
+        logger.debug("未识别到优惠")
         return False
 
     def _buy_item(self, context, argv, shop_config, img=None):
         """购买商品"""
-        print("正在购买商品")
+        logger.info("正在购买商品")
 
         return self._recognize_and_click(
             context=context,
@@ -283,7 +368,7 @@ class ShopAction(CustomAction):
 
     def _close_grid(self, context, argv, shop_config, img=None):
         """关闭商店格子"""
-        print("正在关闭商店格子")
+        logger.info("正在关闭商店格子")
 
         return self._recognize_and_click(
             context=context,
@@ -295,7 +380,7 @@ class ShopAction(CustomAction):
 
     def _strengthen_operation(self, context, argv, shop_config, img=None):
         """强化操作"""
-        print("正在执行强化操作")
+        logger.info("正在执行强化操作")
 
         return self._recognize_and_click(
             context=context,
@@ -307,7 +392,7 @@ class ShopAction(CustomAction):
 
     def _refresh_shop(self, context, argv, shop_config):
         """刷新商店"""
-        print("正在刷新商店")
+        logger.info("正在刷新商店")
 
         result = self._recognize_and_click(
             context=context,
@@ -319,29 +404,33 @@ class ShopAction(CustomAction):
         # 特殊处理：如果刷新操作执行了（识别到了刷新按钮），即使点击失败，也返回成功
         # 因为这可能是因为没有刷新次数了
         if result.success:
-            # 刷新后尝试识别三次星塔_节点_最终商店_无法刷新_agent
-            print("刷新后尝试识别星塔_节点_最终商店_无法刷新_agent")
+            # 刷新后在一段时间内持续识别星塔_节点_最终商店_无法刷新_agent
+            logger.info("刷新后尝试识别星塔_节点_最终商店_无法刷新_agent")
             max_attempts = 3
-            for attempt in range(max_attempts):
-                # 获取最新截图
-                img = context.tasker.controller.post_screencap().wait().get()
+            cannot_refresh_hits = []
 
-                # 识别无法刷新节点
+            def cannot_refresh(img):
                 cannot_refresh_result = context.run_recognition(
                     "星塔_节点_最终商店_无法刷新_agent", img
                 )
-
-                print(f"第 {attempt + 1} 次识别星塔_节点_最终商店_无法刷新_agent")
-
                 if cannot_refresh_result and cannot_refresh_result.hit:
-                    print("识别到无法刷新节点，返回失败结果")
-                    return self._failure_result()
-
-                # 等待一段时间后重试
-                time.sleep(self.WAIT_SHORT)
+                    cannot_refresh_hits.append(cannot_refresh_result)
+                    return True
+                return False
+
+            # 无法刷新的提示可能在刷新动画结束后才出现，画面稳定后也要继续识别，
+            # 直到识别到提示或等满 max_attempts 秒
+            self._wait_until(
+                context,
+                predicate=cannot_refresh,
+                timeout=self.WAIT_SHORT * max_attempts,
+            )
+            if cannot_refresh_hits:
+                logger.info("识别到无法刷新节点，返回失败结果")
+                return self._failure_result()
 
-            # 三次都没识别到，正常返回
-            print("未识别到无法刷新节点，正常返回")
+            # 没有识别到，正常返回
+            logger.info("未识别到无法刷新节点，正常返回")
             return result
         else:
             # 只有当根本没识别到刷新按钮时，才返回失败
@@ -349,29 +438,26 @@ class ShopAction(CustomAction):
 
     def _click_blank(self, context, argv, shop_config):
         """点击空白处关闭"""
-        print("正在点击空白处关闭")
-
-        # 使用M9A方式获取截图并识别
-        img = context.tasker.controller.post_screencap().wait().get()
+        logger.info("正在点击空白处关闭")
 
         # 执行识别，查找空白区域
         # 这里我们直接使用固定区域作为空白处，因为空白处没有明显特征
         target = self.BLANK_AREA
-        print(f"使用空白区域: {target}")
+        logger.debug("使用空白区域: %s", target)
 
         # 计算点击坐标（使用区域中心）
         click_x = target[0] + target[2] // 2
         click_y = target[1] + target[3] // 2
 
         # 执行点击操作
-        result = context.tasker.controller.post_click(click_x, click_y).wait()
-        print(f"点击空白处关闭结果: {result}")
+        self._frames.click(context, click_x, click_y)
+        logger.info("点击空白处关闭: (%s, %s)", click_x, click_y)
 
         return self._success_result()
 
     def _click_back(self, context, argv, shop_config):
         """点击返回"""
-        print("正在点击返回")
+        logger.info("正在点击返回")
 
         return self._recognize_and_click(
             context=context,
@@ -383,12 +469,21 @@ class ShopAction(CustomAction):
 
     def _complete_shop_flow(self, context, argv, shop_config):
         """完整商店流程处理"""
-        print("正在进行完整商店流程处理")
+        logger.info("正在进行完整商店流程处理")
+
+        # 耗时记录：可通过参数 timing_log 指定 JSON Lines 输出文件
+        self._timer.reset(shop_config.get("timing_log"))
+        context = self._memo.wrap(TimedContext(context, self._timer))
 
         try:
             # 获取商店类型
             shop_type = shop_config.get("shop_type", "regular")
-            print(f"商店类型: {shop_type}")
+            logger.info("商店类型: %s", shop_type)
+
+            # 配置并发识别
+            workers = shop_config.get("recognition_workers", self.RECOGNITION_WORKERS)
+            self._dispatcher.configure(workers)
+            logger.info("并发识别线程数: %s", workers)
 
             # 初始化可购买格子列表，只在一次流程中初始化一次
             available_grids = None
@@ -399,33 +494,51 @@ class ShopAction(CustomAction):
             iteration = 0
             consecutive_complete_count = 0  # 连续未识别到状态的次数
             max_consecutive_complete = 3  # 最大连续未识别到状态次数
+            judged_frame = None  # 上一轮判断状态所用截图的编号
 
             while (time.time() - start_time) < timeout_seconds:
                 iteration += 1
-                print(
-                    f"商店流程循环第 {iteration} 次，已运行 {time.time() - start_time:.2f} 秒"
+                self._timer.begin_iteration(iteration)
+                logger.info(
+                    "商店流程循环第 %s 次，已运行 %.2f 秒",
+                    iteration,
+                    time.time() - start_time,
                 )
 
-                # 获取最新截图
-                img = context.tasker.controller.post_screencap().wait().get()
+                # 获取最新截图：上一轮点击后等待时截到的画面可以直接用；
+                # 上一轮既没有输入也没有新截图时（例如没找到按钮），必须重新截图，
+                # 否则会一直判断同一张旧图
+                waiting = self._frames.frame_generation == judged_frame
+                if waiting:
+                    img = self._frames.capture(context)
+                    # 上一轮没有输入，画面多半还在过渡：判断这一帧的同时在后台截下一帧，
+                    # 这一轮仍没有输入时下一轮直接使用；有点击时预取会被取消
+                    self._frames.prefetch(context)
+                else:
+                    img = self._frames.frame(context)
+                judged_frame = self._frames.frame_generation
 
                 # 识别当前界面状态
                 current_state = self._get_shop_state(context, img)
-                print(f"当前商店状态: {current_state}")
+                self._timer.set_state(current_state)
+                logger.info("当前商店状态: %s", current_state)
 
                 # 检查是否连续未识别到状态
                 if current_state == "shop_flow_complete":
                     consecutive_complete_count += 1
-                    print(
-                        f"连续未识别到状态次数: {consecutive_complete_count}/{max_consecutive_complete}"
+                    logger.info(
+                        "连续未识别到状态次数: %s/%s",
+                        consecutive_complete_count,
+                        max_consecutive_complete,
                     )
                     if consecutive_complete_count >= max_consecutive_complete:
-                        print(
-                            f"连续 {max_consecutive_complete} 次未识别到状态，结束流程"
+                        logger.info(
+                            "连续 %s 次未识别到状态，结束流程", max_consecutive_complete
                         )
                         return self._success_result()
-                    # 等待一段时间后重试
-                    time.sleep(self.WAIT_SHORT)
+                    # 等待一段时间后重试，重试时需要新的截图
+                    self._timer.sleep(self.WAIT_SHORT)
+                    self._frames.invalidate()
                     continue
                 else:
                     # 识别到有效状态，重置连续未识别计数
@@ -475,11 +588,11 @@ class ShopAction(CustomAction):
 
                 elif current_state == "shop_main_processed":
                     # 处理已处理过的商店主界面状态
-                    print("处理已处理过的商店主界面，执行返回操作")
+                    logger.info("处理已处理过的商店主界面，执行返回操作")
                     # 执行返回操作
                     self._click_back(context, argv, shop_config)
                     # 等待返回完成
-                    time.sleep(self.WAIT_SHORT)
+                    self._wait_until(context, reference=img)
                     continue
 
                 elif current_state == "strengthen_process":
@@ -491,14 +604,14 @@ class ShopAction(CustomAction):
 
                 elif current_state == "end_strengthen":
                     # 处理结束强化状态
-                    print("识别到结束强化，设置_strengthen_processed=True")
+                    logger.info("识别到结束强化，设置_strengthen_processed=True")
                     # 设置强化已处理标志
                     self._strengthen_processed = True
                     continue
 
                 elif current_state == "shop_next_floor":
                     # 处理下一层状态
-                    print("识别到下一层按钮，执行点击操作")
+                    logger.info("识别到下一层按钮，执行点击操作")
                     # 使用之前保存的下一层按钮识别结果
                     next_floor_result = self._last_recognition_results.get(
                         "shop_next_floor_result"
@@ -510,21 +623,19 @@ class ShopAction(CustomAction):
                     ):
                         # 获取识别到的坐标并执行点击
                         box = next_floor_result.best_result.box
-                        print(f"识别到下一层按钮，位置: {box}")
+                        logger.info("识别到下一层按钮，位置: %s", box)
                         # 计算点击坐标
                         click_x, click_y = self._calculate_click_coords(box)
                         # 执行点击操作
-                        result = context.tasker.controller.post_click(
-                            click_x, click_y
-                        ).wait()
-                        print(f"点击下一层按钮结果: {result}")
+                        self._frames.click(context, click_x, click_y)
+                        logger.info("点击下一层按钮: (%s, %s)", click_x, click_y)
                     # 等待界面切换
-                    time.sleep(self.WAIT_SHORT)
+                    self._wait_until(context, reference=img)
                     continue
 
                 elif current_state == "final_shop_leave":
                     # 处理最终商店离开星塔状态
-                    print("识别到最终商店离开星塔按钮，执行点击操作")
+                    logger.info("识别到最终商店离开星塔按钮，执行点击操作")
                     # 使用之前保存的最终商店离开星塔按钮识别结果
                     final_leave_result = self._last_recognition_results.get(
                         "final_leave_result"
@@ -536,41 +647,39 @@ class ShopAction(CustomAction):
                     ):
                         # 获取识别到的坐标并执行点击
                         box = final_leave_result.best_result.box
-                        print(f"识别到最终商店离开星塔按钮，位置: {box}")
+                        logger.info("识别到最终商店离开星塔按钮，位置: %s", box)
                         # 计算点击坐标
                         click_x, click_y = self._calculate_click_coords(box)
                         # 执行点击操作
-                        result = context.tasker.controller.post_click(
-                            click_x, click_y
-                        ).wait()
-                        print(f"点击最终商店离开星塔按钮结果: {result}")
+                        self._frames.click(context, click_x, click_y)
+                        logger.info(
+                            "点击最终商店离开星塔按钮: (%s, %s)", click_x, click_y
+                        )
                     # 等待界面切换
-                    time.sleep(self.WAIT_SHORT)
+                    self._wait_until(context, reference=img)
                     continue
 
                 elif current_state == "leave_tower":
                     # 处理离开星塔状态
-                    print("识别到离开星塔按钮，执行点击操作")
+                    logger.info("识别到离开星塔按钮，执行点击操作")
                     # 使用之前保存的离开星塔按钮识别结果
                     leave_result = self._last_recognition_results.get("leave_result")
                     if leave_result and leave_result.hit and leave_result.best_result:
                         # 获取识别到的坐标并执行点击
                         box = leave_result.best_result.box
-                        print(f"识别到离开星塔按钮，位置: {box}")
+                        logger.info("识别到离开星塔按钮，位置: %s", box)
                         # 计算点击坐标
                         click_x, click_y = self._calculate_click_coords(box)
                         # 执行点击操作
-                        result = context.tasker.controller.post_click(
-                            click_x, click_y
-                        ).wait()
-                        print(f"点击离开星塔按钮结果: {result}")
+                        self._frames.click(context, click_x, click_y)
+                        logger.info("点击离开星塔按钮: (%s, %s)", click_x, click_y)
                     # 等待界面切换
-                    time.sleep(self.WAIT_SHORT)
+                    self._wait_until(context, reference=img)
                     continue
 
                 elif current_state == "not_enough_money_set_strengthen_processed":
                     # 处理货币不足设置强化已处理状态
-                    print("识别到货币不足节点，设置_strengthen_processed=True")
+                    logger.info("识别到货币不足节点，设置_strengthen_processed=True")
                     self._strengthen_processed = True
                     continue
 
@@ -601,18 +710,24 @@ class ShopAction(CustomAction):
                         break
                     continue
         except Exception as e:
-            print(f"处理完整商店流程时发生错误: {e}")
-            import traceback
-
-            traceback.print_exc()
+            logger.exception("处理完整商店流程时发生错误: %s", e)
             return self._failure_result()
+        finally:
+            self._frames.cancel_prefetch()
+            self._dispatcher.shutdown()
+            self._frames.inputs.settle()
+            self._timer.end_iteration()
+            logger.info("商店流程截图统计: %s", self._frames.summary())
+            logger.info("商店流程输入统计: %s", self._frames.inputs.summary())
+            logger.info("商店流程识别缓存: %s", self._memo.summary())
+            self._timer.print_summary()
 
         # 流程正常结束
         return self._success_result()
 
     def _handle_shop_shopping_state(self, context, img) -> bool:
         """处理商店购物状态"""
-        print("使用之前保存的商店购物按钮识别结果")
+        logger.debug("使用之前保存的商店购物按钮识别结果")
         shop_shopping_result = self._last_recognition_results.get(
             "shop_shopping_result"
         )
@@ -624,47 +739,47 @@ class ShopAction(CustomAction):
         ):
             # 获取识别到的坐标并执行点击
             box = shop_shopping_result.best_result.box
-            print(f"识别到商店购物按钮，位置: {box}")
+            logger.info("识别到商店购物按钮，位置: %s", box)
 
             # 计算点击坐标
             click_x, click_y = self._calculate_click_coords(box)
 
             # 执行点击操作
-            result = context.tasker.controller.post_click(click_x, click_y).wait()
-            print(f"成功点击商店购物按钮")
+            self._frames.click(context, click_x, click_y)
+            logger.info("成功点击商店购物按钮")
 
             # 等待界面切换
-            time.sleep(self.WAIT_SHORT)  # 等待0.5秒，确保界面切换完成
+            self._wait_until(context, reference=img)
         else:
-            print("未识别到商店购物按钮，可能已经进入商店主界面")
+            logger.info("未识别到商店购物按钮，可能已经进入商店主界面")
 
         # 继续循环
         return True
 
     def _handle_blank_close_state(self, context, img) -> bool:
         """处理空白处关闭状态"""
-        print("使用之前保存的空白处关闭识别结果")
+        logger.debug("使用之前保存的空白处关闭识别结果")
         blank_result = self._last_recognition_results.get("blank_result")
         if blank_result and blank_result.hit and blank_result.best_result:
             box = blank_result.best_result.box
-            print(f"识别到点击空白处关闭按钮，位置: {box}")
+            logger.info("识别到点击空白处关闭按钮，位置: %s", box)
 
             # 计算点击坐标
             click_x, click_y = self._calculate_click_coords(box)
 
             # 执行点击操作
-            result = context.tasker.controller.post_click(click_x, click_y).wait()
-            print(f"成功点击空白处关闭按钮")
+            self._frames.click(context, click_x, click_y)
+            logger.info("成功点击空白处关闭按钮")
 
             # 等待界面切换
-            time.sleep(self.WAIT_SHORT)  # 等待0.5秒，确保界面切换完成
+            self._wait_until(context, reference=img)
 
         # 继续循环
         return True
 
     def _handle_item_main_state(self, context, argv, shop_config) -> bool:
         """处理物品主界面状态"""
-        print("关闭物品主界面")
+        logger.info("关闭物品主界面")
         self._close_grid(context, argv, shop_config)
 
         # 继续循环
@@ -672,12 +787,12 @@ class ShopAction(CustomAction):
 
     def _handle_buff_main_state(self, context, argv, shop_config) -> bool:
         """处理buff选择状态"""
-        print("进入buff选择流程")
+        logger.info("进入buff选择流程")
         buff_result = self._select_buff(context, argv, shop_config)
         if not buff_result.success:
-            print("buff选择失败")
+            logger.warning("buff选择失败")
         else:
-            print("buff选择成功")
+            logger.info("buff选择成功")
 
         # 继续循环
         return True
@@ -695,20 +810,22 @@ class ShopAction(CustomAction):
         if available_grids is None:
             # 识别可购买的格子，只获取一次
             available_grids = self._get_available_grids(context, img)
-            print(f"初始可购买格子列表: {available_grids}")
+            logger.info("初始可购买格子列表: %s", available_grids)
 
         if available_grids:
             # 还有可购买的格子，处理第一个
             grid_index = available_grids[0]
-            print(f"处理格子: {grid_index}")
+            logger.info("处理格子: %s", grid_index)
 
             # 处理格子
-            click_result = self._process_grid(context, argv, {"grid_index": grid_index})
+            click_result = self._process_grid(
+                context, argv, {"grid_index": grid_index}, img
+            )
 
             # 根据_process_grid的返回值处理格子
             if click_result is False:
                 # 格子售罄或货币不足，从列表中移除该格子
-                print(f"格子 {grid_index} 售罄或货币不足，从列表中移除")
+                logger.info("格子 %s 售罄或货币不足，从列表中移除", grid_index)
                 available_grids.pop(0)
                 # 继续循环，处理下一个格子
                 return True, available_grids
@@ -718,88 +835,90 @@ class ShopAction(CustomAction):
             ]:  # 处理成功，返回物品类型
                 # 成功进入物品详情界面，处理购买逻辑
                 item_type = click_result
-                print(
-                    f"成功进入格子 {grid_index} 的物品详情界面，物品类型: {item_type}"
+                logger.info(
+                    "成功进入格子 %s 的物品详情界面，物品类型: %s",
+                    grid_index,
+                    item_type,
                 )
 
                 # 获取最新截图
-                img = context.tasker.controller.post_screencap().wait().get()
+                img = self._frames.frame(context)
 
                 # 检查是否有优惠
                 has_discount = self._check_discount(context, img, item_type)
 
                 # 音符类型特殊处理：先判断是否有音符激活节点，再判断优惠
                 if item_type == "note_interface":
-                    print("处理音符类型物品")
+                    logger.info("处理音符类型物品")
                     # 判断是否有音符激活节点
                     note_activate_result = context.run_recognition(
                         "星塔_节点_商店_购物_格子_音符_激活_agent", img
                     )
                     if note_activate_result and note_activate_result.hit:
-                        print("识别到音符激活节点")
+                        logger.info("识别到音符激活节点")
                         # 再判断是否有优惠
                         if has_discount:
-                            print("识别到优惠，尝试购买商品")
+                            logger.info("识别到优惠，尝试购买商品")
                             buy_result = self._buy_item(context, argv, shop_config, img)
                             if buy_result.success:
-                                print("购买成功")
+                                logger.info("购买成功")
                             else:
-                                print("购买失败")
+                                logger.info("购买失败")
                         else:
-                            print("未识别到优惠，跳过购买")
+                            logger.info("未识别到优惠，跳过购买")
                             # 关闭格子
                             self._close_grid(context, argv, shop_config, img)
                     else:
-                        print("未识别到音符激活节点，跳过购买")
+                        logger.info("未识别到音符激活节点，跳过购买")
                         # 关闭格子
                         self._close_grid(context, argv, shop_config, img)
                 else:  # buff类型直接判断优惠
-                    print("处理buff类型物品")
+                    logger.info("处理buff类型物品")
                     # 根据优惠情况决定是否购买
                     if has_discount:
-                        print("识别到优惠，尝试购买商品")
+                        logger.info("识别到优惠，尝试购买商品")
                         buy_result = self._buy_item(context, argv, shop_config, img)
                         if buy_result.success:
-                            print("购买成功")
+                            logger.info("购买成功")
                         else:
-                            print("购买失败")
+                            logger.info("购买失败")
                     else:
-                        print("未识别到优惠，跳过购买")
+                        logger.info("未识别到优惠，跳过购买")
                         # 关闭格子
                         self._close_grid(context, argv, shop_config, img)
 
                 # 等待界面返回商店主界面
-                time.sleep(self.WAIT_SHORT)  # 等待0.5秒，确保界面切换完成
+                self._wait_until(context, reference=img)
 
                 # 格子处理完成，从列表中移除
-                print(f"格子 {grid_index} 处理完成，从列表中移除")
+                logger.info("格子 %s 处理完成，从列表中移除", grid_index)
                 available_grids.pop(0)
                 # 继续循环，处理下一个格子
                 return True, available_grids
             else:
                 # 不是以上情况，保留格子并continue
-                print(
-                    f"点击格子 {grid_index} 未成功进入物品详情界面，保留格子待下次处理"
+                logger.info(
+                    "点击格子 %s 未成功进入物品详情界面，保留格子待下次处理", grid_index
                 )
                 return True, available_grids
         else:
             # 没有可购买的格子了
-            print("所有格子处理完成，继续处理其他状态")
+            logger.info("所有格子处理完成，继续处理其他状态")
 
             # 最终商店尝试刷新
             if shop_type == "final":
-                print(f"最终商店没有可购买的格子，尝试刷新")
+                logger.info("最终商店没有可购买的格子，尝试刷新")
                 refresh_result = self._refresh_shop(context, argv, shop_config)
                 if refresh_result.success:
                     # 刷新成功，重置格子列表，重新开始处理
                     return True, None
                 else:
                     # 刷新失败，继续处理其他状态
-                    print("刷新失败，继续处理其他状态")
+                    logger.warning("刷新失败，继续处理其他状态")
 
             # 设置商店已处理标志位
             self._shop_processed = True
-            print(f"商店流程已处理，设置_shop_processed=True")
+            logger.info("商店流程已处理，设置_shop_processed=True")
 
             # 点击空白处关闭，继续处理其他状态
             self._click_blank(context, argv, shop_config)
@@ -809,7 +928,7 @@ class ShopAction(CustomAction):
     def _handle_strengthen_process_state(self, context, img) -> bool:
         """处理强化流程状态"""
         # 执行强化操作
-        print("使用之前保存的强化按钮识别结果")
+        logger.debug("使用之前保存的强化按钮识别结果")
         strengthen_result = self._last_recognition_results.get("strengthen_result")
 
         if (
@@ -819,17 +938,17 @@ class ShopAction(CustomAction):
         ):
             # 获取识别到的坐标并执行点击
             box = strengthen_result.best_result.box
-            print(f"识别到强化按钮，位置: {box}")
+            logger.info("识别到强化按钮，位置: %s", box)
 
             # 计算点击坐标
             click_x, click_y = self._calculate_click_coords(box)
 
             # 执行点击操作
-            result = context.tasker.controller.post_click(click_x, click_y).wait()
-            print(f"成功点击强化按钮")
+            self._frames.click(context, click_x, click_y)
+            logger.info("成功点击强化按钮")
 
             # 等待界面切换
-            time.sleep(self.WAIT_SHORT)  # 等待0.5秒，确保界面切换完成
+            self._wait_until(context, reference=img)
 
         # 继续循环
         return True
@@ -837,7 +956,7 @@ class ShopAction(CustomAction):
     def _handle_enter_next_state(self) -> bool:
         """处理进入下一层状态"""
         # 进入下一层
-        print("识别到进入下一层状态，结束商店流程")
+        logger.info("识别到进入下一层状态，结束商店流程")
         # 流程完成，退出循环
         return False
 
@@ -846,12 +965,12 @@ class ShopAction(CustomAction):
     ) -> bool:
         """处理物品详情界面状态"""
         # 在商品详情界面，尝试购买
-        print(f"在{current_state}，尝试购买商品")
+        logger.info("在%s，尝试购买商品", current_state)
         buy_result = self._buy_item(context, argv, shop_config)
         if buy_result.success:
-            print("购买成功")
+            logger.info("购买成功")
         else:
-            print("购买失败")
+            logger.info("购买失败")
 
         # 关闭格子
         self._close_grid(context, argv, shop_config)
@@ -863,7 +982,7 @@ class ShopAction(CustomAction):
     ) -> bool:
         """处理货币不足或售罄状态"""
         # 货币不足或售罄，关闭提示
-        print(f"遇到{current_state}，关闭提示")
+        logger.info("遇到%s，关闭提示", current_state)
         self._click_blank(context, argv, shop_config)
         # 继续循环，返回商店主界面
         return True
@@ -871,32 +990,32 @@ class ShopAction(CustomAction):
     def _handle_unknown_state(self, context, argv, shop_config, current_state) -> bool:
         """处理未知状态"""
         # 未知状态，点击空白处关闭，结束流程
-        print(f"未知状态 {current_state}，结束流程")
+        logger.warning("未知状态 %s，结束流程", current_state)
         self._click_blank(context, argv, shop_config)
         # 流程完成，退出循环
         return False
 
     def _check_buff_selection(self, context, img):
         """检查是否需要选择buff"""
-        print("检查是否需要选择buff")
+        logger.debug("检查是否需要选择buff")
 
         # 识别buff推荐图标
         buff_reco_result = context.run_recognition("星塔_节点_选择buff_推荐_agent", img)
 
         if buff_reco_result and buff_reco_result.hit:
-            print("识别到buff推荐图标，需要选择buff")
+            logger.debug("识别到buff推荐图标，需要选择buff")
             return True
 
-        print("不需要选择buff")
+        logger.debug("不需要选择buff")
         return False
 
     def _select_buff(self, context, argv, shop_config):
         """选择buff"""
-        print("正在选择buff")
+        logger.info("正在选择buff")
 
         try:
             # 获取最新截图
-            img = context.tasker.controller.post_screencap().wait().get()
+            img = self._frames.frame(context)
 
             # 识别buff推荐图标
             buff_reco_result = context.run_recognition(
@@ -910,202 +1029,255 @@ class ShopAction(CustomAction):
             ):
                 # 获取识别到的坐标并执行点击
                 box = buff_reco_result.best_result.box
-                print(f"识别到buff推荐图标，位置: {box}")
+                logger.info("识别到buff推荐图标，位置: %s", box)
 
                 # 计算点击坐标（使用box的中心）
                 click_x = box[0] + box[2] // 2
                 click_y = box[1] + box[3] // 2
 
                 # 执行点击操作
-                result = context.tasker.controller.post_click(click_x, click_y).wait()
-                print(f"成功点击buff推荐图标")
+                self._frames.click(context, click_x, click_y)
+                logger.info("成功点击buff推荐图标")
 
-                # 等待一下，然后点击"拿走"按钮
-                time.sleep(self.WAIT_SHORT)  # 等待0.5秒，确保界面切换
+                # 等待"拿走"按钮出现，然后点击
+                take_results = []
 
-                # 获取最新截图
-                img = context.tasker.controller.post_screencap().wait().get()
+                def take_visible(img):
+                    take_results.append(
+                        context.run_recognition("星塔_节点_选择buff_拿走_agent", img)
+                    )
+                    return bool(take_results[-1] and take_results[-1].hit)
+
+                img = self._wait_until(context, predicate=take_visible, reference=img)
 
                 # 识别"拿走"按钮
-                take_result = context.run_recognition(
-                    "星塔_节点_选择buff_拿走_agent", img
-                )
+                take_result = take_results[-1] if take_results else None
 
                 if take_result and take_result.hit and take_result.best_result:
                     # 获取识别到的坐标并执行点击
                     take_box = take_result.best_result.box
-                    print(f"识别到拿走按钮，位置: {take_box}")
+                    logger.info("识别到拿走按钮，位置: %s", take_box)
 
                     # 计算点击坐标（使用box的中心）
                     take_x = take_box[0] + take_box[2] // 2
                     take_y = take_box[1] + take_box[3] // 2
 
                     # 执行点击操作
-                    result = context.tasker.controller.post_click(take_x, take_y).wait()
-                    print(f"成功点击拿走按钮")
+                    self._frames.click(context, take_x, take_y)
+                    logger.info("成功点击拿走按钮")
                     return CustomAction.RunResult(success=True)
                 else:
-                    print("未识别到拿走按钮")
+                    logger.warning("未识别到拿走按钮")
                     return CustomAction.RunResult(success=False)
             else:
-                print("未识别到buff推荐图标")
+                logger.warning("未识别到buff推荐图标")
                 return CustomAction.RunResult(success=False)
 
         except Exception as e:
-            print(f"选择buff时发生错误: {e}")
-            import traceback
-
-            traceback.print_exc()
+            logger.exception("选择buff时发生错误: %s", e)
             return CustomAction.RunResult(success=False)
 
+    def _active_shop_probes(self):
+        """根据标志位筛选仍可能决定状态的识别项"""
+        skipped = set()
+        if self._shop_processed:
+            skipped.add("shop_shopping_result")
+        else:
+            # 货币不足和强化只在商店处理完后才会决定状态
+            skipped.update({"not_enough_money_result", "strengthen_result"})
+        if self._strengthen_processed:
+            skipped.update({"end_strengthen_result", "strengthen_result"})
+
+        return [
+            (key, node) for key, node in self.SHOP_STATE_PROBES if key not in skipped
+        ]
+
     def _get_shop_state(self, context, img):
         """获取商店当前状态"""
-        print("识别商店当前状态")
+        logger.debug("识别商店当前状态")
 
+        # 画面与上次实际识别的那一帧相比没有变化、标志位也没变时，识别结果必然相同，直接复用
+        flags = (self._shop_processed, self._strengthen_processed)
+        frame_changed = self._frame_diff.differs(img)
+        if (
+            not frame_changed
+            and self._last_shop_state is not None
+            and flags == self._last_state_flags
+        ):
+            logger.debug(
+                "画面未变化，复用上一次识别结果: %s（累计未变化 %s 帧）",
+                self._last_shop_state,
+                self._frame_diff.unchanged_count,
+            )
+            return self._last_shop_state
+
+        state = self._probe_shop_state(context, img)
+        self._frame_diff.remember(img)
+        self._last_shop_state = state
+        self._last_state_flags = flags
+        return state
+
+    def _probe_shop_state(self, context, img):
+        """在当前帧上执行状态识别"""
         # 清空上一次的识别结果
         self._last_recognition_results.clear()
 
+        probes = self._active_shop_probes()
+        nodes = dict(probes)
+
+        def run(node):
+            return context.run_recognition(node, img)
+
+        if self.STATE_PROBE_MODE == "batched":
+            batch = self._state_classifier.classify(
+                context, img, probes, run, self._dispatcher
+            )
+            handles = {}
+        else:
+            batch = {}
+            # 并发模式下一次性提交全部识别，顺序模式下按需执行
+            handles = {key: self._dispatcher.submit(run, node) for key, node in probes}
+
+        def probe(key):
+            # 批量结果中没有的识别项按需单独识别
+            if key in batch:
+                result = batch[key]
+            elif key in handles:
+                result = handles.pop(key).result()
+            else:
+                result = run(nodes[key])
+            self._last_recognition_results[key] = result
+            return result
+
+        state = self._decide_shop_state(probe)
+        self._dispatcher.cancel(handles.values())
+        return state
+
+    def _decide_shop_state(self, probe):
+        """按优先级顺序根据识别结果决定商店状态
+
+        Args:
+            probe: probe(result_key) 返回对应节点在当前帧上的识别结果
+
+        Returns:
+            状态名
+        """
+
+        def hit(key):
+            result = probe(key)
+            return bool(result and result.hit)
+
         # 1. 识别是否在buff选择界面
-        buff_reco_result = context.run_recognition("星塔_节点_选择buff_推荐_agent", img)
-        self._last_recognition_results["buff_reco_result"] = buff_reco_result
-        if buff_reco_result and buff_reco_result.hit:
-            print("识别到buff选择界面")
+        if hit("buff_reco_result"):
+            logger.debug("识别到buff选择界面")
             return "buff_main"
 
         # 2. 识别是否在物品详情界面
-        item_type = self._is_item_detail(context, img)
+        logger.debug("检查是否进入了物品详情界面")
+        item_type = hit("item_detail_result")
         self._last_recognition_results["item_type"] = item_type
         if item_type:
-            print(f"识别到物品详情界面，类型: {item_type}")
+            logger.debug("识别到物品详情界面，类型: %s", item_type)
             return "item_main"
+        logger.debug("未识别到物品详情界面")
 
-        blank_result = context.run_recognition("星塔_点击空白处关闭", img)
-        self._last_recognition_results["blank_result"] = blank_result
-        if blank_result and blank_result.hit:
-            print("识别到点击空白处关闭")
+        if hit("blank_result"):
+            logger.debug("识别到点击空白处关闭")
             return "blank_close"
 
         # 3. 识别是否在商店主界面
-        shop_main_result = context.run_recognition("星塔_节点_商店_主界面_agent", img)
-        self._last_recognition_results["shop_main_result"] = shop_main_result
-        if shop_main_result and shop_main_result.hit:
-            print("识别到商店主界面")
+        if hit("shop_main_result"):
+            logger.debug("识别到商店主界面")
             # 如果商店已处理，返回新的状态
             if self._shop_processed:
-                print("商店已处理，返回状态 shop_main_processed")
+                logger.debug("商店已处理，返回状态 shop_main_processed")
                 return "shop_main_processed"
             else:
                 return "shop_main"
 
         # 4. 商店进入、强化、下一层和进入下一层并列判断
         # 先识别商店购物按钮
-        shop_shopping_result = context.run_recognition(
-            "星塔_节点_商店_商店购物_agent", img
-        )
-        self._last_recognition_results["shop_shopping_result"] = shop_shopping_result
-        if (
-            shop_shopping_result
-            and shop_shopping_result.hit
-            and not self._shop_processed
-        ):
-            print("识别到商店购物按钮，且未处理过商店")
+        if not self._shop_processed and hit("shop_shopping_result"):
+            logger.debug("识别到商店购物按钮，且未处理过商店")
             return "shop_shopping"
 
         # 识别结束强化节点
-        end_strengthen_result = context.run_recognition(
-            "星塔_节点_商店_结束强化_agent", img
-        )
-        self._last_recognition_results["end_strengthen_result"] = end_strengthen_result
-        if (
-            end_strengthen_result
-            and end_strengthen_result.hit
-            and not self._strengthen_processed
-        ):
-            print("识别到结束强化节点")
+        if not self._strengthen_processed and hit("end_strengthen_result"):
+            logger.debug("识别到结束强化节点")
             return "end_strengthen"
 
         # 识别货币不足节点，返回状态（如果商店已处理）
-        not_enough_money_result = context.run_recognition(
-            "星塔_节点_商店_购物_货币不足_agent", img
-        )
-        self._last_recognition_results["not_enough_money_result"] = (
-            not_enough_money_result
-        )
-        if not_enough_money_result and not_enough_money_result.hit:
-            print("识别到货币不足节点")
-            if self._shop_processed:
-                print("商店已处理，返回状态用于设置强化已处理标志")
-                return "not_enough_money_set_strengthen_processed"
+        if self._shop_processed and hit("not_enough_money_result"):
+            logger.debug("识别到货币不足节点")
+            logger.debug("商店已处理，返回状态用于设置强化已处理标志")
+            return "not_enough_money_set_strengthen_processed"
 
         # 再识别强化按钮
-        strengthen_result = context.run_recognition("星塔_节点_商店_强化_agent", img)
-        self._last_recognition_results["strengthen_result"] = strengthen_result
         if (
-            strengthen_result
-            and strengthen_result.hit
-            and self._shop_processed
+            self._shop_processed
             and not self._strengthen_processed
+            and hit("strengthen_result")
         ):
-            print("识别到强化按钮，且商店已处理，强化未处理")
+            logger.debug("识别到强化按钮，且商店已处理，强化未处理")
             return "strengthen_process"
 
         # 识别下一层按钮
-        next_floor_result = context.run_recognition("星塔_节点_商店_下一层_agent", img)
-        self._last_recognition_results["shop_next_floor_result"] = next_floor_result
-        if next_floor_result and next_floor_result.hit:
-            print("识别到下一层按钮")
+        if hit("shop_next_floor_result"):
+            logger.debug("识别到下一层按钮")
             return "shop_next_floor"
 
         # 识别最终商店离开星塔按钮
-        final_leave_result = context.run_recognition(
-            "星塔_节点_最终商店_离开星塔_agent", img
-        )
-        self._last_recognition_results["final_leave_result"] = final_leave_result
-        if final_leave_result and final_leave_result.hit:
-            print("识别到最终商店离开星塔按钮")
+        if hit("final_leave_result"):
+            logger.debug("识别到最终商店离开星塔按钮")
             return "final_shop_leave"
 
         # 识别离开星塔按钮
-        leave_result = context.run_recognition("星塔_离开星塔_agent", img)
-        self._last_recognition_results["leave_result"] = leave_result
-        if leave_result and leave_result.hit:
-            print("识别到离开星塔按钮")
+        if hit("leave_result"):
+            logger.debug("识别到离开星塔按钮")
             return "leave_tower"
 
         # 其他情况返回enter_next
-        print("未识别到需要处理的状态，返回shop_flow_complete用于结束整个流程")
+        logger.debug("未识别到需要处理的状态，返回shop_flow_complete用于结束整个流程")
         return "shop_flow_complete"
 
     def _get_available_grids(self, context, img):
         """获取可购买的格子列表"""
-        print("识别可购买的格子")
-
-        # 格子坐标配置
-        grid_rois = {
-            1: [638, 159, 114, 133],
-            2: [791, 157, 114, 133],
-            3: [941, 157, 114, 133],
-            4: [1094, 162, 114, 133],
-            5: [641, 359, 114, 133],
-            6: [791, 361, 114, 133],
-            7: [943, 360, 114, 133],
-            8: [1093, 361, 114, 133],
-        }
+        logger.debug("识别可购买的格子")
+
+        # 前 4 个格子默认可购买，后 4 个格子逐个识别
+        grid_hits = self._check_grids(context, img, [5, 6, 7, 8])
 
         available_grids = []
+        for grid_index in self.GRID_ROIS:
+            if grid_hits.get(grid_index, grid_index < 5):
+                available_grids.append(grid_index)
 
-        # 遍历所有格子，识别是否可购买
-        for grid_index, roi in grid_rois.items():
-            print(f"正在识别格子 {grid_index}")
+        return available_grids
 
-            if grid_index < 5:
-                available_grids.append(grid_index)
-                continue
-            grid_main_result = context.run_recognition(
-                "星塔_节点_商店_购物_格子_判断_音符_agent",
+    def _check_grids(self, context, img, grid_indices):
+        """识别格子中的音符标记
+
+        每个格子用自己的 ROI 单独跑一次 OCR，相邻格子的文字不会互相干扰；
+        并发模式下各格子的识别同时提交。
+
+        Args:
+            context: 上下文对象
+            img: 截图
+            grid_indices: 需要识别的格子编号
+
+        Returns:
+            dict: {格子编号: 是否命中}
+        """
+        node = "星塔_节点_商店_购物_格子_判断_音符_agent"
+        rois = {grid_index: self.GRID_ROIS[grid_index] for grid_index in grid_indices}
+        logger.debug("识别格子: %s", list(rois))
+
+        def run_single(roi):
+            return context.run_recognition(
+                node,
                 img,
                 pipeline_override={
-                    "星塔_节点_商店_购物_格子_判断_音符_agent": {
+                    node: {
                         "recognition": {
                             "param": {
                                 "roi": roi,
@@ -1114,8 +1286,18 @@ class ShopAction(CustomAction):
                     }
                 },
             )
-            self._last_recognition_results["grid_main_result"] = grid_main_result
-            if grid_main_result and grid_main_result.hit:
-                available_grids.append(grid_index)
 
-        return available_grids
+        handles = {
+            grid_index: self._dispatcher.submit(run_single, roi)
+            for grid_index, roi in rois.items()
+        }
+        results = {
+            grid_index: handle.result() for grid_index, handle in handles.items()
+        }
+
+        grid_hits = {}
+        for grid_index, grid_main_result in results.items():
+            self._last_recognition_results["grid_main_result"] = grid_main_result
+            grid_hits[grid_index] = bool(grid_main_result and grid_main_result.hit)
+            logger.debug("格子 %s 识别结果: %s", grid_index, grid_hits[grid_index])
+        return grid_hits
@@ -0,0 +1,97 @@
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from .frame_rois import FrameRois
+
+# 缩略图：每 8x8 像素块取全部像素的灰度均值，不抽样，几个像素的文字变化也能反映出来
+_BLOCK = 8
+# 任意块的灰度变化超过该值即视为画面变化（0~255）
+_DEFAULT_TOLERANCE = 6.0
+
+
+def _thumbnail(img: np.ndarray, block: int) -> np.ndarray:
+    h = img.shape[0] // block * block
+    w = img.shape[1] // block * block
+    if h == 0 or w == 0:
+        gray = img[..., :3].mean(axis=2) if img.ndim == 3 else img
+        return gray.astype(np.float32)
+    if img.ndim == 3:
+        blocks = img[:h, :w, :3].reshape(h // block, block, w // block, block, -1)
+        return blocks.mean(axis=(1, 3, 4), dtype=np.float32)
+    blocks = img[:h, :w].reshape(h // block, block, w // block, block)
+    return blocks.mean(axis=(1, 3), dtype=np.float32)
+
+
+class FrameDiff:
+    """Cheap change detector over downsampled frame thumbnails.
+
+    Each frame is reduced to per-block gray means (whole frame, or only the
+    given ROIs); a frame counts as unchanged when no block moved by more than
+    tolerance.
+
+    changed() compares consecutive frames (has the screen settled?).
+    differs() compares against the frame last passed to remember() instead,
+    so a slow fade cannot creep past the tolerance one small step at a time;
+    the shop state probe is only skipped while the screen still matches the
+    frame it was classified on.
+    """
+
+    def __init__(
+        self,
+        rois: Optional[Sequence[Sequence[int]]] = None,
+        tolerance: float = _DEFAULT_TOLERANCE,
+    ):
+        self.rois = [tuple(int(v) for v in roi) for roi in rois] if rois else None
+        self.tolerance = tolerance
+        self.unchanged_count = 0
+        self._last: Optional[List[np.ndarray]] = None
+        self._reference: Optional[List[np.ndarray]] = None
+
+    def reset(self) -> None:
+        self._last = None
+        self._reference = None
+
+    def _signature(self, img) -> Optional[List[np.ndarray]]:
+        if not isinstance(img, np.ndarray) or img.size == 0:
+            return None
+        if self.rois is None:
+            return [_thumbnail(img, _BLOCK)]
+        frame = FrameRois(img)
+        signature = []
+        for roi in self.rois:
+            view = frame.view(roi)
+            if view is None:
+                return None
+            signature.append(_thumbnail(view, _BLOCK))
+        return signature
+
+    def changed(self, img) -> bool:
+        """Compare img with the previous frame and remember it.
+
+        Frames that cannot be hashed always count as changed.
+        """
+        signature = self._signature(img)
+        last, self._last = self._last, signature
+        return self._compare(signature, last)
+
+    def remember(self, img) -> None:
+        """Use img as the reference frame for differs()."""
+        self._reference = self._signature(img)
+
+    def differs(self, img) -> bool:
+        """Compare img with the reference frame from remember()."""
+        return self._compare(self._signature(img), self._reference)
+
+    def _compare(self, signature, reference) -> bool:
+        if signature is None or reference is None or len(signature) != len(reference):
+            return True
+
+        for current, previous in zip(signature, reference):
+            if current.shape != previous.shape:
+                return True
+            if float(np.abs(current - previous).max(initial=0.0)) > self.tolerance:
+                return True
+
+        self.unchanged_count += 1
+        return False
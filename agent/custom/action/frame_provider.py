@@ -0,0 +1,227 @@
+import logging
+import threading
+import time
+from typing import Any, Optional
+
+import numpy as np
+from maa.context import Context
+
+from .input_queue import InputQueue
+from .timing import FlowTimer
+
+logger = logging.getLogger(__name__)
+
+# 截图耗时估计的平滑系数
+_LATENCY_ALPHA = 0.3
+
+
+class _Prefetch:
+    """One background screenshot, taken after an optional delay."""
+
+    def __init__(
+        self,
+        context: Context,
+        input_generation: int,
+        delay: float,
+        controller_lock: threading.Lock,
+    ):
+        self.input_generation = input_generation
+        self.controller_lock = controller_lock
+        self.image = None
+        self.latency: Optional[float] = None
+        self.error: Optional[BaseException] = None
+        self._cancelled = threading.Event()
+        self._done = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, args=(context, delay), daemon=True
+        )
+        self._thread.start()
+
+    def _run(self, context: Context, delay: float) -> None:
+        try:
+            if delay > 0:
+                time.sleep(delay)
+            # 等待期间有了新的输入，这张图已经没用了，不再占用控制器
+            if not self._cancelled.is_set():
+                start = time.perf_counter()
+                with self.controller_lock:
+                    job = context.tasker.controller.post_screencap()
+                self.image = job.wait().get()
+                self.latency = time.perf_counter() - start
+        except BaseException as e:
+            self.error = e
+        finally:
+            self._done.set()
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    def result(self) -> Any:
+        self._done.wait()
+        return self.image
+
+
+class FrameProvider:
+    """Shares one screenshot between helpers until the screen may have changed.
+
+    input_generation is bumped whenever an input action is posted (or the
+    cached frame is explicitly invalidated); frame() only captures again when
+    the cached frame was taken under an older input generation. Counters
+    record real captures and captures avoided. With a timer attached,
+    screencaps and clicks are timed as well.
+
+    prefetch() takes the next screenshot in the background so the capture
+    overlaps with recognition on the current one (and with the wait before
+    it: the delay is shortened by the measured capture latency). The next
+    capture() / frame() hands it out only if no input happened since the
+    prefetch started; an input action cancels it.
+
+    The background thread and the caller only meet on the controller, and
+    every post to it (screencap or click) goes through controller_lock.
+    Recognition runs on an image passed in by the caller and never touches
+    the controller, so it may overlap a background screencap.
+
+    Clicks go through an InputQueue and are not waited for: the controller
+    runs jobs in order, so they are settled when the next screenshot
+    arrives. A failed click is only logged there; the screenshot shows the
+    unchanged screen and the flow clicks again on its next iteration.
+
+    Frames are handed out read-only: the same array is shared by every
+    helper (and memoized by identity), so writing into it raises instead
+    of silently corrupting the others.
+    """
+
+    def __init__(
+        self,
+        timer: Optional[FlowTimer] = None,
+        controller_lock: Optional[threading.Lock] = None,
+    ):
+        self.timer = timer
+        self.controller_lock = controller_lock or threading.Lock()
+        self.input_generation = 0
+        self.frame_generation = 0
+        self.captures = 0
+        self.avoided = 0
+        self.prefetched = 0
+        self.prefetch_wasted = 0
+        self.latency: Optional[float] = None
+        self.inputs = InputQueue(timer, self.controller_lock)
+        self._frame = None
+        self._frame_input_generation = -1
+        self._prefetch: Optional[_Prefetch] = None
+
+    def reset(self) -> None:
+        """Drop the cached frame and counters (start of a new run)."""
+        self._cancel_prefetch()
+        # 已取消的预取线程可能还在截图，继续使用同一把锁
+        self.__init__(self.timer, self.controller_lock)
+
+    @property
+    def fresh(self) -> bool:
+        return (
+            self._frame is not None
+            and self._frame_input_generation == self.input_generation
+        )
+
+    def frame(self, context: Context) -> Any:
+        """Latest frame, captured only if input happened since the last one."""
+        if self.fresh:
+            self.avoided += 1
+            return self._frame
+        return self.capture(context)
+
+    def prefetch(self, context: Context, ready_in: float = 0.0) -> None:
+        """Start taking the next screenshot in the background.
+
+        The capture is started so that it is done about ready_in seconds
+        from now, based on the latency of earlier captures.
+        """
+        if self._prefetch is not None:
+            if self._prefetch.input_generation == self.input_generation:
+                return
+            self._cancel_prefetch()
+        delay = max(0.0, ready_in - (self.latency or 0.0))
+        self._prefetch = _Prefetch(
+            context, self.input_generation, delay, self.controller_lock
+        )
+
+    def cancel_prefetch(self) -> None:
+        """Drop a pending prefetch that nobody is going to use."""
+        self._cancel_prefetch()
+
+    def _cancel_prefetch(self) -> None:
+        if self._prefetch is not None:
+            self._prefetch.cancel()
+            self._prefetch = None
+            self.prefetch_wasted += 1
+
+    def _take_prefetched(self) -> Any:
+        prefetch, self._prefetch = self._prefetch, None
+        if prefetch is None:
+            return None
+        if prefetch.input_generation != self.input_generation:
+            prefetch.cancel()
+            self.prefetch_wasted += 1
+            return None
+        img = prefetch.result()
+        if prefetch.latency is not None:
+            self._record_latency(prefetch.latency)
+        if img is None:
+            if prefetch.error is not None:
+                logger.warning("预取截图失败，重新截图: %s", prefetch.error)
+            return None
+        self.prefetched += 1
+        return img
+
+    def _record_latency(self, seconds: float) -> None:
+        if self.latency is None:
+            self.latency = seconds
+        else:
+            self.latency += _LATENCY_ALPHA * (seconds - self.latency)
+
+    def _screencap(self, context: Context) -> Any:
+        img = self._take_prefetched()
+        if img is None:
+            start = time.perf_counter()
+            with self.controller_lock:
+                job = context.tasker.controller.post_screencap()
+            img = job.wait().get()
+            self._record_latency(time.perf_counter() - start)
+        return img
+
+    def capture(self, context: Context) -> Any:
+        """Always take a new screenshot (polling while waiting for the UI).
+
+        A pending prefetch started after the last input is used instead.
+        """
+        if self.timer is None:
+            img = self._screencap(context)
+        else:
+            with self.timer.measure("screencap"):
+                img = self._screencap(context)
+        # 截图在之前的点击之后执行，此时点击都已完成，顺带记录失败的点击
+        self.inputs.settle()
+        if isinstance(img, np.ndarray):
+            img.flags.writeable = False
+        self.captures += 1
+        self.frame_generation += 1
+        self._frame = img
+        self._frame_input_generation = self.input_generation
+        return img
+
+    def click(self, context: Context, x: int, y: int) -> None:
+        """Post a click without waiting and mark the cached frame as stale."""
+        self._cancel_prefetch()
+        self.inputs.click(context, x, y)
+        self.invalidate()
+
+    def invalidate(self) -> None:
+        self.input_generation += 1
+        self._cancel_prefetch()
+
+    def summary(self) -> str:
+        total = self.captures + self.avoided
+        return (
+            f"截图 {self.captures} 次（其中预取 {self.prefetched} 次，"
+            f"作废预取 {self.prefetch_wasted} 次），复用 {self.avoided} 次（共请求 {total} 次）"
+        )
@@ -0,0 +1,54 @@
+from typing import Dict, Hashable, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+Roi = Tuple[int, int, int, int]
+
+
+def clip_roi(roi: Sequence[int], shape: Sequence[int]) -> Optional[Roi]:
+    """Clip an [x, y, w, h] ROI to the frame; w / h of 0 mean "to the edge".
+
+    Returns None when nothing of the ROI is left inside the frame.
+    """
+    height, width = int(shape[0]), int(shape[1])
+    x, y, w, h = (int(v) for v in roi)
+    if w <= 0:
+        w = width - x
+    if h <= 0:
+        h = height - y
+    x1, y1 = max(x, 0), max(y, 0)
+    x2, y2 = min(x + w, width), min(y + h, height)
+    if x2 <= x1 or y2 <= y1:
+        return None
+    return x1, y1, x2 - x1, y2 - y1
+
+
+class FrameRois:
+    """ROI slices of one frame, computed once and shared between helpers.
+
+    Every crop is a plain numpy view (no pixel copy); slices are cached per
+    ROI so repeated lookups within an iteration cost a dict hit.
+    """
+
+    def __init__(self, img: np.ndarray):
+        self.img = img
+        self._views: Dict[Roi, np.ndarray] = {}
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return self.img.shape
+
+    def view(self, roi: Sequence[int]) -> Optional[np.ndarray]:
+        key = tuple(int(v) for v in roi)
+        if key not in self._views:
+            clipped = clip_roi(key, self.img.shape)
+            if clipped is None:
+                return None
+            x, y, w, h = clipped
+            self._views[key] = self.img[y : y + h, x : x + w]
+        return self._views[key]
+
+    def views(
+        self, rois: Mapping[Hashable, Sequence[int]]
+    ) -> Dict[Hashable, Optional[np.ndarray]]:
+        return {key: self.view(roi) for key, roi in rois.items()}
@@ -0,0 +1,111 @@
+import logging
+import threading
+from collections import deque
+from typing import Any, Deque, Optional
+
+from maa.context import Context
+
+from .timing import FlowTimer
+
+logger = logging.getLogger(__name__)
+
+
+class _PendingInput:
+    """A posted input action; wait() tells whether the controller ran it."""
+
+    def __init__(self, seq: int, kind: str, target: Any, job: Any):
+        self.seq = seq
+        self.kind = kind
+        self.target = target
+        self._job = job
+        self._succeeded: Optional[bool] = None
+
+    @property
+    def settled(self) -> bool:
+        return self._succeeded is not None
+
+    def wait(self) -> bool:
+        if self._succeeded is None:
+            self._succeeded = bool(self._job.wait().succeeded)
+        return self._succeeded
+
+    def __repr__(self) -> str:
+        if self._succeeded is None:
+            state = "pending"
+        else:
+            state = "succeeded" if self._succeeded else "failed"
+        return f"{self.kind}#{self.seq}{self.target}({state})"
+
+
+class InputQueue:
+    """Posts input actions without waiting for the controller.
+
+    The controller runs its jobs in the order they were posted, so a
+    screenshot taken after a click always shows the click's effect and the
+    agent does not need to block on each click. Posted actions stay queued
+    (in posting order) until settle() waits for them; failures are counted
+    and logged there instead of being lost.
+
+    A failed click is not raised: the screen simply stays where it was, so
+    the caller's next recognition sees the same state and clicks again.
+    Nothing is handed back to the caller; the next screenshot is the only
+    thing that depends on a click.
+    """
+
+    def __init__(
+        self,
+        timer: Optional[FlowTimer] = None,
+        controller_lock: Optional[threading.Lock] = None,
+    ):
+        self.timer = timer
+        # 与后台截图共用，保证同一时间只有一个线程向控制器提交任务
+        self.controller_lock = controller_lock or threading.Lock()
+        self.posted = 0
+        self.failed = 0
+        self._pending: Deque[_PendingInput] = deque()
+        self._lock = threading.Lock()
+
+    def reset(self) -> None:
+        """Forget pending actions (start of a new run)."""
+        with self._lock:
+            self._pending.clear()
+            self.posted = 0
+            self.failed = 0
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def click(self, context: Context, x: int, y: int) -> None:
+        if self.timer is None:
+            with self.controller_lock:
+                job = context.tasker.controller.post_click(x, y)
+        else:
+            with self.timer.measure("click"), self.controller_lock:
+                job = context.tasker.controller.post_click(x, y)
+        with self._lock:
+            self.posted += 1
+            self._pending.append(_PendingInput(self.posted, "click", (x, y), job))
+
+    def settle(self) -> int:
+        """Wait for every pending action in order; log and count the failed ones."""
+        with self._lock:
+            pending = list(self._pending)
+            self._pending.clear()
+        if not pending:
+            return 0
+        if self.timer is None:
+            failures = [item for item in pending if not item.wait()]
+        else:
+            with self.timer.measure("click"):
+                failures = [item for item in pending if not item.wait()]
+        if failures:
+            self.failed += len(failures)
+            logger.warning(
+                "%s 执行失败，画面未变化时会在下一轮识别后重试",
+                "，".join(map(str, failures)),
+            )
+        return len(failures)
+
+    def summary(self) -> str:
+        return f"输入 {self.posted} 次，失败 {self.failed} 次"
@@ -0,0 +1,94 @@
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _Deferred:
+    """Sequential stand-in for a Future: runs the call on first result()."""
+
+    __slots__ = ("_fn", "_args", "_kwargs", "_done", "_value")
+
+    def __init__(self, fn: Callable[..., Any], args, kwargs):
+        self._fn = fn
+        self._args = args
+        self._kwargs = kwargs
+        self._done = False
+        self._value = None
+
+    def result(self) -> Any:
+        if not self._done:
+            self._value = self._fn(*self._args, **self._kwargs)
+            self._done = True
+        return self._value
+
+    def cancel(self) -> bool:
+        # 未执行的识别直接丢弃
+        if self._done:
+            return False
+        self._fn = None
+        self._done = True
+        return True
+
+
+class RecognitionDispatcher:
+    """Hands out recognition handles, optionally backed by a thread pool.
+
+    With workers <= 0 every submit() is deferred and only runs when its
+    result is read, which reproduces the plain sequential call order. With
+    workers > 0 submitted recognitions start immediately on the pool; callers
+    still read results in their own priority order, so the decision stays
+    the same and only the waiting overlaps.
+
+    Concurrent mode assumes Context.run_recognition may be called from
+    several threads at once. MaaFW does not document that guarantee, so the
+    pool is opt-in (recognition_workers), configure() warns when it is
+    enabled, and the owner must call shutdown() when its flow ends.
+    """
+
+    def __init__(self, workers: int = 0):
+        self._workers = 0
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self.configure(workers)
+
+    @property
+    def concurrent(self) -> bool:
+        return self._pool is not None
+
+    def configure(self, workers: int) -> None:
+        """(Re)size the pool; 0 falls back to sequential mode."""
+        workers = max(0, int(workers or 0))
+        if workers == self._workers:
+            return
+
+        self.shutdown()
+        self._workers = workers
+        if workers > 0:
+            logger.warning(
+                "启用 %s 个线程并发识别：假定 Context.run_recognition 可多线程同时调用，"
+                "识别结果异常时请将 recognition_workers 设为 0",
+                workers,
+            )
+            self._pool = ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix="shop_reco"
+            )
+
+    def submit(self, fn: Callable[..., Any], *args, **kwargs):
+        if self._pool is None:
+            return _Deferred(fn, args, kwargs)
+        return self._pool.submit(fn, *args, **kwargs)
+
+    @staticmethod
+    def cancel(handles) -> None:
+        """Drop handles whose result is no longer needed."""
+        for handle in handles:
+            if isinstance(handle, Future) and handle.done():
+                continue
+            handle.cancel()
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+        self._workers = 0
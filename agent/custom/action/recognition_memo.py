@@ -0,0 +1,106 @@
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+
+from .frame_provider import FrameProvider
+
+# 默认最多缓存的识别结果数
+_DEFAULT_SIZE = 64
+
+
+def _override_key(pipeline_override: Any) -> str:
+    if not pipeline_override:
+        return ""
+    try:
+        return json.dumps(pipeline_override, sort_keys=True, ensure_ascii=False)
+    except (TypeError, ValueError):
+        return repr(pipeline_override)
+
+
+class RecognitionMemo:
+    """Bounded LRU of run_recognition results for the current frame.
+
+    Entries are keyed by (node, override, frame). FrameProvider.capture
+    marks its frames read-only, so a frame is identified by object
+    identity (the entry keeps a reference, which keeps the id unique)
+    instead of hashing its pixels. Everything is dropped as soon as the
+    provider captures a new frame.
+    """
+
+    def __init__(self, frames: FrameProvider, maxsize: int = _DEFAULT_SIZE):
+        self.frames = frames
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Tuple[Any, Any]]" = OrderedDict()
+        self._generation = frames.frame_generation
+        self._lock = threading.Lock()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._generation = self.frames.frame_generation
+            self.hits = 0
+            self.misses = 0
+
+    def _sync(self) -> None:
+        # 有新截图时旧帧上的结果全部作废
+        if self._generation != self.frames.frame_generation:
+            self._entries.clear()
+            self._generation = self.frames.frame_generation
+
+    def lookup(self, key: Hashable, image: Any) -> Tuple[bool, Any]:
+        with self._lock:
+            self._sync()
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] is image:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[1]
+            self.misses += 1
+            return False, None
+
+    def store(self, key: Hashable, image: Any, result: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._sync()
+            self._entries[key] = (image, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def run(self, context, entry: str, image: Any, pipeline_override=None) -> Any:
+        key = (entry, _override_key(pipeline_override), id(image))
+        found, result = self.lookup(key, image)
+        if found:
+            return result
+        if pipeline_override:
+            result = context.run_recognition(entry, image, pipeline_override)
+        else:
+            result = context.run_recognition(entry, image)
+        self.store(key, image, result)
+        return result
+
+    def wrap(self, context) -> "MemoContext":
+        return MemoContext(context, self)
+
+    def summary(self) -> str:
+        total = self.hits + self.misses
+        rate = self.hits / total * 100 if total else 0.0
+        return f"命中 {self.hits} 次，未命中 {self.misses} 次（命中率 {rate:.1f}%）"
+
+
+class MemoContext:
+    """Context proxy answering repeated recognitions from a RecognitionMemo."""
+
+    def __init__(self, context, memo: RecognitionMemo):
+        self._context = context
+        self._memo = memo
+
+    def run_recognition(self, entry: str, image, pipeline_override=None):
+        return self._memo.run(self._context, entry, image, pipeline_override)
+
+    def __getattr__(self, name: str):
+        return getattr(self._context, name)
@@ -0,0 +1,293 @@
+import logging
+import re
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from maa.context import Context
+
+from .recognition_dispatch import RecognitionDispatcher
+
+logger = logging.getLogger(__name__)
+
+# OCR 默认阈值，与 MaaFW 一致
+_DEFAULT_OCR_THRESHOLD = 0.3
+# 批量 OCR 使用的临时节点名
+_BATCH_OCR_NODE = "星塔_商店状态_批量OCR"
+# 视为“廉价识别”的类型，会在 OCR 之前全部跑完
+_CHEAP_TYPES = {"TemplateMatch", "FeatureMatch", "ColorMatch", "DirectHit"}
+
+
+class ProbeBox(NamedTuple):
+    box: Tuple[int, int, int, int]
+    text: str
+    score: float
+
+
+class ProbeResult:
+    """Stand-in for RecognitionDetail built from a shared OCR pass.
+
+    Exposes hit / best_result.box like the real detail, so state handlers
+    can use it from _last_recognition_results unchanged. best_result follows
+    MaaFW's default order_by "Horizontal" with index 0: the leftmost match,
+    topmost among equal x.
+    """
+
+    __slots__ = ("name", "hit", "best_result", "all_results")
+
+    def __init__(self, name: str, matches: List[ProbeBox]):
+        self.name = name
+        self.all_results = matches
+        self.hit = bool(matches)
+        self.best_result = (
+            min(matches, key=lambda m: (m.box[0], m.box[1])) if matches else None
+        )
+
+    def __repr__(self) -> str:
+        return (
+            f"ProbeResult(name={self.name!r}, hit={self.hit}, "
+            f"best={self.best_result})"
+        )
+
+
+class _OcrSpec(NamedTuple):
+    roi: Tuple[int, int, int, int]
+    patterns: List["re.Pattern"]
+    threshold: float
+
+
+class _ProbeSpec(NamedTuple):
+    node: str
+    kind: str  # "cheap" / "ocr" / "opaque"
+    ocr: Optional[_OcrSpec]
+
+
+def _first_number(value: Any, default: float) -> float:
+    if isinstance(value, (list, tuple)):
+        value = value[0] if value else default
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _as_roi(value: Any) -> Optional[Tuple[int, int, int, int]]:
+    if not isinstance(value, (list, tuple)) or len(value) != 4:
+        return None
+    try:
+        x, y, w, h = (int(v) for v in value)
+    except (TypeError, ValueError):
+        return None
+    if w <= 0 or h <= 0:
+        return None
+    return x, y, w, h
+
+
+def _compile_expected(expected: Any) -> Optional[List["re.Pattern"]]:
+    if isinstance(expected, str):
+        expected = [expected]
+    if not isinstance(expected, (list, tuple)) or not expected:
+        return None
+    patterns = []
+    for item in expected:
+        try:
+            patterns.append(re.compile(str(item)))
+        except re.error:
+            patterns.append(re.compile(re.escape(str(item))))
+    return patterns
+
+
+def _parse_node(node: str, data: Optional[Dict[str, Any]]) -> _ProbeSpec:
+    """Classify a pipeline node as cheap / batchable OCR / opaque.
+
+    Only plain OCR nodes (fixed roi, expected, threshold) can share an OCR
+    pass; anything with extra behaviour (roi reference / offset, replace,
+    only_rec, custom model, non-default order_by / index) keeps its own
+    run_recognition call.
+    """
+    if not isinstance(data, dict):
+        return _ProbeSpec(node, "opaque", None)
+
+    reco = data.get("recognition")
+    if isinstance(reco, dict):
+        reco_type = reco.get("type")
+        param = reco.get("param") or {}
+    else:
+        reco_type = reco
+        param = data
+
+    if reco_type in _CHEAP_TYPES:
+        return _ProbeSpec(node, "cheap", None)
+    if reco_type != "OCR":
+        return _ProbeSpec(node, "opaque", None)
+
+    roi = _as_roi(param.get("roi"))
+    patterns = _compile_expected(param.get("expected"))
+    if (
+        roi is None
+        or patterns is None
+        or any(param.get("roi_offset") or [])
+        or param.get("replace")
+        or param.get("only_rec")
+        or param.get("model")
+        or param.get("order_by", "Horizontal") != "Horizontal"
+        or param.get("index", 0) != 0
+    ):
+        return _ProbeSpec(node, "opaque", None)
+
+    threshold = _first_number(param.get("threshold"), _DEFAULT_OCR_THRESHOLD)
+    return _ProbeSpec(node, "ocr", _OcrSpec(roi, patterns, threshold))
+
+
+def _contains_center(roi, box) -> bool:
+    x, y, w, h = box
+    cx, cy = x + w / 2, y + h / 2
+    return roi[0] <= cx < roi[0] + roi[2] and roi[1] <= cy < roi[1] + roi[3]
+
+
+def _merge_rois(
+    keys: List[str], specs: Dict[str, _OcrSpec]
+) -> List[Tuple[Any, List[str]]]:
+    """Group probes that OCR exactly the same ROI, in first-seen order.
+
+    Only identical ROIs share a call: OCR over a larger area detects and
+    splits text differently, so merged neighbours would not see the same
+    boxes as MaaFW running each node on its own ROI.
+    """
+    groups: Dict[Tuple[int, int, int, int], List[str]] = {}
+    for key in keys:
+        groups.setdefault(specs[key].roi, []).append(key)
+    return list(groups.items())
+
+
+class ShopStateClassifier:
+    """Batched evaluation of the shop state probes for one frame.
+
+    Probes are (result_key, node_name) pairs in decision order. Cheap
+    template checks run first; OCR is then only spent on probes ranked above
+    the first template hit, and plain OCR probes on the same ROI share one
+    OCR call whose text boxes are matched against each probe's expected
+    patterns in memory.
+    """
+
+    def __init__(self):
+        self._specs: Dict[str, _ProbeSpec] = {}
+
+    def _spec(self, context: Context, node: str) -> _ProbeSpec:
+        spec = self._specs.get(node)
+        if spec is None:
+            get_node_data = getattr(context, "get_node_data", None)
+            data = None
+            if get_node_data is not None:
+                try:
+                    data = get_node_data(node)
+                except Exception as e:
+                    logger.warning("读取节点 %s 配置失败，使用单独识别: %s", node, e)
+            spec = _parse_node(node, data)
+            self._specs[node] = spec
+        return spec
+
+    def classify(
+        self,
+        context: Context,
+        img,
+        probes: List[Tuple[str, str]],
+        run: Callable[[str], Any],
+        dispatcher: Optional[RecognitionDispatcher] = None,
+    ) -> Dict[str, Any]:
+        """Return {result_key: detail} for every probe that can decide the state.
+
+        run(node) performs a single recognition on the frame and is used for
+        cheap and opaque probes. With a concurrent dispatcher each phase is
+        submitted at once; results are still read in probe order.
+        """
+        dispatcher = dispatcher or RecognitionDispatcher()
+        results: Dict[str, Any] = {}
+        specs = [(key, self._spec(context, node)) for key, node in probes]
+
+        # 1. 廉价的模板识别全部先跑，找到第一个命中的位置
+        cheap = {
+            key: dispatcher.submit(run, spec.node)
+            for key, spec in specs
+            if spec.kind == "cheap"
+        }
+        cutoff = len(specs)
+        for index, (key, spec) in enumerate(specs):
+            if key not in cheap:
+                continue
+            results[key] = cheap.pop(key).result()
+            if results[key] and results[key].hit:
+                cutoff = index
+                break
+        dispatcher.cancel(cheap.values())
+
+        # 2. 只有排在第一个模板命中之前的 OCR 仍可能改变结果
+        pending = specs[:cutoff]
+        ocr_keys = [key for key, spec in pending if spec.kind == "ocr"]
+        ocr_specs = {key: spec.ocr for key, spec in pending if spec.kind == "ocr"}
+        groups = [
+            (
+                members,
+                dispatcher.submit(
+                    self._run_batch_ocr,
+                    context,
+                    img,
+                    roi,
+                    min(ocr_specs[key].threshold for key in members),
+                ),
+            )
+            for roi, members in _merge_rois(ocr_keys, ocr_specs)
+        ]
+        opaque = [
+            (key, dispatcher.submit(run, spec.node))
+            for key, spec in pending
+            if spec.kind == "opaque"
+        ]
+
+        for members, handle in groups:
+            boxes = handle.result()
+            for key in members:
+                results[key] = self._match(key, ocr_specs[key], boxes)
+        for key, handle in opaque:
+            results[key] = handle.result()
+
+        return results
+
+    def _run_batch_ocr(self, context: Context, img, roi, threshold) -> List[ProbeBox]:
+        detail = context.run_recognition(
+            _BATCH_OCR_NODE,
+            img,
+            pipeline_override={
+                _BATCH_OCR_NODE: {
+                    "recognition": "OCR",
+                    "roi": list(roi),
+                    "threshold": threshold,
+                    "action": "DoNothing",
+                }
+            },
+        )
+        if not detail:
+            return []
+
+        results = getattr(detail, "filtered_results", None)
+        if results is None:
+            results = getattr(detail, "all_results", None) or []
+
+        boxes = []
+        for item in results:
+            text = getattr(item, "text", None)
+            box = getattr(item, "box", None)
+            if not text or box is None:
+                continue
+            x, y, w, h = box
+            score = float(getattr(item, "score", 0.0) or 0.0)
+            boxes.append(ProbeBox((x, y, w, h), str(text), score))
+        return boxes
+
+    def _match(self, key: str, spec: _OcrSpec, boxes: List[ProbeBox]) -> ProbeResult:
+        matches = [
+            box
+            for box in boxes
+            if box.score >= spec.threshold
+            and _contains_center(spec.roi, box.box)
+            and any(pattern.search(box.text) for pattern in spec.patterns)
+        ]
+        return ProbeResult(key, matches)
@@ -0,0 +1,166 @@
+import json
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 环形缓冲区保留的迭代记录数
+_DEFAULT_CAPACITY = 512
+_CATEGORIES = ("screencap", "recognition", "click", "sleep")
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile; 0.0 for an empty list."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, int(round(pct / 100.0 * len(ordered) + 0.5)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class FlowTimer:
+    """Per-iteration wall-time records for the shop flow.
+
+    Every iteration collects time spent in screencap, each named
+    run_recognition, post_click and sleep. Finished records go to a ring
+    buffer and, when jsonl_path is set, are appended to a JSON-lines file.
+    summary() gives p50 / p95 per state. Safe to use from the recognition
+    thread pool.
+    """
+
+    def __init__(self, capacity: int = _DEFAULT_CAPACITY):
+        self.records: Deque[Dict[str, Any]] = deque(maxlen=capacity)
+        self.jsonl_path: Optional[str] = None
+        self._lock = threading.Lock()
+        self._current: Optional[Dict[str, Any]] = None
+        self._started = 0.0
+
+    def reset(self, jsonl_path: Optional[str] = None) -> None:
+        with self._lock:
+            self.records.clear()
+            self.jsonl_path = jsonl_path
+            self._current = None
+
+    def begin_iteration(self, iteration: int) -> None:
+        """Close the running iteration (if any) and start a new one."""
+        self.end_iteration()
+        with self._lock:
+            self._started = time.perf_counter()
+            self._current = {
+                "iteration": iteration,
+                "state": None,
+                "total": 0.0,
+                "screencap": 0.0,
+                "click": 0.0,
+                "sleep": 0.0,
+                "recognition": defaultdict(float),
+                "calls": defaultdict(int),
+            }
+
+    def set_state(self, state: str) -> None:
+        with self._lock:
+            if self._current is not None:
+                self._current["state"] = state
+
+    def end_iteration(self) -> None:
+        with self._lock:
+            record, self._current = self._current, None
+            if record is None:
+                return
+            record["total"] = time.perf_counter() - self._started
+            record["recognition"] = dict(record["recognition"])
+            record["calls"] = dict(record["calls"])
+            self.records.append(record)
+            path = self.jsonl_path
+
+        if path:
+            try:
+                with open(path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            except OSError as e:
+                logger.warning("写入耗时记录失败: %s", e)
+
+    def add(self, category: str, elapsed: float, name: Optional[str] = None) -> None:
+        with self._lock:
+            record = self._current
+            if record is None:
+                return
+            record["calls"][category] += 1
+            if category == "recognition":
+                record["recognition"][name or "?"] += elapsed
+            else:
+                record[category] += elapsed
+
+    @contextmanager
+    def measure(self, category: str, name: Optional[str] = None):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(category, time.perf_counter() - start, name)
+
+    def sleep(self, seconds: float) -> None:
+        with self.measure("sleep"):
+            time.sleep(seconds)
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """{state: {count, total/screencap/recognition/click/sleep: {p50, p95}}}"""
+        with self._lock:
+            records = list(self.records)
+
+        by_state: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for record in records:
+            by_state[record["state"] or "unknown"].append(record)
+
+        result: Dict[str, Dict[str, Any]] = {}
+        for state, items in by_state.items():
+            stats: Dict[str, Any] = {"count": len(items)}
+            columns = {
+                "total": [r["total"] for r in items],
+                "recognition": [sum(r["recognition"].values()) for r in items],
+            }
+            for category in _CATEGORIES:
+                if category != "recognition":
+                    columns[category] = [r[category] for r in items]
+            for column, values in columns.items():
+                stats[column] = {
+                    "p50": percentile(values, 50),
+                    "p95": percentile(values, 95),
+                }
+            result[state] = stats
+        return result
+
+    def print_summary(self) -> None:
+        # 统计表拼接较多，日志级别不输出 INFO 时不必计算
+        if not logger.isEnabledFor(logging.INFO):
+            return
+        summary = self.summary()
+        if not summary:
+            return
+        lines = ["商店流程耗时统计（秒，p50 / p95）:"]
+        for state, stats in summary.items():
+            parts = [
+                f"{column} {stats[column]['p50']:.3f}/{stats[column]['p95']:.3f}"
+                for column in ("total",) + _CATEGORIES
+            ]
+            lines.append(f"  {state} x{stats['count']}: " + "，".join(parts))
+        logger.info("\n".join(lines))
+
+
+class TimedContext:
+    """Context proxy that times every run_recognition by node name."""
+
+    def __init__(self, context, timer: FlowTimer):
+        self._context = context
+        self._timer = timer
+
+    def run_recognition(self, entry: str, image, *args, **kwargs):
+        with self._timer.measure("recognition", entry):
+            return self._context.run_recognition(entry, image, *args, **kwargs)
+
+    def __getattr__(self, name: str):
+        return getattr(self._context, name)
@@ -0,0 +1,185 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple, Union
+
+# 日志级别，可用环境变量覆盖，例如 SSAH_LOG_LEVEL=DEBUG
+LOG_LEVEL_ENV = "SSAH_LOG_LEVEL"
+DEFAULT_LEVEL = logging.INFO
+
+# 同一行代码在 RATE_INTERVAL 秒内最多输出 RATE_BURST 条（WARNING 以下）
+RATE_BURST = 20
+RATE_INTERVAL = 5.0
+
+# 队列满时直接丢弃，不阻塞识别线程
+QUEUE_SIZE = 10000
+
+_FORMAT = "%(asctime)s.%(msecs)03d [%(levelname)s] %(message)s"
+_DATE_FORMAT = "%H:%M:%S"
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_handler: Optional["_DeferredQueueHandler"] = None
+_setup_lock = threading.Lock()
+
+
+class RateLimitFilter(logging.Filter):
+    """Lets at most burst records per call site through every interval seconds.
+
+    A call site is the (file, line) of the logging call, so a message logged
+    every loop iteration is thinned out while other messages are not
+    affected. The first record after a throttled window says how many were
+    dropped. Records at max_level and above are never limited.
+    """
+
+    def __init__(
+        self,
+        burst: int = RATE_BURST,
+        interval: float = RATE_INTERVAL,
+        max_level: int = logging.WARNING,
+    ):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self.max_level = max_level
+        self._sites: Dict[Tuple[str, int], list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= self.max_level:
+            return True
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            site = self._sites.get(key)
+            if site is None or now - site[0] >= self.interval:
+                suppressed = site[2] if site else 0
+                self._sites[key] = [now, 1, 0]
+            elif site[1] < self.burst:
+                site[1] += 1
+                suppressed = 0
+            else:
+                site[2] += 1
+                return False
+        if suppressed and isinstance(record.msg, str):
+            record.msg = (
+                f"（此前 {self.interval:.0f} 秒内省略 {suppressed} 条）{record.msg}"
+            )
+        return True
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves formatting to the writer thread."""
+
+    def __init__(self, log_queue: "queue.Queue"):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 不在调用线程里拼接消息，识别结果摘要等参数由后台线程格式化
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class RecognitionSummary:
+    """Lazy one-line summary of a RecognitionDetail.
+
+    Only built when the record is actually written, so
+    logger.debug("识别结果: %s", summarize(detail)) costs nothing while
+    DEBUG is off.
+    """
+
+    __slots__ = ("detail",)
+
+    def __init__(self, detail: Any):
+        self.detail = detail
+
+    def __str__(self) -> str:
+        detail = self.detail
+        if detail is None:
+            return "无结果"
+        name = getattr(detail, "name", "?")
+        if not getattr(detail, "hit", False):
+            return f"{name}: 未命中"
+        best = getattr(detail, "best_result", None)
+        parts = [f"{name}: 命中"]
+        box = getattr(best, "box", None) or getattr(detail, "box", None)
+        if box is not None:
+            parts.append(f"box={list(box)}")
+        text = getattr(best, "text", None)
+        if text:
+            parts.append(f"text={text!r}")
+        score = getattr(best, "score", None)
+        if score is not None:
+            parts.append(f"score={score:.3f}")
+        results = getattr(detail, "filtered_results", None)
+        if results is not None:
+            parts.append(f"共 {len(results)} 个")
+        return " ".join(parts)
+
+    __repr__ = __str__
+
+
+def summarize(detail: Any) -> RecognitionSummary:
+    return RecognitionSummary(detail)
+
+
+def _level_of(level: Union[int, str, None]) -> int:
+    if level is None:
+        level = os.environ.get(LOG_LEVEL_ENV) or DEFAULT_LEVEL
+    if isinstance(level, str):
+        value = logging.getLevelName(level.upper())
+        return value if isinstance(value, int) else DEFAULT_LEVEL
+    return level
+
+
+def setup_logging(level: Union[int, str, None] = None, stream=None) -> None:
+    """Route all logging through a queue to a background writer thread.
+
+    Safe to call more than once; later calls only change the level.
+    """
+    global _listener, _handler
+    root = logging.getLogger()
+    root.setLevel(_level_of(level))
+    with _setup_lock:
+        if _listener is not None:
+            return
+        log_queue: "queue.Queue" = queue.Queue(QUEUE_SIZE)
+        writer = logging.StreamHandler(stream or sys.stdout)
+        writer.setFormatter(logging.Formatter(_FORMAT, _DATE_FORMAT))
+        _handler = _DeferredQueueHandler(log_queue)
+        _handler.addFilter(RateLimitFilter())
+        root.addHandler(_handler)
+        _listener = logging.handlers.QueueListener(log_queue, writer)
+        _listener.start()
+        atexit.register(shutdown_logging)
+
+
+def flush_logging() -> None:
+    """Block until the writer thread has written everything queued so far."""
+    handler = _handler
+    if handler is not None:
+        handler.queue.join()
+
+
+def shutdown_logging() -> None:
+    """Write out everything still queued and stop the writer thread."""
+    global _listener, _handler
+    with _setup_lock:
+        if _listener is None:
+            return
+        logging.getLogger().removeHandler(_handler)
+        _listener.stop()
+        if _handler.dropped:
+            print(f"日志队列已满，丢弃 {_handler.dropped} 条日志", file=sys.stderr)
+        _listener = None
+        _handler = None
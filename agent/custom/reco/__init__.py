@@ -1,5 +1,15 @@
-from .climb_tower import ShopRecognition
+import importlib
 
-__all__ = [
-    "ShopRecognition"
-]
\ No newline at end of file
+# 按需导入，见 custom/__init__.py
+_LAZY_EXPORTS = {
+    "ShopRecognition": ".climb_tower",
+    "TowerRecognition": ".tower",
+}
+
+__all__ = list(_LAZY_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _LAZY_EXPORTS:
+        return getattr(importlib.import_module(_LAZY_EXPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
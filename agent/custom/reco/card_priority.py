@@ -0,0 +1,344 @@
+import json
+import re
+import unicodedata
+from functools import lru_cache
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+# OCR 识别出的间隔号写法不统一，统一归一成 "·"
+_MIDDLE_DOTS = "·・･•‧∙⋅"
+_MIDDLE_DOT_TABLE = str.maketrans({ch: "·" for ch in _MIDDLE_DOTS})
+_WHITESPACE = re.compile(r"\s+")
+# 模糊匹配时忽略的标点，OCR 经常漏掉或多出这些字符
+_LOOSE_PUNCTUATION = re.compile(r"[·.,:;!?'\"()\[\]\-_~「」『』【】《》]")
+
+# 模糊匹配默认阈值：相似度 = 1 - 编辑距离 / 名称长度
+DEFAULT_FUZZY_THRESHOLD = 0.75
+_GRAM_SIZE = 2
+
+# 同一局内作业参数基本不变，少量缓存即可
+_INDEX_CACHE_SIZE = 8
+# 同一界面会被反复识别，缓存 token 的匹配结果
+_TOKEN_CACHE_SIZE = 1024
+
+
+def normalize_card_text(text: str) -> str:
+    """Normalize card names / OCR tokens for comparison.
+
+    NFKC folds full-width forms to half-width, every middle-dot variant becomes
+    "·" and all whitespace is dropped.
+    """
+    text = unicodedata.normalize("NFKC", str(text))
+    text = text.translate(_MIDDLE_DOT_TABLE)
+    return _WHITESPACE.sub("", text)
+
+
+def _loose_key(key: str) -> str:
+    return _LOOSE_PUNCTUATION.sub("", key)
+
+
+def _grams(text: str) -> Set[str]:
+    if len(text) < _GRAM_SIZE:
+        return {text} if text else set()
+    return {text[i : i + _GRAM_SIZE] for i in range(len(text) - _GRAM_SIZE + 1)}
+
+
+def _partial_distance(pattern: str, text: str, limit: int) -> int:
+    """Edit distance between pattern and its best-matching substring of text.
+
+    Semi-global Levenshtein: leading / trailing characters of text are free,
+    so "风魔种子Lv2" still scores 0 against "风魔种子". Returns limit + 1 as
+    soon as no alignment can stay within limit.
+    """
+    previous = [0] * (len(text) + 1)
+    for i, p_char in enumerate(pattern, 1):
+        current = [i] + [0] * len(text)
+        for j, t_char in enumerate(text, 1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (p_char != t_char),
+            )
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return min(previous)
+
+
+def parse_priority_param(param: Any) -> Dict[int, List[str]]:
+    """Normalize custom_recognition_param into {priority:int -> [targets:str]}.
+
+    Accepts dict / JSON string / bytes. Ignores invalid priority keys.
+    """
+    if param is None:
+        return {}
+
+    if isinstance(param, (bytes, bytearray)):
+        param = param.decode("utf-8", errors="replace")
+
+    if isinstance(param, str):
+        if not param.strip():
+            return {}
+        parsed = json.loads(param)
+    else:
+        parsed = param
+
+    if not isinstance(parsed, dict):
+        raise ValueError("custom_recognition_param must be a dict or JSON string")
+
+    normalized: Dict[int, List[str]] = {}
+    for key, value in parsed.items():
+        try:
+            priority = int(key)
+        except (TypeError, ValueError):
+            continue
+
+        if isinstance(value, (list, tuple)):
+            targets: Iterable[Any] = value
+        else:
+            targets = [value]
+
+        normalized[priority] = [str(item) for item in targets if str(item).strip()]
+
+    return normalized
+
+
+class PriorityEntry(NamedTuple):
+    rank: int  # 全局匹配顺序，越小优先级越高
+    priority: int
+    name: str
+    key: str  # 归一化后的名称
+    pattern: Optional["re.Pattern"]  # 名称本身是正则时才编译
+
+
+class CardMatch(NamedTuple):
+    entry: PriorityEntry
+    box: Any
+    similarity: float  # 1.0 表示精确命中
+
+
+class FuzzyCardMatcher:
+    """Score OCR tokens against every configured card name at once.
+
+    Names are indexed by character bigrams; a token only reaches the
+    edit-distance step for names that share enough bigrams to possibly clear
+    the threshold (each edit can break at most _GRAM_SIZE grams). The token
+    must also be about as long as the name (within the edit budget), so a
+    name merely mentioned inside a longer text such as a card description
+    is not picked up as a near miss.
+    """
+
+    def __init__(self, entries: List[PriorityEntry], threshold: float):
+        self.threshold = threshold
+        self._entries: List[PriorityEntry] = []
+        self._keys: List[str] = []
+        self._gram_counts: List[int] = []
+        self._limits: List[int] = []
+        self._postings: Dict[str, List[int]] = defaultdict(list)
+
+        seen: Set[str] = set()
+        for entry in entries:
+            key = _loose_key(entry.key)
+            if not key or key in seen:
+                continue
+            seen.add(key)
+
+            slot = len(self._entries)
+            grams = _grams(key)
+            self._entries.append(entry)
+            self._keys.append(key)
+            self._gram_counts.append(len(grams))
+            self._limits.append(int((1.0 - threshold) * len(key) + 1e-9))
+            for gram in grams:
+                self._postings[gram].append(slot)
+
+    def score(self, token: str) -> Optional[Tuple[PriorityEntry, float]]:
+        """Best (entry, similarity) for one token, or None below threshold."""
+        text = _loose_key(normalize_card_text(token))
+        if not text:
+            return None
+
+        shared: Dict[int, int] = defaultdict(int)
+        for gram in _grams(text):
+            for slot in self._postings.get(gram, ()):
+                shared[slot] += 1
+
+        chars = set(text)
+
+        best: Optional[Tuple[PriorityEntry, float]] = None
+        for slot, count in shared.items():
+            limit = self._limits[slot]
+            if count < self._gram_counts[slot] - _GRAM_SIZE * limit:
+                continue
+
+            key = self._keys[slot]
+            # token 与名称长度相差超过可编辑次数时不可能是这张卡的名称
+            if abs(len(text) - len(key)) > limit:
+                continue
+            # 每次编辑最多让名称里少一个字出现在 token 中
+            if sum(ch in chars for ch in key) < len(key) - limit:
+                continue
+
+            distance = _partial_distance(key, text, limit)
+            if distance > limit:
+                continue
+
+            similarity = 1.0 - distance / len(key)
+            entry = self._entries[slot]
+            if (
+                best is None
+                or similarity > best[1]
+                or (similarity == best[1] and entry.rank < best[0].rank)
+            ):
+                best = (entry, similarity)
+        return best
+
+
+def _compile_pattern(name: str) -> Optional["re.Pattern"]:
+    if re.escape(name) == name:
+        return None
+    try:
+        return re.compile(name)
+    except re.error:
+        return None
+
+
+class PriorityIndex:
+    """Precompiled view of a card-priority config.
+
+    entries keeps the legacy match order (priority desc, then config order);
+    by_key maps every normalized name to its best entry so an OCR token is
+    resolved with a single dict lookup. Tokens without an exact hit go to the
+    fuzzy matcher unless fuzzy_threshold is None.
+    """
+
+    def __init__(
+        self,
+        priority_dict: Dict[int, List[str]],
+        fuzzy_threshold: Optional[float] = DEFAULT_FUZZY_THRESHOLD,
+    ):
+        self.priority_dict = priority_dict
+        self.priorities: List[int] = sorted(priority_dict.keys(), reverse=True)
+        self.entries: List[PriorityEntry] = []
+        self.by_name: Dict[str, int] = {}
+        self.by_key: Dict[str, PriorityEntry] = {}
+        # 名称首个 n-gram -> 条目，用于在较长的 token 中查找名称子串
+        self._by_head: Dict[str, List[PriorityEntry]] = defaultdict(list)
+
+        for priority in self.priorities:
+            for name in priority_dict[priority]:
+                entry = PriorityEntry(
+                    rank=len(self.entries),
+                    priority=priority,
+                    name=name,
+                    key=normalize_card_text(name),
+                    pattern=_compile_pattern(name),
+                )
+                self.entries.append(entry)
+                self.by_name.setdefault(name, priority)
+                if entry.key:
+                    self.by_key.setdefault(entry.key, entry)
+                    self._by_head[entry.key[:_GRAM_SIZE]].append(entry)
+
+        self._pattern_entries = [e for e in self.entries if e.pattern is not None]
+        self.fuzzy: Optional[FuzzyCardMatcher] = None
+        if fuzzy_threshold is not None and fuzzy_threshold < 1.0:
+            self.fuzzy = FuzzyCardMatcher(self.entries, fuzzy_threshold)
+        self._token_cache: Dict[str, Optional[Tuple[PriorityEntry, float]]] = {}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __bool__(self) -> bool:
+        return bool(self.entries)
+
+    def lookup(self, text: str) -> Optional[PriorityEntry]:
+        """Best entry for one OCR token.
+
+        Exact normalized hits are O(1); tokens carrying extra characters
+        around the card name fall back to a substring / regex scan.
+        """
+        key = normalize_card_text(text)
+        if not key:
+            return None
+
+        entry = self.by_key.get(key)
+        if entry is not None:
+            return entry
+
+        for start in range(len(key)):
+            for size in range(1, _GRAM_SIZE + 1):
+                for candidate in self._by_head.get(key[start : start + size], ()):
+                    if entry is not None and candidate.rank >= entry.rank:
+                        continue
+                    if key.startswith(candidate.key, start):
+                        entry = candidate
+        for candidate in self._pattern_entries:
+            if entry is not None and candidate.rank >= entry.rank:
+                break
+            if candidate.pattern.search(text):
+                entry = candidate
+                break
+        return entry
+
+    def _resolve(self, text: str) -> Optional[Tuple[PriorityEntry, float]]:
+        if text in self._token_cache:
+            return self._token_cache[text]
+
+        entry = self.lookup(text)
+        resolved = (entry, 1.0) if entry is not None else None
+        if resolved is None and self.fuzzy is not None:
+            resolved = self.fuzzy.score(text)
+
+        if len(self._token_cache) >= _TOKEN_CACHE_SIZE:
+            self._token_cache.clear()
+        self._token_cache[text] = resolved
+        return resolved
+
+    def match(self, boxes: Iterable[Tuple[str, Any, float]]) -> Optional[CardMatch]:
+        """Return the highest-priority hit among OCR boxes.
+
+        Each token resolves to one card (exact first, then fuzzy). Any exact
+        hit beats every fuzzy hit, so a near miss on a higher-priority card
+        cannot override a card that is certainly on screen; within the same
+        kind the card with the best rank wins, and ties on the same card are
+        broken by similarity * OCR score.
+        """
+        best: Optional[Tuple[CardMatch, Tuple[bool, int, float]]] = None
+        for text, box, score in boxes:
+            resolved = self._resolve(text)
+            if resolved is None:
+                continue
+
+            entry, similarity = resolved
+
+            # 越小越好：精确命中优先，其次优先级顺序，最后相似度 * OCR 置信度
+            key = (similarity < 1.0, entry.rank, -similarity * score)
+            if best is None or key < best[1]:
+                best = (CardMatch(entry, box, similarity), key)
+
+        if best is None:
+            return None
+        return best[0]
+
+
+@lru_cache(maxsize=_INDEX_CACHE_SIZE)
+def _compile_cached(raw: str, fuzzy_threshold: Optional[float]) -> PriorityIndex:
+    return PriorityIndex(parse_priority_param(raw), fuzzy_threshold)
+
+
+def compile_priority_index(
+    param: Any, fuzzy_threshold: Optional[float] = DEFAULT_FUZZY_THRESHOLD
+) -> PriorityIndex:
+    """Build (or reuse) the PriorityIndex for a raw custom_recognition_param.
+
+    String params are cached by their exact text, so the index is only rebuilt
+    when the config changes. Other types (dict overrides) are compiled as-is.
+    """
+    if isinstance(param, (bytes, bytearray)):
+        param = param.decode("utf-8", errors="replace")
+
+    if isinstance(param, str):
+        return _compile_cached(param, fuzzy_threshold)
+
+    return PriorityIndex(parse_priority_param(param), fuzzy_threshold)
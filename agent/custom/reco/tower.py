@@ -0,0 +1,215 @@
+import logging
+from typing import Any, List, Tuple
+
+from maa.context import Context
+from maa.custom_recognition import CustomRecognition
+
+from ..logger import summarize
+from .card_priority import (
+    DEFAULT_FUZZY_THRESHOLD,
+    PriorityIndex,
+    compile_priority_index,
+)
+
+logger = logging.getLogger(__name__)
+
+_FALLBACK_TEMPLATE = "ClimbTower/爬塔_buff推荐图标1__146_389_43_44__96_339_143_144.png"
+_FALLBACK_THRESHOLD = 0.6
+
+# 单次 OCR 模式：对卡牌区域只跑一次 OCR，再在内存里按优先级匹配所有目标。
+# 设为 False 可退回到逐个目标调用 OCR 的旧逻辑。
+_SINGLE_PASS_OCR = True
+# 卡牌名称的位置随卡牌数量变化，这里直接识别整帧
+_BUFF_CARD_ROI = [0, 0, 0, 0]
+# 单次 OCR 模式下的模糊匹配阈值（相似度 0~1），设为 None 只做精确匹配
+_FUZZY_THRESHOLD = DEFAULT_FUZZY_THRESHOLD
+
+
+def _run_expected_ocr(context: Context, image, expected: str) -> Any:
+    return context.run_recognition(
+        "OCR",
+        image,
+        pipeline_override={
+            "OCR": {
+                "recognition": "OCR",
+                "expected": expected,
+                "action": "DoNothing",
+            }
+        },
+    )
+
+
+def _run_full_ocr(context: Context, image) -> Any:
+    return context.run_recognition(
+        "BuffCardOCR",
+        image,
+        pipeline_override={
+            "BuffCardOCR": {
+                "recognition": "OCR",
+                "roi": _BUFF_CARD_ROI,
+                "action": "DoNothing",
+            }
+        },
+    )
+
+
+def _collect_ocr_boxes(reco_detail) -> List[Tuple[str, Any, float]]:
+    """Flatten an OCR detail into [(text, box, score)].
+
+    Uses filtered_results (already thresholded by MaaFW) when available.
+    """
+    if not reco_detail:
+        return []
+
+    results = getattr(reco_detail, "filtered_results", None)
+    if results is None:
+        results = getattr(reco_detail, "all_results", None) or []
+
+    boxes: List[Tuple[str, Any, float]] = []
+    for item in results:
+        text = getattr(item, "text", None)
+        box = getattr(item, "box", None)
+        if not text or box is None:
+            continue
+        boxes.append((str(text), box, float(getattr(item, "score", 0.0) or 0.0)))
+    return boxes
+
+
+def _run_fallback_template(context: Context, image) -> Any:
+    return context.run_recognition(
+        "FallbackTemplate",
+        image,
+        pipeline_override={
+            "FallbackTemplate": {
+                "recognition": "TemplateMatch",
+                "template": [_FALLBACK_TEMPLATE],
+                "green_mask": True,
+                "action": "DoNothing",
+                "threshold": _FALLBACK_THRESHOLD,
+            }
+        },
+    )
+
+
+class TowerRecognition(CustomRecognition):
+
+    def analyze(
+        self,
+        context: Context,
+        argv: CustomRecognition.AnalyzeArg,
+    ) -> CustomRecognition.AnalyzeResult:
+
+        if context.tasker.stopping:
+            return CustomRecognition.AnalyzeResult(
+                box=(0, 0, 0, 0),
+                detail="Task Stopped",
+            )
+
+        # priority_dict = {
+        #     "3": [
+        #         "花海·叠浪",
+        #         "花海·汹涌",
+        #         "花海·爆裂",
+        #         "禁行逆风",
+        #         "暖风加护",
+        #         "森林公主的赐福",
+        #         "风蚀坏劫",
+        #     ],
+        #     "2": [
+        #         "风魔种子",
+        #         "自我提升",
+        #         "花海·侵蚀",
+        #         "花海·荟聚",
+        #         "全能领导",
+        #         "流速紊乱",
+        #         "众星拥戴",
+        #         "风云无常",
+        #         "单科学习强化",
+        #         "弱点解析",
+        #     ],
+        # }
+        try:
+            index = compile_priority_index(
+                argv.custom_recognition_param, _FUZZY_THRESHOLD
+            )
+        except Exception as exc:
+            logger.warning("custom_recognition_param 解析失败: %s", exc)
+            index = PriorityIndex({})
+
+        if _SINGLE_PASS_OCR:
+            result = self._analyze_single_pass(context, argv.image, index)
+        else:
+            result = self._analyze_per_target(context, argv.image, index)
+        if result is not None:
+            return result
+
+        if context.tasker.stopping:
+            return CustomRecognition.AnalyzeResult(
+                box=(0, 0, 0, 0),
+                detail="Task Stopped",
+            )
+
+        logger.info("未找到任何目标，尝试推荐卡片图标")
+        reco_detail = _run_fallback_template(context, argv.image)
+        if reco_detail and reco_detail.hit and reco_detail.best_result:
+            box = reco_detail.best_result.box
+            return CustomRecognition.AnalyzeResult(
+                box=box,
+                detail="use recommend card",
+            )
+
+        return CustomRecognition.AnalyzeResult(
+            box=(0, 0, 0, 0),
+            detail="not found",
+        )
+
+    def _analyze_single_pass(self, context: Context, image, index: PriorityIndex):
+        """Run OCR once and match every priority target against its text boxes."""
+        if not index:
+            return None
+
+        reco_detail = _run_full_ocr(context, image)
+        boxes = _collect_ocr_boxes(reco_detail)
+        logger.debug("单次 OCR 识别到 %d 个文本框", len(boxes))
+
+        found = index.match(boxes)
+        if found is None:
+            return None
+
+        entry = found.entry
+        logger.info(
+            "找到目标 %s，优先级 %s，相似度 %.2f，位置: %s",
+            entry.name,
+            entry.priority,
+            found.similarity,
+            found.box,
+        )
+        return CustomRecognition.AnalyzeResult(
+            box=found.box,
+            detail=f"Found {entry.name} with priority {entry.priority}",
+        )
+
+    def _analyze_per_target(self, context: Context, image, index: PriorityIndex):
+        """Legacy path: one OCR call per target, highest priority first."""
+        for priority in index.priorities:
+            targets = index.priority_dict[priority]
+            for target in targets:
+                if context.tasker.stopping:
+                    return CustomRecognition.AnalyzeResult(
+                        box=(0, 0, 0, 0),
+                        detail="Task Stopped",
+                    )
+
+                logger.debug("正在识别优先级 %s 的目标: %s", priority, target)
+                reco_detail = _run_expected_ocr(context, image, target)
+                logger.debug("识别结果: %s", summarize(reco_detail))
+
+                if reco_detail and reco_detail.hit and reco_detail.best_result:
+                    box = reco_detail.best_result.box
+                    logger.info("找到目标 %s，位置: %s", target, box)
+                    return CustomRecognition.AnalyzeResult(
+                        box=box,
+                        detail=f"Found {target} with priority {priority}",
+                    )
+
+        return None
@@ -0,0 +1,115 @@
+import importlib
+import logging
+import threading
+import time
+from typing import Dict, NamedTuple, Optional
+
+from maa.agent.agent_server import AgentServer
+from maa.context import Context
+from maa.custom_action import CustomAction
+from maa.custom_recognition import CustomRecognition
+
+logger = logging.getLogger(__name__)
+
+
+class Component(NamedTuple):
+    kind: str  # "recognition" / "action"
+    module: str  # 相对 custom 包的模块路径
+    attr: str
+
+
+# 名称需与 pipeline 中的 custom_recognition / custom_action 字段一致
+COMPONENTS: Dict[str, Component] = {
+    "auto_tower": Component("recognition", ".reco.tower", "TowerRecognition"),
+    "shop_recognition": Component(
+        "recognition", ".reco.climb_tower", "ShopRecognition"
+    ),
+    "shop_action": Component("action", ".action.climb_tower", "ShopAction"),
+    "utool_calc_repeat": Component("action", ".action.utool", "UToolCalcRepeat"),
+}
+
+# 各组件首次使用时的加载耗时（秒）
+load_times: Dict[str, float] = {}
+
+
+class _LazyTarget:
+    """Imports and instantiates a component on first use (thread-safe)."""
+
+    def __init__(self, name: str, component: Component):
+        self.name = name
+        self.component = component
+        self._instance = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._instance is not None
+
+    def get(self):
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    start = time.perf_counter()
+                    module = importlib.import_module(self.component.module, __package__)
+                    self._instance = getattr(module, self.component.attr)()
+                    load_times[self.name] = time.perf_counter() - start
+                    logger.info(
+                        "首次使用 %s，加载耗时 %.1f ms",
+                        self.name,
+                        load_times[self.name] * 1000,
+                    )
+        return self._instance
+
+
+class LazyRecognition(CustomRecognition):
+    def __init__(self, target: _LazyTarget):
+        super().__init__()
+        self.target = target
+
+    def analyze(
+        self,
+        context: Context,
+        argv: CustomRecognition.AnalyzeArg,
+    ) -> CustomRecognition.AnalyzeResult:
+        return self.target.get().analyze(context, argv)
+
+
+class LazyAction(CustomAction):
+    def __init__(self, target: _LazyTarget):
+        super().__init__()
+        self.target = target
+
+    def run(
+        self,
+        context: Context,
+        argv: CustomAction.RunArg,
+    ) -> CustomAction.RunResult:
+        return self.target.get().run(context, argv)
+
+
+_targets: Dict[str, _LazyTarget] = {}
+
+
+def register_components() -> None:
+    """Register a lazy proxy for every component with AgentServer.
+
+    Only the names are registered here; the component modules (and numpy
+    etc.) are imported when the pipeline first calls them.
+    """
+    for name, component in COMPONENTS.items():
+        target = _targets.setdefault(name, _LazyTarget(name, component))
+        if component.kind == "recognition":
+            AgentServer.register_custom_recognition(name, LazyRecognition(target))
+        else:
+            AgentServer.register_custom_action(name, LazyAction(target))
+
+
+def get_component(name: str):
+    """The real component instance behind name (loads it if needed)."""
+    target = _targets.setdefault(name, _LazyTarget(name, COMPONENTS[name]))
+    return target.get()
+
+
+def loaded_components() -> Dict[str, Optional[float]]:
+    """{name: load time in seconds, or None if not loaded yet}"""
+    return {name: load_times.get(name) for name in COMPONENTS}
@@ -0,0 +1,23 @@
+from .fake import ReplayContext, ReplayController, ReplayScreen, VirtualClock
+from .harness import (
+    Scenario,
+    compare_probe_modes,
+    load_scenario,
+    replay_shop_flow,
+    replay_tower,
+)
+from .pipeline import load_jsonc, load_pipeline
+
+__all__ = [
+    "ReplayContext",
+    "ReplayController",
+    "ReplayScreen",
+    "VirtualClock",
+    "Scenario",
+    "compare_probe_modes",
+    "load_scenario",
+    "replay_shop_flow",
+    "replay_tower",
+    "load_jsonc",
+    "load_pipeline",
+]
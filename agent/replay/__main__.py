@@ -0,0 +1,82 @@
+"""Offline replay of the tower shop flow and buff card recognition.
+
+Usage (from the agent directory):
+    python -m replay replay/scenarios/shop_floor.json [--verbose] [--json out.json]
+        [--bundle ../build/pipeline/base.json]
+"""
+
+import argparse
+import json
+import sys
+
+from custom.logger import flush_logging, setup_logging, shutdown_logging
+from replay.harness import (
+    compare_probe_modes,
+    load_scenario,
+    replay_shop_flow,
+    replay_tower,
+)
+from replay.pipeline import load_pipeline
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="离线回放爬塔商店流程")
+    parser.add_argument("scenarios", nargs="+", help="场景 JSON 文件")
+    parser.add_argument("--verbose", action="store_true", help="输出流程日志")
+    parser.add_argument("--json", help="把回放报告写入该文件")
+    parser.add_argument(
+        "--bundle", help="使用 build_pipeline_bundle.py 生成的 pipeline，不再逐个解析"
+    )
+    args = parser.parse_args()
+    if args.verbose:
+        setup_logging("DEBUG")
+
+    pipeline = load_pipeline([args.bundle]) if args.bundle else None
+    reports = []
+    failed = False
+    for path in args.scenarios:
+        scenario = load_scenario(path)
+        if pipeline is None or scenario.pipeline_dirs:
+            pipeline = load_pipeline(scenario.pipeline_dirs or None)
+
+        scenario_reports = []
+        if scenario.shop is not None:
+            report = replay_shop_flow(scenario, pipeline, args.verbose)
+            flush_logging()
+            # 合并 OCR 的状态识别必须与逐个节点识别得出相同的结果
+            report["failures"].extend(compare_probe_modes(scenario, pipeline))
+            scenario_reports.append({"kind": "shop", **report})
+            print(
+                f"[shop] {scenario.name}: 循环 {report['iterations']} 次，"
+                f"识别 {report['recognition_calls']} 次，截图 {report['captures']} 次，"
+                f"点击 {report['clicks']} 次，虚拟耗时 {report['virtual_seconds']:.2f} 秒"
+            )
+            print(f"       状态序列: {' -> '.join(map(str, report['states']))}")
+        if scenario.tower is not None:
+            report = replay_tower(scenario, pipeline, args.verbose)
+            flush_logging()
+            scenario_reports.append({"kind": "tower", **report})
+            print(
+                f"[tower] {scenario.name}: {len(report['frames'])} 帧，"
+                f"识别 {report['recognition_calls']} 次，"
+                f"虚拟耗时 {report['virtual_seconds']:.2f} 秒"
+            )
+            for frame in report["frames"]:
+                print(f"       {frame['screen']}: {frame['box']} {frame['detail']}")
+
+        for report in scenario_reports:
+            for failure in report["failures"]:
+                failed = True
+                print(f"  失败: {failure}")
+        reports.extend(scenario_reports)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(reports, f, ensure_ascii=False, indent=2)
+
+    shutdown_logging()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
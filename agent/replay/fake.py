@@ -0,0 +1,306 @@
+import os
+import re
+import threading
+import time
+import zlib
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from unittest import mock
+
+import numpy as np
+
+from .pipeline import merge_node, recognition_spec
+
+FRAME_SIZE = (1280, 720)
+
+# 各类操作消耗的虚拟时间（秒），可在场景文件的 latency 中覆盖
+DEFAULT_LATENCY = {
+    "screencap": 0.03,
+    "click": 0.05,
+    "ocr": 0.04,
+    "template": 0.005,
+    "other": 0.002,
+}
+
+_OCR_TYPES = {"OCR"}
+_TEMPLATE_TYPES = {"TemplateMatch", "FeatureMatch", "ColorMatch"}
+
+
+class VirtualClock:
+    """Deterministic clock; sleep() and fake device calls advance it.
+
+    patch() swaps time.time / sleep / perf_counter / monotonic for the
+    virtual versions so timeouts and waits in the agent run instantly.
+    Concurrent callers are serialized, i.e. parallel work is not modelled.
+    """
+
+    def __init__(self, start: float = 1_000_000.0):
+        self.start = start
+        self.now = start
+        self._lock = threading.Lock()
+
+    @property
+    def elapsed(self) -> float:
+        return self.now - self.start
+
+    def time(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        if seconds > 0:
+            with self._lock:
+                self.now += seconds
+
+    def sleep(self, seconds: float) -> None:
+        self.advance(seconds)
+
+    @contextmanager
+    def patch(self):
+        with mock.patch.multiple(
+            time,
+            time=self.time,
+            sleep=self.sleep,
+            perf_counter=self.time,
+            monotonic=self.time,
+        ):
+            yield self
+
+
+class FakeBox:
+    def __init__(self, box: Sequence[int], text: str = "", score: float = 1.0):
+        self.box = tuple(int(v) for v in box)
+        self.text = text
+        self.score = score
+
+    def __repr__(self) -> str:
+        return f"FakeBox({self.box}, {self.text!r}, {self.score})"
+
+
+class FakeDetail:
+    """Mimics the RecognitionDetail fields the agent reads."""
+
+    def __init__(self, name: str, algorithm: str, results: List[FakeBox]):
+        self.name = name
+        self.algorithm = algorithm
+        self.all_results = results
+        self.filtered_results = results
+        self.best_result = results[0] if results else None
+        self.hit = bool(results)
+        self.box = self.best_result.box if results else None
+
+    def __repr__(self) -> str:
+        return f"FakeDetail({self.name}, hit={self.hit}, best={self.best_result})"
+
+
+def _color(key: str) -> List[int]:
+    value = zlib.crc32(key.encode("utf-8"))
+    return [(value >> shift) & 0xFF for shift in (0, 8, 16)]
+
+
+def _synthetic_frame(name: str, boxes: Sequence[Tuple[str, Sequence[int]]]):
+    """Frame colored by screen name, with every scripted box painted in.
+
+    Boxes get a color of their own so regions with different content (e.g.
+    shop grids) also look different to frame diff / grid histograms.
+    """
+    width, height = FRAME_SIZE
+    img = np.full((height, width, 3), _color(name), dtype=np.uint8)
+    for key, box in boxes:
+        x, y, w, h = (int(v) for v in box)
+        img[max(y, 0) : y + h, max(x, 0) : x + w] = _color(key)
+    return img
+
+
+def _load_image(path: str) -> np.ndarray:
+    if path.endswith(".npy"):
+        return np.load(path)
+    try:
+        import cv2
+    except ImportError as e:
+        raise RuntimeError(f"读取截图 {path} 需要 opencv-python，或改用 .npy") from e
+    img = cv2.imread(path, cv2.IMREAD_COLOR)
+    if img is None:
+        raise FileNotFoundError(path)
+    return img
+
+
+def _roi_of(value: Any, shape: Sequence[int]) -> Tuple[int, int, int, int]:
+    height, width = int(shape[0]), int(shape[1])
+    if not isinstance(value, (list, tuple)) or len(value) != 4:
+        return 0, 0, width, height
+    x, y, w, h = (int(v) for v in value)
+    return x, y, (w if w > 0 else width - x), (h if h > 0 else height - y)
+
+
+def _center_in(box: Sequence[int], roi: Sequence[int]) -> bool:
+    cx = box[0] + box[2] / 2
+    cy = box[1] + box[3] / 2
+    return roi[0] <= cx < roi[0] + roi[2] and roi[1] <= cy < roi[1] + roi[3]
+
+
+class ReplayScreen:
+    """One scripted screen: its frame, visible texts and template hits.
+
+    texts: [[text, [x, y, w, h]], ...] seen by OCR nodes
+    hits: {node: [x, y, w, h]} for template / other non-OCR nodes
+    on_click: [{"roi": [x, y, w, h], "next": screen}] (no roi: any click)
+    then / duration: switch to screen "then" after duration seconds
+    """
+
+    def __init__(self, name: str, spec: Dict[str, Any], base_dir: str = "."):
+        self.name = name
+        self.texts = [(str(text), tuple(box)) for text, box in spec.get("texts", [])]
+        self.hits = {node: tuple(box) for node, box in spec.get("hits", {}).items()}
+        self.on_click = list(spec.get("on_click", []))
+        self.then = spec.get("then")
+        self.duration = float(spec.get("duration", 0.0))
+        image = spec.get("image")
+        if image:
+            self.image = _load_image(os.path.join(base_dir, image))
+        else:
+            boxes = self.texts + list(self.hits.items())
+            self.image = _synthetic_frame(name, boxes)
+
+    def next_for_click(self, x: int, y: int) -> Optional[str]:
+        for rule in self.on_click:
+            roi = rule.get("roi")
+            if roi is None or _center_in((x, y, 0, 0), roi):
+                return rule.get("next")
+        return None
+
+
+class _Job:
+    def __init__(self, value: Any = None):
+        self._value = value
+
+    def wait(self) -> "_Job":
+        return self
+
+    def get(self) -> Any:
+        return self._value
+
+    @property
+    def succeeded(self) -> bool:
+        return True
+
+    def __repr__(self) -> str:
+        return "Job(succeeded)"
+
+
+class ReplayController:
+    """Fake controller that walks the scripted screens."""
+
+    def __init__(
+        self,
+        screens: Dict[str, ReplayScreen],
+        start: str,
+        clock: VirtualClock,
+        latency: Dict[str, float],
+    ):
+        self.screens = screens
+        self.clock = clock
+        self.latency = latency
+        self.screen = screens[start]
+        self.entered_at = clock.now
+        self.captures = 0
+        self.clicks: List[Tuple[int, int, str]] = []
+        self.history = [start]
+        self._frames: Dict[int, ReplayScreen] = {}
+
+    def _goto(self, name: Optional[str]) -> None:
+        if not name or name == self.screen.name:
+            return
+        self.screen = self.screens[name]
+        self.entered_at = self.clock.now
+        self.history.append(name)
+
+    def _settle(self) -> None:
+        # 按时间自动切换的画面（动画、提示消失等）
+        for _ in range(len(self.screens)):
+            screen = self.screen
+            if not screen.then or self.clock.now - self.entered_at < screen.duration:
+                break
+            self._goto(screen.then)
+
+    def screen_of(self, img: Any) -> ReplayScreen:
+        return self._frames.get(id(img), self.screen)
+
+    def post_screencap(self) -> _Job:
+        self.clock.advance(self.latency["screencap"])
+        self._settle()
+        self.captures += 1
+        img = self.screen.image
+        self._frames[id(img)] = self.screen
+        return _Job(img)
+
+    def post_click(self, x: int, y: int) -> _Job:
+        self.clock.advance(self.latency["click"])
+        self._settle()
+        self.clicks.append((int(x), int(y), self.screen.name))
+        self._goto(self.screen.next_for_click(x, y))
+        return _Job(True)
+
+
+class ReplayTasker:
+    def __init__(self, controller: ReplayController):
+        self.controller = controller
+        self.stopping = False
+
+
+class ReplayContext:
+    """Duck-typed maa Context answering recognitions from the script."""
+
+    def __init__(
+        self,
+        controller: ReplayController,
+        pipeline: Dict[str, Dict[str, Any]],
+        latency: Dict[str, float],
+    ):
+        self.tasker = ReplayTasker(controller)
+        self.pipeline = pipeline
+        self.latency = latency
+        self.calls: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def get_node_data(self, name: str) -> Optional[Dict[str, Any]]:
+        return self.pipeline.get(name)
+
+    def run_recognition(
+        self, entry: str, image: Any, pipeline_override: Optional[Dict] = None
+    ) -> FakeDetail:
+        data = merge_node(
+            self.pipeline.get(entry), (pipeline_override or {}).get(entry)
+        )
+        reco_type, params = recognition_spec(data)
+        with self._lock:
+            self.calls[entry] += 1
+
+        controller = self.tasker.controller
+        screen = controller.screen_of(image)
+        if reco_type in _OCR_TYPES:
+            controller.clock.advance(self.latency["ocr"])
+            results = self._ocr(screen, params, np.shape(image))
+        else:
+            kind = "template" if reco_type in _TEMPLATE_TYPES else "other"
+            controller.clock.advance(self.latency[kind])
+            box = screen.hits.get(entry)
+            results = [FakeBox(box)] if box is not None else []
+        return FakeDetail(entry, reco_type, results)
+
+    @staticmethod
+    def _ocr(screen: ReplayScreen, params: Dict[str, Any], shape) -> List[FakeBox]:
+        roi = _roi_of(params.get("roi"), shape)
+        expected = params.get("expected") or []
+        if isinstance(expected, str):
+            expected = [expected]
+        patterns = [re.compile(str(e)) for e in expected]
+
+        results = []
+        for text, box in screen.texts:
+            if not _center_in(box, roi):
+                continue
+            if patterns and not any(p.search(text) for p in patterns):
+                continue
+            results.append(FakeBox(box, text))
+        return results
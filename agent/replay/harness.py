@@ -0,0 +1,272 @@
+import contextlib
+import io
+import json
+import logging
+import os
+import sys
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+from .fake import (
+    DEFAULT_LATENCY,
+    ReplayContext,
+    ReplayController,
+    ReplayScreen,
+    VirtualClock,
+)
+from .pipeline import load_pipeline
+
+# agent 目录，custom 包从这里导入
+AGENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if AGENT_DIR not in sys.path:
+    sys.path.insert(0, AGENT_DIR)
+
+
+def _resolve_screen(
+    screens: Dict[str, Dict[str, Any]], name: str, seen: tuple = ()
+) -> Dict[str, Any]:
+    """Apply "base": the screen extends another one (e.g. a toast over the shop).
+
+    texts / hits / on_click of the screen come first, then the base screen's.
+    """
+    spec = screens[name]
+    base_name = spec.get("base")
+    if not base_name:
+        return spec
+    if base_name in seen:
+        raise ValueError(f"场景画面 base 循环引用: {name}")
+    base = _resolve_screen(screens, base_name, seen + (name,))
+    # 自动切换和截图不继承，画面本身与 base 不同
+    resolved = {
+        key: value
+        for key, value in base.items()
+        if key not in ("then", "duration", "image")
+    }
+    resolved.update(spec)
+    resolved["texts"] = list(spec.get("texts", [])) + list(base.get("texts", []))
+    resolved["hits"] = {**base.get("hits", {}), **spec.get("hits", {})}
+    resolved["on_click"] = list(spec.get("on_click", [])) + list(
+        base.get("on_click", [])
+    )
+    return resolved
+
+
+class Scenario:
+    """A recorded / scripted session loaded from a scenario JSON file.
+
+    {
+      "name": ..., "start": screen, "latency": {...},
+      "screens": {name: ReplayScreen spec},
+      "shop": {"config": {...}, "expect": {...}},
+      "tower": {"param": ..., "frames": [{"screen": ..., "expect_box": ...}]}
+    }
+    """
+
+    def __init__(self, spec: Dict[str, Any], base_dir: str = "."):
+        self.name = spec.get("name", "scenario")
+        self.start = spec["start"] if "start" in spec else next(iter(spec["screens"]))
+        self.latency = {**DEFAULT_LATENCY, **spec.get("latency", {})}
+        self.screens = {
+            name: ReplayScreen(name, _resolve_screen(spec["screens"], name), base_dir)
+            for name in spec["screens"]
+        }
+        self.shop = spec.get("shop")
+        self.tower = spec.get("tower")
+        self.pipeline_dirs = [
+            os.path.join(base_dir, path) for path in spec.get("pipeline_dirs", [])
+        ]
+
+    def session(self, start: Optional[str] = None):
+        """Fresh (clock, controller) pair for one replay."""
+        clock = VirtualClock()
+        controller = ReplayController(
+            self.screens, start or self.start, clock, self.latency
+        )
+        return clock, controller
+
+
+def load_scenario(path: str) -> Scenario:
+    with open(path, encoding="utf-8") as f:
+        spec = json.load(f)
+    return Scenario(spec, os.path.dirname(os.path.abspath(path)))
+
+
+@contextlib.contextmanager
+def _quiet(verbose: bool):
+    if verbose:
+        yield
+        return
+    # 流程日志走 logging，不输出时整体关掉，结束后恢复
+    logging.disable(logging.CRITICAL)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+def _box_list(box: Any) -> Optional[List[int]]:
+    if box is None:
+        return None
+    if all(hasattr(box, attr) for attr in ("x", "y", "w", "h")):
+        return [int(box.x), int(box.y), int(box.w), int(box.h)]
+    return [int(v) for v in box]
+
+
+def _check(expect: Dict[str, Any], report: Dict[str, Any]) -> List[str]:
+    failures = []
+    if "success" in expect and report["success"] != expect["success"]:
+        failures.append(f"success: {report['success']} != {expect['success']}")
+    if "final_screen" in expect and report["final_screen"] != expect["final_screen"]:
+        failures.append(
+            f"final_screen: {report['final_screen']} != {expect['final_screen']}"
+        )
+    if "states" in expect and report["states"] != expect["states"]:
+        failures.append(f"states: {report['states']} != {expect['states']}")
+    for key in ("max_iterations", "max_recognition_calls", "max_virtual_seconds"):
+        if key in expect:
+            actual = report[key[len("max_") :]]
+            if actual > expect[key]:
+                failures.append(f"{key}: {actual} > {expect[key]}")
+    return failures
+
+
+def replay_shop_flow(
+    scenario: Scenario,
+    pipeline: Optional[Dict[str, Dict[str, Any]]] = None,
+    verbose: bool = False,
+    probe_mode: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Run ShopAction's complete_shop_flow against the scripted screens.
+
+    probe_mode overrides ShopAction.STATE_PROBE_MODE ("batched" / "sequential").
+    """
+    from custom.action.climb_tower import ShopAction
+
+    if pipeline is None:
+        pipeline = load_pipeline(scenario.pipeline_dirs or None)
+    shop = scenario.shop or {}
+    config = {"type": "complete_shop_flow", **shop.get("config", {})}
+
+    clock, controller = scenario.session(shop.get("start"))
+    context = ReplayContext(controller, pipeline, scenario.latency)
+    action = ShopAction()
+    if probe_mode is not None:
+        action.STATE_PROBE_MODE = probe_mode
+    argv = SimpleNamespace(
+        task_detail=None,
+        node_name="星塔_节点_商店_购物流程_agent",
+        custom_action_name="shop_action",
+        custom_action_param=json.dumps(config, ensure_ascii=False),
+        reco_detail=None,
+        box=None,
+    )
+
+    with clock.patch(), _quiet(verbose):
+        result = action.run(context, argv)
+
+    records = list(action._timer.records)
+    report = {
+        "scenario": scenario.name,
+        "success": bool(result.success),
+        "iterations": len(records),
+        "states": [record["state"] for record in records],
+        "recognition_calls": sum(context.calls.values()),
+        "per_node": dict(context.calls.most_common()),
+        "captures": controller.captures,
+        "clicks": len(controller.clicks),
+        "virtual_seconds": round(clock.elapsed, 3),
+        "screens": controller.history,
+        "final_screen": controller.screen.name,
+        "timing": action._timer.summary(),
+    }
+    report["failures"] = _check(shop.get("expect", {}), report)
+    return report
+
+
+def compare_probe_modes(
+    scenario: Scenario,
+    pipeline: Optional[Dict[str, Dict[str, Any]]] = None,
+) -> List[str]:
+    """Replay the shop flow with batched and with sequential state probes.
+
+    Both modes must decide the same states and walk the same screens;
+    returns the differences. Sequential probes take longer per iteration,
+    so repeats of a state while waiting for an animation are collapsed.
+    """
+    reports = {
+        mode: replay_shop_flow(scenario, pipeline, probe_mode=mode)
+        for mode in ("batched", "sequential")
+    }
+    for report in reports.values():
+        report["states"] = [
+            state
+            for i, state in enumerate(report["states"])
+            if i == 0 or state != report["states"][i - 1]
+        ]
+    batched, sequential = reports["batched"], reports["sequential"]
+    return [
+        f"{key}: batched {batched[key]} != sequential {sequential[key]}"
+        for key in ("success", "states", "screens", "final_screen")
+        if batched[key] != sequential[key]
+    ]
+
+
+def replay_tower(
+    scenario: Scenario,
+    pipeline: Optional[Dict[str, Dict[str, Any]]] = None,
+    verbose: bool = False,
+) -> Dict[str, Any]:
+    """Run TowerRecognition.analyze on every scripted card frame."""
+    from custom.reco.tower import TowerRecognition
+
+    if pipeline is None:
+        pipeline = load_pipeline(scenario.pipeline_dirs or None)
+    tower = scenario.tower or {}
+    param = tower.get("param", {})
+    if not isinstance(param, str):
+        param = json.dumps(param, ensure_ascii=False)
+
+    recognizer = TowerRecognition()
+    frames = []
+    failures = []
+    total_calls = 0
+    virtual_seconds = 0.0
+    for frame in tower.get("frames", []):
+        clock, controller = scenario.session(frame["screen"])
+        context = ReplayContext(controller, pipeline, scenario.latency)
+        image = controller.post_screencap().get()
+        argv = SimpleNamespace(
+            task_detail=None,
+            node_name="星塔_节点_选择buff_推荐_自定义",
+            custom_recognition_name="auto_tower",
+            custom_recognition_param=param,
+            image=image,
+            roi=(0, 0, 0, 0),
+        )
+        start = clock.now
+        with clock.patch(), _quiet(verbose):
+            result = recognizer.analyze(context, argv)
+
+        box = _box_list(result.box) if result else None
+        calls = sum(context.calls.values())
+        total_calls += calls
+        virtual_seconds += clock.now - start
+        frames.append(
+            {
+                "screen": frame["screen"],
+                "box": box,
+                "detail": result.detail if result else None,
+                "recognition_calls": calls,
+            }
+        )
+        if "expect_box" in frame and box != frame["expect_box"]:
+            failures.append(f"{frame['screen']}: box {box} != {frame['expect_box']}")
+
+    return {
+        "scenario": scenario.name,
+        "frames": frames,
+        "recognition_calls": total_calls,
+        "virtual_seconds": round(virtual_seconds, 3),
+        "failures": failures,
+    }
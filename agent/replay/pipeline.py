@@ -0,0 +1,91 @@
+import json
+import re
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple, Union
+
+# 仓库根目录下的默认 pipeline 目录
+ROOT_DIR = Path(__file__).resolve().parent.parent.parent
+DEFAULT_PIPELINE_DIRS = (ROOT_DIR / "assets" / "resource" / "base" / "pipeline",)
+
+_TRAILING_COMMA = re.compile(r",(\s*[}\]])")
+
+
+def strip_jsonc(text: str) -> str:
+    """Remove // and /* */ comments and trailing commas outside strings."""
+    out = []
+    i, n = 0, len(text)
+    in_string = False
+    while i < n:
+        ch = text[i]
+        if in_string:
+            out.append(ch)
+            if ch == "\\" and i + 1 < n:
+                out.append(text[i + 1])
+                i += 2
+                continue
+            if ch == '"':
+                in_string = False
+            i += 1
+        elif ch == '"':
+            in_string = True
+            out.append(ch)
+            i += 1
+        elif text.startswith("//", i):
+            end = text.find("\n", i)
+            i = n if end < 0 else end
+        elif text.startswith("/*", i):
+            end = text.find("*/", i + 2)
+            i = n if end < 0 else end + 2
+        else:
+            out.append(ch)
+            i += 1
+    return _TRAILING_COMMA.sub(r"\1", "".join(out))
+
+
+def load_jsonc(path: Union[str, Path]) -> Any:
+    with open(path, encoding="utf-8") as f:
+        return json.loads(strip_jsonc(f.read()))
+
+
+def load_pipeline(
+    dirs: Optional[Iterable[Union[str, Path]]] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """Merge every pipeline JSON / JSONC file under dirs into {node: data}.
+
+    An entry may also be a bundle built by tools/ci/build_pipeline_bundle.py,
+    whose already merged nodes are used as they are.
+    """
+    nodes: Dict[str, Dict[str, Any]] = {}
+    for directory in dirs or DEFAULT_PIPELINE_DIRS:
+        if Path(directory).is_file():
+            with open(directory, encoding="utf-8") as f:
+                nodes.update(json.load(f)["nodes"])
+            continue
+        files = sorted(Path(directory).rglob("*.json")) + sorted(
+            Path(directory).rglob("*.jsonc")
+        )
+        for path in files:
+            data = load_jsonc(path)
+            if isinstance(data, dict):
+                nodes.update(data)
+    return nodes
+
+
+def merge_node(base: Optional[Dict[str, Any]], override: Optional[Dict[str, Any]]):
+    """Recursive dict merge, the way pipeline_override is applied to a node."""
+    merged = dict(base or {})
+    for key, value in (override or {}).items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge_node(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def recognition_spec(data: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+    """(type, params) of a node in either the v1 (flat) or v2 (nested) form."""
+    reco = data.get("recognition", "DirectHit")
+    if isinstance(reco, dict):
+        return reco.get("type", "DirectHit"), dict(reco.get("param") or {})
+    params = {key: value for key, value in data.items() if key != "recognition"}
+    return reco, params
@@ -0,0 +1,274 @@
+"""Recognition benchmark for the agent recognizers over recorded frames.
+
+Runs every `_agent` node of climb_tower_shop_agent.json (which covers
+shop_recognition) plus the auto_tower node against a folder of saved
+1280x720 screenshots. The frames are fed through MaaFW's CarouselImage debug
+controller, so no device or emulator is needed. Reports recognitions per
+second, per-node latency distribution and peak RSS, and writes everything
+to a JSON file that can be compared against an earlier run:
+
+    python benchmarks/bench_recognition.py --frames path/to/frames \
+        --output bench.json [--baseline old.json] [--repeat 3]
+
+The OCR model must be in assets/resource/base/model/ocr
+(python tools/ci/configure.py).
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+AGENT_DIR = ROOT_DIR / "agent"
+if str(AGENT_DIR) not in sys.path:
+    sys.path.insert(0, str(AGENT_DIR))
+
+from maa.context import Context
+from maa.controller import DbgController
+from maa.custom_action import CustomAction
+from maa.define import LoggingLevelEnum, MaaDbgControllerTypeEnum
+from maa.library import Library
+from maa.resource import Resource
+from maa.tasker import Tasker
+from maa.toolkit import Toolkit
+
+from custom import ShopRecognition, TowerRecognition
+from custom.action.timing import percentile
+
+BUNDLE_DIR = ROOT_DIR / "assets" / "resource" / "base"
+SHOP_AGENT_PIPELINE = (
+    BUNDLE_DIR / "pipeline" / "climb_tower" / "climb_tower_shop_agent.json"
+)
+AUTO_TOWER_NODE = "星塔_节点_选择buff_推荐_自定义"
+RUNNER_NODE = "Benchmark_Runner"
+IMAGE_SUFFIXES = {".png", ".jpg", ".jpeg", ".bmp"}
+
+
+def default_nodes() -> List[str]:
+    with open(SHOP_AGENT_PIPELINE, encoding="utf-8") as f:
+        pipeline = json.load(f)
+    return [name for name in pipeline if name.endswith("_agent")] + [AUTO_TOWER_NODE]
+
+
+def peak_rss_mb() -> Optional[float]:
+    try:
+        import resource as rusage
+    except ImportError:
+        # Windows 没有 resource 模块
+        try:
+            import psutil
+        except ImportError:
+            return None
+        return psutil.Process().memory_info().peak_wset / 1024 / 1024
+
+    peak = rusage.getrusage(rusage.RUSAGE_SELF).ru_maxrss
+    # Linux 单位是 KB，macOS 是字节
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class BenchmarkRunner(CustomAction):
+    """Custom action that times context.run_recognition for every node/frame."""
+
+    def __init__(self, nodes: List[str], frames: int, repeat: int):
+        super().__init__()
+        self.nodes = nodes
+        self.frames = frames
+        self.repeat = repeat
+        self.latencies: Dict[str, List[float]] = {node: [] for node in nodes}
+        self.hits: Dict[str, int] = {node: 0 for node in nodes}
+        self.wall = 0.0
+
+    def run(
+        self,
+        context: Context,
+        argv: CustomAction.RunArg,
+    ) -> CustomAction.RunResult:
+        controller = context.tasker.controller
+        # 先把所有帧截下来，截图耗时不计入识别
+        images = [controller.post_screencap().wait().get() for _ in range(self.frames)]
+
+        start = time.perf_counter()
+        for _ in range(self.repeat):
+            for image in images:
+                for node in self.nodes:
+                    begin = time.perf_counter()
+                    detail = context.run_recognition(node, image)
+                    self.latencies[node].append(time.perf_counter() - begin)
+                    if detail and detail.hit:
+                        self.hits[node] += 1
+        self.wall = time.perf_counter() - start
+        return CustomAction.RunResult(success=True)
+
+
+def run_benchmark(
+    frames_dir: Path, nodes: List[str], repeat: int, warmup: bool
+) -> Dict[str, Any]:
+    frame_files = [
+        p for p in frames_dir.iterdir() if p.suffix.lower() in IMAGE_SUFFIXES
+    ]
+    if not frame_files:
+        raise SystemExit(f"{frames_dir} 中没有截图")
+
+    work_dir = Path(tempfile.mkdtemp(prefix="maa_bench_"))
+    Toolkit.init_option(work_dir)
+    Tasker.set_stdout_level(LoggingLevelEnum.Error)
+
+    load_start = time.perf_counter()
+    resource = Resource()
+    resource.post_bundle(BUNDLE_DIR).wait()
+    resource_load = time.perf_counter() - load_start
+
+    resource.register_custom_recognition("auto_tower", TowerRecognition())
+    resource.register_custom_recognition("shop_recognition", ShopRecognition())
+
+    controller = DbgController(
+        frames_dir, work_dir, MaaDbgControllerTypeEnum.CarouselImage
+    )
+    controller.post_connection().wait()
+
+    tasker = Tasker()
+    tasker.bind(resource, controller)
+    if not tasker.inited:
+        raise SystemExit("Tasker 初始化失败")
+
+    def run_once(repeat_count: int) -> BenchmarkRunner:
+        runner = BenchmarkRunner(nodes, len(frame_files), repeat_count)
+        resource.register_custom_action("benchmark_runner", runner)
+        tasker.post_task(
+            RUNNER_NODE,
+            {
+                RUNNER_NODE: {
+                    "action": {
+                        "type": "Custom",
+                        "param": {"custom_action": "benchmark_runner"},
+                    }
+                }
+            },
+        ).wait()
+        return runner
+
+    if warmup:
+        # 预热：首次 OCR 会加载模型，不计入结果
+        run_once(1)
+    runner = run_once(repeat)
+
+    total_calls = sum(len(values) for values in runner.latencies.values())
+    node_stats = {}
+    for node, values in runner.latencies.items():
+        if not values:
+            continue
+        node_stats[node] = {
+            "count": len(values),
+            "hits": runner.hits[node],
+            "mean_ms": statistics.fmean(values) * 1000,
+            "p50_ms": percentile(values, 50) * 1000,
+            "p95_ms": percentile(values, 95) * 1000,
+            "max_ms": max(values) * 1000,
+        }
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "revision": git_revision(),
+            "maafw": Library.version(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "frames": len(frame_files),
+            "repeat": repeat,
+            "warmup": warmup,
+        },
+        "summary": {
+            "recognitions": total_calls,
+            "wall_seconds": runner.wall,
+            "recognitions_per_second": (
+                total_calls / runner.wall if runner.wall else 0.0
+            ),
+            "resource_load_seconds": resource_load,
+            "peak_rss_mb": peak_rss_mb(),
+        },
+        "nodes": node_stats,
+    }
+
+
+def compare(result: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    def delta(new: float, old: float) -> str:
+        if not old:
+            return "n/a"
+        return f"{(new - old) / old * 100:+.1f}%"
+
+    old_summary, new_summary = baseline["summary"], result["summary"]
+    print("与基线对比:")
+    for key in ("recognitions_per_second", "peak_rss_mb"):
+        if new_summary.get(key) is not None and old_summary.get(key) is not None:
+            print(
+                f"  {key}: {old_summary[key]:.2f} -> {new_summary[key]:.2f} "
+                f"({delta(new_summary[key], old_summary[key])})"
+            )
+    for node, stats in result["nodes"].items():
+        old = baseline["nodes"].get(node)
+        if old:
+            print(
+                f"  {node}: p50 {old['p50_ms']:.2f} -> {stats['p50_ms']:.2f} ms "
+                f"({delta(stats['p50_ms'], old['p50_ms'])})，"
+                f"p95 {old['p95_ms']:.2f} -> {stats['p95_ms']:.2f} ms "
+                f"({delta(stats['p95_ms'], old['p95_ms'])})"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="识别性能基准测试")
+    parser.add_argument("--frames", required=True, type=Path, help="1280x720 截图目录")
+    parser.add_argument("--output", type=Path, default=Path("bench_output.json"))
+    parser.add_argument("--baseline", type=Path, help="用于对比的历史结果")
+    parser.add_argument("--repeat", type=int, default=1, help="每帧重复次数")
+    parser.add_argument("--node", action="append", help="只测试指定节点，可重复")
+    parser.add_argument("--no-warmup", action="store_true", help="不做预热")
+    args = parser.parse_args()
+
+    nodes = args.node or default_nodes()
+    result = run_benchmark(args.frames, nodes, args.repeat, not args.no_warmup)
+
+    summary = result["summary"]
+    print(
+        f"{summary['recognitions']} 次识别，{summary['wall_seconds']:.2f} 秒，"
+        f"{summary['recognitions_per_second']:.1f} 次/秒，峰值内存 {summary['peak_rss_mb']} MB"
+    )
+    for node, stats in sorted(
+        result["nodes"].items(), key=lambda item: -item[1]["p95_ms"]
+    ):
+        print(
+            f"  {node}: p50 {stats['p50_ms']:.2f} ms，p95 {stats['p95_ms']:.2f} ms，"
+            f"max {stats['max_ms']:.2f} ms，命中 {stats['hits']}/{stats['count']}"
+        )
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"结果已写入 {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            compare(result, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
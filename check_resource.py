@@ -1,37 +1,217 @@
 import sys
+import json
+import time
+import hashlib
+import argparse
 
-from typing import List
+from typing import Dict, List, Optional, Tuple
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
 
 from maa.resource import Resource
 from maa.tasker import Tasker, LoggingLevelEnum
 
+sys.path.append(str(Path(__file__).parent / "tools" / "ci"))
 
-def check(dirs: List[Path]) -> bool:
+from build_pipeline_bundle import (
+    default_output_dir,
+    load_interface,
+    load_or_build,
+    relative,
+    resource_layers,
+)
+
+cache_path = default_output_dir.parent / "check_resource_cache.json"
+CACHE_VERSION = 1
+
+
+def check_references() -> bool:
+    """Check node references of every resource in interface.json.
+
+    The merged pipelines are cached in build/pipeline and only rebuilt when
+    a pipeline file changes.
+    """
+    _, errors = load_or_build(default_output_dir)
+    for error in errors:
+        print(f"Error: {error}")
+    return not errors
+
+
+def resource_chain(dir: Path) -> List[Path]:
+    """dir plus the directories interface.json loads before it.
+
+    Overlays such as en / tw only make sense on top of base, so they are
+    checked together with it, just like MaaFW loads them.
+    """
+    dir = dir.resolve()
+    for _, paths in resource_layers(load_interface()):
+        if dir in paths:
+            return paths[: paths.index(dir) + 1]
+    return [dir]
+
+
+class FileHashCache:
+    """sha256 of every resource file, re-hashed only when size / mtime change.
+
+    Also remembers the digest of each resource chain that passed the last
+    check, so unchanged chains are not loaded again.
+    """
+
+    def __init__(self, path: Optional[Path]):
+        self.path = path
+        self.files: Dict[str, List] = {}
+        self.passed: Dict[str, Dict] = {}
+        if path is not None and path.exists():
+            try:
+                with open(path, encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("version") == CACHE_VERSION:
+                    self.files = data.get("files", {})
+                    self.passed = data.get("passed", {})
+            except ValueError:
+                pass
+
+    def sha256(self, file: Path) -> str:
+        stat = file.stat()
+        key = relative(file)
+        cached = self.files.get(key)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2]
+        digest = hashlib.sha256(file.read_bytes()).hexdigest()
+        self.files[key] = [stat.st_size, stat.st_mtime_ns, digest]
+        return digest
+
+    def digest(self, chain: List[Path]) -> Tuple[str, Dict[str, str]]:
+        """(digest of the whole chain, {file: sha256})"""
+        hashes = {}
+        for dir in chain:
+            for file in sorted(p for p in dir.rglob("*") if p.is_file()):
+                hashes[relative(file)] = self.sha256(file)
+        combined = hashlib.sha256(
+            json.dumps(hashes, sort_keys=True).encode("utf-8")
+        ).hexdigest()
+        return combined, hashes
+
+    def changed_files(self, key: str, hashes: Dict[str, str]) -> List[str]:
+        """Files of the chain that differ from its last passing check."""
+        previous = self.passed.get(key, {}).get("files", {})
+        changed = [f for f, h in hashes.items() if previous.get(f) != h]
+        return changed + [f for f in previous if f not in hashes]
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(
+                {"version": CACHE_VERSION, "files": self.files, "passed": self.passed},
+                f,
+                ensure_ascii=False,
+            )
+        tmp.replace(self.path)
+
+
+def _init_worker(level: LoggingLevelEnum):
+    Tasker.set_stdout_level(level)
+
+
+def _load_chain(chain: List[str]) -> Tuple[bool, float]:
+    """Runs in a worker process: load the chain into a fresh Resource."""
+    start = time.perf_counter()
     resource = Resource()
+    for dir in chain:
+        if not resource.post_bundle(dir).wait().status.succeeded:
+            return False, time.perf_counter() - start
+    return True, time.perf_counter() - start
+
+
+def check(
+    dirs: List[Path],
+    jobs: Optional[int] = None,
+    cache: Optional[FileHashCache] = None,
+    level: LoggingLevelEnum = LoggingLevelEnum.All,
+) -> bool:
+    """Load every directory (on top of its base) in parallel worker processes.
+
+    Chains whose files all match the last passing check are skipped. The
+    unit of work is the whole chain: MaaFW only loads complete bundles and
+    resolves nodes across files, so one changed file reloads its chain.
+    """
+    cache = cache or FileHashCache(None)
 
     print(f"Checking {len(dirs)} directories...")
 
+    pending = {}
     for dir in dirs:
-        print(f"Checking {dir}...")
-        status = resource.post_bundle(dir).wait().status
-        if not status.succeeded:
-            print(f"Failed to check {dir}.")
-            return False
+        chain = resource_chain(dir)
+        key = "+".join(relative(p) for p in chain)
+        if key in pending:
+            continue
+        digest, hashes = cache.digest(chain)
+        if cache.passed.get(key, {}).get("digest") == digest:
+            print(f"{dir}: unchanged since last check, skipped.")
+            continue
+        changed = cache.changed_files(key, hashes)
+        if key in cache.passed:
+            print(f"{dir}: {len(changed)} changed files: {', '.join(changed[:5])}")
+        pending[key] = (dir, chain, digest, hashes)
 
-    print("All directories checked.")
-    return True
+    results = {}
+    if len(pending) == 1:
+        # 只有一个目录时不必启动子进程
+        _init_worker(level)
+        key, (_, chain, _, _) = next(iter(pending.items()))
+        results[key] = _load_chain([str(p) for p in chain])
+    elif pending:
+        with ProcessPoolExecutor(
+            max_workers=jobs or len(pending),
+            initializer=_init_worker,
+            initargs=(level,),
+        ) as pool:
+            futures = {
+                key: pool.submit(_load_chain, [str(p) for p in chain])
+                for key, (_, chain, _, _) in pending.items()
+            }
+            results = {key: future.result() for key, future in futures.items()}
+
+    ok = True
+    for key, (succeeded, seconds) in results.items():
+        dir, _, digest, hashes = pending[key]
+        if succeeded:
+            cache.passed[key] = {"digest": digest, "files": hashes}
+            print(f"{dir}: OK in {seconds:.2f}s ({key})")
+        else:
+            cache.passed.pop(key, None)
+            ok = False
+            print(f"Failed to check {dir}. ({seconds:.2f}s, {key})")
+
+    cache.save()
+    if ok:
+        print("All directories checked.")
+    return ok
 
 
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python check_resource.py <directories...>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Check MaaFW resource directories.")
+    parser.add_argument("dirs", nargs="+", type=Path)
+    parser.add_argument(
+        "--jobs", type=int, help="worker processes (default: one per directory)"
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="check every directory again"
+    )
+    parser.add_argument("--quiet", action="store_true", help="only print MaaFW errors")
+    args = parser.parse_args()
 
-    Tasker.set_stdout_level(LoggingLevelEnum.All)
+    level = LoggingLevelEnum.Error if args.quiet else LoggingLevelEnum.All
+    Tasker.set_stdout_level(level)
 
-    dirs = [Path(arg) for arg in sys.argv[1:]]
-    if not check(dirs):
+    start = time.perf_counter()
+    cache = FileHashCache(None if args.no_cache else cache_path)
+    ok = check_references() and check(args.dirs, args.jobs, cache, level)
+    print(f"Total {time.perf_counter() - start:.2f}s")
+    if not ok:
         sys.exit(1)
 
 
@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+# agent 模块按 agent 目录为根导入（与 main.py 运行时一致）
+AGENT_DIR = Path(__file__).resolve().parent.parent / "agent"
+if str(AGENT_DIR) not in sys.path:
+    sys.path.insert(0, str(AGENT_DIR))
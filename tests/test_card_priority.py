@@ -0,0 +1,119 @@
+import pytest
+
+from custom.reco.card_priority import (
+    FuzzyCardMatcher,
+    PriorityIndex,
+    _grams,
+    _partial_distance,
+    compile_priority_index,
+    normalize_card_text,
+    parse_priority_param,
+)
+
+
+def _index(priority_dict, threshold=0.75):
+    return PriorityIndex(priority_dict, threshold)
+
+
+@pytest.mark.parametrize(
+    "raw, expected",
+    [
+        ("花海・叠浪", "花海·叠浪"),
+        ("花海•叠浪", "花海·叠浪"),
+        ("花海 · 叠 浪", "花海·叠浪"),
+        ("ＡＢＣ１２", "ABC12"),
+        ("", ""),
+    ],
+)
+def test_normalize_card_text(raw, expected):
+    assert normalize_card_text(raw) == expected
+
+
+def test_grams():
+    assert _grams("风魔种子") == {"风魔", "魔种", "种子"}
+    assert _grams("风") == {"风"}
+    assert _grams("") == set()
+
+
+def test_partial_distance_ignores_surrounding_text():
+    assert _partial_distance("风魔种子", "风魔种子", 1) == 0
+    assert _partial_distance("风魔种子", "风魔种子Lv2", 1) == 0
+    assert _partial_distance("风魔种子", "风魔钟子", 1) == 1
+    assert _partial_distance("风魔种子", "风种子", 1) == 1
+
+
+def test_partial_distance_stops_at_limit():
+    assert _partial_distance("风魔种子", "火焰之心", 1) == 2
+
+
+def test_parse_priority_param():
+    assert parse_priority_param('{"3": ["a", " "], "x": ["b"], "1": "c"}') == {
+        3: ["a"],
+        1: ["c"],
+    }
+    assert parse_priority_param(b"") == {}
+    assert parse_priority_param(None) == {}
+    with pytest.raises(ValueError):
+        parse_priority_param("[1, 2]")
+
+
+def test_fuzzy_matcher_scores_near_misses():
+    index = _index({3: ["风魔种子"], 1: ["火焰之心"]})
+    matcher = index.fuzzy
+    assert isinstance(matcher, FuzzyCardMatcher)
+
+    entry, similarity = matcher.score("风魔钟子")
+    assert entry.name == "风魔种子"
+    assert similarity == pytest.approx(0.75)
+
+    assert matcher.score("冰霜之环") is None
+    assert matcher.score("") is None
+
+
+def test_fuzzy_matcher_rejects_name_inside_longer_text():
+    matcher = _index({3: ["风魔种子"]}).fuzzy
+    assert matcher.score("获得风魔钟子时额外造成伤害") is None
+
+
+def test_lookup_exact_substring_and_pattern():
+    index = _index({3: ["花海·叠浪"], 2: ["风魔种子"], 1: ["^火.+心$"]})
+    assert index.lookup("花海・叠浪").name == "花海·叠浪"
+    assert index.lookup("风魔种子Lv2").name == "风魔种子"
+    assert index.lookup("火焰之心").name == "^火.+心$"
+    assert index.lookup("冰霜之环") is None
+
+
+def test_lookup_prefers_higher_priority_substring():
+    index = _index({3: ["种子"], 1: ["风魔"]})
+    assert index.lookup("风魔种子").name == "种子"
+
+
+def test_match_prefers_exact_hit_over_higher_priority_fuzzy():
+    index = _index({3: ["风魔种子"], 1: ["火焰之心"]})
+    match = index.match([("风魔钟子", "box-a", 0.99), ("火焰之心", "box-b", 0.5)])
+    assert match.entry.name == "火焰之心"
+    assert match.box == "box-b"
+    assert match.similarity == 1.0
+
+
+def test_match_orders_by_priority_then_score():
+    index = _index({3: ["风魔种子"], 1: ["火焰之心"]})
+    boxes = [
+        ("火焰之心", "low", 0.9),
+        ("风魔种子", "first", 0.6),
+        ("风魔种子", "second", 0.8),
+    ]
+    assert index.match(boxes).box == "second"
+
+
+def test_match_without_fuzzy():
+    index = _index({3: ["风魔种子"]}, threshold=None)
+    assert index.fuzzy is None
+    assert index.match([("风魔钟子", "box", 0.9)]) is None
+
+
+def test_compile_priority_index_is_cached_by_text():
+    raw = '{"3": ["花海·叠浪"]}'
+    assert compile_priority_index(raw) is compile_priority_index(raw)
+    assert compile_priority_index(raw) is not compile_priority_index(raw, None)
+    assert len(compile_priority_index({3: ["花海·叠浪"]})) == 1
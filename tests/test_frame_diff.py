@@ -0,0 +1,62 @@
+import numpy as np
+
+from custom.action.frame_diff import FrameDiff
+
+
+def _frame(value=0):
+    return np.full((720, 1280, 3), value, np.uint8)
+
+
+def test_changed_compares_consecutive_frames():
+    diff = FrameDiff()
+    assert diff.changed(_frame())
+    assert not diff.changed(_frame())
+    assert diff.changed(_frame(40))
+    assert diff.unchanged_count == 1
+
+
+def test_small_text_change_is_detected():
+    diff = FrameDiff()
+    base = _frame()
+    text = base.copy()
+    text[100:104, 200:204] = 255
+    diff.changed(base)
+    assert diff.changed(text)
+
+
+def test_noise_within_tolerance():
+    diff = FrameDiff(tolerance=6.0)
+    diff.changed(_frame(100))
+    assert not diff.changed(_frame(104))
+
+
+def test_rois_ignore_changes_elsewhere():
+    diff = FrameDiff(rois=[(0, 0, 64, 64)])
+    base = _frame()
+    outside = base.copy()
+    outside[400:500, 400:500] = 255
+    inside = base.copy()
+    inside[8:16, 8:16] = 255
+    diff.changed(base)
+    assert not diff.changed(outside)
+    assert diff.changed(inside)
+
+
+def test_differs_compares_with_remembered_frame():
+    diff = FrameDiff(tolerance=6.0)
+    assert diff.differs(_frame())
+    diff.remember(_frame())
+    # 每一步都在容差内，但累计超过容差
+    for value in (4, 8, 12):
+        diff.changed(_frame(value))
+    assert diff.differs(_frame(12))
+    assert not diff.differs(_frame(2))
+
+
+def test_unusable_frames_count_as_changed():
+    diff = FrameDiff()
+    diff.changed(_frame())
+    assert diff.changed(None)
+    assert diff.changed(np.zeros((0, 0, 3), np.uint8))
+    diff.reset()
+    assert diff.changed(_frame())
@@ -0,0 +1,67 @@
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("maa")
+
+from custom.action.input_queue import InputQueue
+from custom.action.timing import FlowTimer
+
+
+class _Job:
+    def __init__(self, log, seq, succeeded):
+        self._log = log
+        self._seq = seq
+        self._succeeded = succeeded
+
+    def wait(self):
+        self._log.append(self._seq)
+        return SimpleNamespace(succeeded=self._succeeded)
+
+
+class _Controller:
+    def __init__(self, results):
+        self.results = list(results)
+        self.clicks = []
+        self.waited = []
+
+    def post_click(self, x, y):
+        self.clicks.append((x, y))
+        return _Job(self.waited, len(self.clicks), self.results.pop(0))
+
+
+def _context(results):
+    controller = _Controller(results)
+    return SimpleNamespace(tasker=SimpleNamespace(controller=controller)), controller
+
+
+def test_click_does_not_wait():
+    context, controller = _context([True])
+    queue = InputQueue()
+    assert queue.click(context, 10, 20) is None
+    assert controller.clicks == [(10, 20)]
+    assert controller.waited == []
+    assert queue.pending == 1
+
+
+def test_settle_waits_in_order_and_counts_failures():
+    context, controller = _context([True, False, True])
+    queue = InputQueue(FlowTimer())
+    for x in range(3):
+        queue.click(context, x, 0)
+
+    assert queue.settle() == 1
+    assert controller.waited == [1, 2, 3]
+    assert queue.pending == 0
+    assert (queue.posted, queue.failed) == (3, 1)
+    assert queue.settle() == 0
+
+
+def test_reset_forgets_pending():
+    context, controller = _context([True])
+    queue = InputQueue()
+    queue.click(context, 1, 1)
+    queue.reset()
+    assert queue.settle() == 0
+    assert controller.waited == []
+    assert queue.posted == 0
@@ -0,0 +1,75 @@
+import pytest
+
+pytest.importorskip("maa")
+
+from custom.action.shop_state import (
+    ProbeBox,
+    ProbeResult,
+    _merge_rois,
+    _OcrSpec,
+    _parse_node,
+)
+
+
+def _spec(roi):
+    return _OcrSpec(roi, [], 0.3)
+
+
+def test_merge_rois_groups_identical_rois_only():
+    specs = {
+        "a": _spec((0, 0, 100, 50)),
+        "b": _spec((10, 0, 100, 50)),
+        "c": _spec((0, 0, 100, 50)),
+    }
+    assert _merge_rois(["a", "b", "c"], specs) == [
+        ((0, 0, 100, 50), ["a", "c"]),
+        ((10, 0, 100, 50), ["b"]),
+    ]
+
+
+def test_best_result_is_leftmost_then_topmost():
+    matches = [
+        ProbeBox((300, 10, 20, 20), "右", 0.9),
+        ProbeBox((100, 80, 20, 20), "左下", 0.5),
+        ProbeBox((100, 40, 20, 20), "左上", 0.4),
+    ]
+    result = ProbeResult("node", matches)
+    assert result.hit
+    assert result.best_result.text == "左上"
+
+    empty = ProbeResult("node", [])
+    assert not empty.hit
+    assert empty.best_result is None
+
+
+def _ocr_node(**param):
+    param.setdefault("roi", [0, 0, 100, 50])
+    param.setdefault("expected", ["商店"])
+    return {"recognition": {"type": "OCR", "param": param}}
+
+
+def test_parse_node_kinds():
+    assert _parse_node("n", _ocr_node()).kind == "ocr"
+    assert _parse_node("n", {"recognition": "TemplateMatch"}).kind == "cheap"
+    assert _parse_node("n", {"recognition": {"type": "Custom"}}).kind == "opaque"
+    assert _parse_node("n", None).kind == "opaque"
+
+
+@pytest.mark.parametrize(
+    "extra",
+    [
+        {"roi": "其他节点"},
+        {"roi_offset": [0, 10, 0, 0]},
+        {"only_rec": True},
+        {"order_by": "Score"},
+        {"index": 1},
+    ],
+)
+def test_parse_node_keeps_special_ocr_nodes_opaque(extra):
+    assert _parse_node("n", _ocr_node(**extra)).kind == "opaque"
+
+
+def test_parse_node_threshold():
+    spec = _parse_node("n", _ocr_node(threshold=[0.6]))
+    assert spec.ocr.threshold == pytest.approx(0.6)
+    assert _parse_node("n", _ocr_node()).ocr.threshold == pytest.approx(0.3)
@@ -0,0 +1,47 @@
+import pytest
+
+from custom.action.timing import FlowTimer, percentile
+
+
+def test_percentile_nearest_rank():
+    values = [5.0, 1.0, 4.0, 2.0, 3.0]
+    assert percentile(values, 50) == 3.0
+    assert percentile(values, 95) == 5.0
+    assert percentile(values, 0) == 1.0
+    assert percentile(values, 100) == 5.0
+    assert percentile([], 50) == 0.0
+    assert percentile([7.0], 95) == 7.0
+
+
+def test_summary_groups_by_state():
+    timer = FlowTimer()
+    for iteration, state in enumerate(["shop_main", "shop_main", "buff_main"]):
+        timer.begin_iteration(iteration)
+        timer.set_state(state)
+        timer.add("recognition", 0.5, "node")
+        timer.add("click", 0.1)
+    timer.end_iteration()
+
+    summary = timer.summary()
+    assert summary["shop_main"]["count"] == 2
+    assert summary["buff_main"]["count"] == 1
+    assert summary["shop_main"]["recognition"]["p50"] == pytest.approx(0.5)
+    assert summary["shop_main"]["click"]["p95"] == pytest.approx(0.1)
+
+
+def test_records_are_bounded_and_written(tmp_path):
+    path = tmp_path / "timing.jsonl"
+    timer = FlowTimer(capacity=2)
+    timer.reset(str(path))
+    for iteration in range(3):
+        timer.begin_iteration(iteration)
+    timer.end_iteration()
+
+    assert [r["iteration"] for r in timer.records] == [1, 2]
+    assert len(path.read_text(encoding="utf-8").splitlines()) == 3
+
+
+def test_add_outside_iteration_is_ignored():
+    timer = FlowTimer()
+    timer.add("click", 1.0)
+    assert timer.summary() == {}
@@ -0,0 +1,382 @@
+"""Compile the pipeline of every resource in interface.json into one bundle.
+
+For each resource entry (官服 / 台服 / 国际服 / 日服) the pipeline JSON / JSONC
+files of its directories are parsed once, merged in the declared order the
+way MaaFW overlays bundles, and every node reference (next / on_error /
+interrupt, [JumpBack] and [Anchor] targets, node-name roi / target, task
+entries) is checked. The result is written as compact JSON:
+
+    {
+        "version": 1,
+        "name": "台服",
+        "locale": "tw",
+        "layers": ["resource/base", "resource/tw"],
+        "sources": [{"path": "resource/base/pipeline/login.json", "sha256": ...}],
+        "entries": [task entry, ...],
+        "index": {node: [source index, ...]},   # files defining the node
+        "nodes": {node: merged node data},
+        "errors": [...]                          # broken references
+    }
+
+    python tools/ci/build_pipeline_bundle.py [--output DIR] [--resource NAME]
+
+Exits with 1 if any reference is broken.
+
+The bundle is a build / validation artifact for the tooling only
+(check_resource.py, pipeline_graph.py, template_lint.py, the agent's
+offline replay). Neither the agent nor MaaFW reads it at runtime: MaaFW
+still loads the resource directories listed in interface.json, so the
+bundle does not change load time on users' machines.
+"""
+
+import argparse
+import hashlib
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import jsonc
+
+assets_dir = Path(__file__).parent.parent.parent.resolve() / "assets"
+interface_path = assets_dir / "interface.json"
+default_output_dir = assets_dir.parent / "build" / "pipeline"
+
+BUNDLE_VERSION = 1
+PIPELINE_SUFFIXES = (".json", ".jsonc")
+# 只在 recognition / action 类型相同时逐字段合并 param
+TYPED_FIELDS = ("recognition", "action")
+# 取值为节点名列表的字段
+REFERENCE_FIELDS = ("next", "on_error", "interrupt")
+# roi / target 等字段也可以直接写节点名
+NODE_NAME_PARAMS = ("roi", "target", "begin", "end")
+
+
+def sha256_of(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def relative(path: Path) -> str:
+    try:
+        return path.resolve().relative_to(assets_dir).as_posix()
+    except ValueError:
+        return path.as_posix()
+
+
+def load_interface(path: Path = interface_path) -> Dict[str, Any]:
+    with open(path, encoding="utf-8") as f:
+        return jsonc.load(f)
+
+
+def resource_layers(interface: Dict[str, Any]) -> List[Tuple[str, List[Path]]]:
+    """[(resource name, [bundle dir, ...]), ...] in interface.json order."""
+    layers = []
+    for resource in interface.get("resource", []):
+        paths = [
+            Path(p.replace("{PROJECT_DIR}", str(assets_dir))).resolve()
+            for p in resource.get("path", [])
+        ]
+        layers.append((resource["name"], paths))
+    return layers
+
+
+def pipeline_files(bundle_dir: Path) -> List[Path]:
+    pipeline_dir = bundle_dir / "pipeline"
+    if not pipeline_dir.is_dir():
+        return []
+    return sorted(
+        p
+        for p in pipeline_dir.rglob("*")
+        if p.is_file() and p.suffix in PIPELINE_SUFFIXES
+    )
+
+
+class ParsedLayer:
+    """Nodes of one bundle directory and the file each node came from."""
+
+    def __init__(self, bundle_dir: Path):
+        self.bundle_dir = bundle_dir
+        self.nodes: Dict[str, Dict[str, Any]] = {}
+        self.origin: Dict[str, str] = {}
+        self.sources: List[Dict[str, str]] = []
+        self.errors: List[str] = []
+
+        for path in pipeline_files(bundle_dir):
+            source = relative(path)
+            self.sources.append({"path": source, "sha256": sha256_of(path)})
+            try:
+                with open(path, encoding="utf-8") as f:
+                    data = jsonc.load(f)
+            except ValueError as e:
+                self.errors.append(f"{source}: 解析失败: {e}")
+                continue
+            if not isinstance(data, dict):
+                self.errors.append(f"{source}: 顶层不是对象")
+                continue
+            for name, node in data.items():
+                if name.startswith("$"):
+                    continue
+                if not isinstance(node, dict):
+                    self.errors.append(f"{source}: 节点 {name} 不是对象")
+                    continue
+                if name in self.nodes:
+                    # MaaFW 不允许同一个资源目录里出现重名节点
+                    self.errors.append(
+                        f"{source}: 节点 {name} 与 {self.origin[name]} 重名"
+                    )
+                    continue
+                self.nodes[name] = node
+                self.origin[name] = source
+
+
+def _typed(value: Any) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+    if isinstance(value, dict):
+        return value.get("type"), value.get("param")
+    return value, None
+
+
+def merge_node(base: Dict[str, Any], overlay: Dict[str, Any]) -> Dict[str, Any]:
+    """Overlay a node of a later bundle onto the same node of an earlier one.
+
+    Fields missing from the overlay are inherited. recognition / action
+    params are merged field by field when the type stays the same, and
+    start from scratch when the overlay switches to another type.
+    """
+    merged = dict(base)
+    for key, value in overlay.items():
+        old = merged.get(key)
+        if key in TYPED_FIELDS and isinstance(value, dict) and isinstance(old, dict):
+            old_type, old_param = _typed(old)
+            new_type, new_param = _typed(value)
+            if new_type is None or new_type == old_type:
+                param = dict(old_param or {})
+                param.update(new_param or {})
+                merged[key] = {"type": old_type, "param": param}
+                continue
+        merged[key] = value
+    return merged
+
+
+def parse_reference(item: Any) -> Optional[Tuple[str, bool]]:
+    """(target, is_anchor) of one next / on_error entry."""
+    if isinstance(item, dict):
+        name = item.get("name")
+        return (name, bool(item.get("anchor"))) if isinstance(name, str) else None
+    if not isinstance(item, str):
+        return None
+    anchor = False
+    while item.startswith("["):
+        end = item.find("]")
+        if end < 0:
+            break
+        anchor = anchor or item[1:end] == "Anchor"
+        item = item[end + 1 :]
+    return item, anchor
+
+
+def node_references(node: Dict[str, Any]) -> Iterator[Tuple[str, str, bool]]:
+    """(field, target, is_anchor) for every reference a node makes."""
+    for field in REFERENCE_FIELDS:
+        items = node.get(field)
+        if items is None:
+            continue
+        for item in items if isinstance(items, list) else [items]:
+            ref = parse_reference(item)
+            if ref is not None:
+                yield field, ref[0], ref[1]
+
+    seen = []
+    for field in TYPED_FIELDS:
+        value = node.get(field)
+        # v1 写法的参数直接放在节点上
+        params = value.get("param") if isinstance(value, dict) else node
+        if any(params is s for s in seen):
+            continue
+        seen.append(params)
+        for key in NODE_NAME_PARAMS:
+            target = (params or {}).get(key)
+            if isinstance(target, str) and target:
+                yield f"{field}.{key}", target, False
+
+
+def anchors_of(nodes: Dict[str, Dict[str, Any]]) -> set:
+    names = set()
+    for node in nodes.values():
+        anchor = node.get("anchor")
+        if isinstance(anchor, str):
+            names.add(anchor)
+        elif isinstance(anchor, (list, dict)):
+            names.update(a for a in anchor if isinstance(a, str))
+    return names
+
+
+def validate(
+    nodes: Dict[str, Dict[str, Any]], entries: Iterable[str] = ()
+) -> List[str]:
+    errors = []
+    anchors = anchors_of(nodes)
+    for name, node in nodes.items():
+        for field, target, is_anchor in node_references(node):
+            known = anchors if is_anchor else nodes
+            if target not in known:
+                kind = "锚点" if is_anchor else "节点"
+                errors.append(f"{name}.{field}: 引用了不存在的{kind} {target}")
+    for entry in entries:
+        if entry not in nodes:
+            errors.append(f"任务入口 {entry} 不存在")
+    return errors
+
+
+def task_entries(interface: Dict[str, Any]) -> List[str]:
+    return sorted(
+        {task["entry"] for task in interface.get("task", []) if "entry" in task}
+    )
+
+
+def build_bundle(
+    name: str,
+    paths: List[Path],
+    entries: Iterable[str] = (),
+    cache: Optional[Dict[Path, ParsedLayer]] = None,
+) -> Tuple[Dict[str, Any], List[str]]:
+    """Merge the layers of one resource; returns (bundle, errors)."""
+    cache = {} if cache is None else cache
+    entries = sorted(entries)
+    nodes: Dict[str, Dict[str, Any]] = {}
+    defined_in: Dict[str, List[int]] = {}
+    sources: List[Dict[str, str]] = []
+    errors: List[str] = []
+
+    for path in paths:
+        if path not in cache:
+            # base 被所有资源共用，只解析一次
+            cache[path] = ParsedLayer(path)
+        layer = cache[path]
+        errors.extend(layer.errors)
+        offset = len(sources)
+        sources.extend(layer.sources)
+        source_index = {s["path"]: offset + i for i, s in enumerate(layer.sources)}
+        for node_name, node in layer.nodes.items():
+            base = nodes.get(node_name)
+            nodes[node_name] = merge_node(base, node) if base else dict(node)
+            defined_in.setdefault(node_name, []).append(
+                source_index[layer.origin[node_name]]
+            )
+
+    errors.extend(validate(nodes, entries))
+    bundle = {
+        "version": BUNDLE_VERSION,
+        "name": name,
+        "locale": paths[-1].name if paths else name,
+        "layers": [relative(p) for p in paths],
+        "sources": sources,
+        "entries": entries,
+        "index": defined_in,
+        "nodes": nodes,
+        "errors": errors,
+    }
+    return bundle, errors
+
+
+def write_bundle(bundle: Dict[str, Any], output_dir: Path) -> Path:
+    output_dir.mkdir(parents=True, exist_ok=True)
+    path = output_dir / f"{bundle['locale']}.json"
+    tmp = path.with_suffix(".json.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(bundle, f, ensure_ascii=False, separators=(",", ":"))
+    tmp.replace(path)
+    return path
+
+
+def load_bundle(path: Path) -> Dict[str, Any]:
+    with open(path, encoding="utf-8") as f:
+        bundle = json.load(f)
+    if bundle.get("version") != BUNDLE_VERSION:
+        raise ValueError(f"{path}: 不支持的 bundle 版本 {bundle.get('version')}")
+    return bundle
+
+
+def is_fresh(bundle: Dict[str, Any]) -> bool:
+    """True if no source file of the bundle was changed, added or removed."""
+    expected = {s["path"]: s["sha256"] for s in bundle.get("sources", [])}
+    current = {}
+    for layer in bundle.get("layers", []):
+        for path in pipeline_files(assets_dir / layer):
+            current[relative(path)] = path
+    if set(current) != set(expected):
+        return False
+    return all(sha256_of(path) == expected[name] for name, path in current.items())
+
+
+def build_all(
+    output_dir: Optional[Path] = default_output_dir,
+    names: Optional[Iterable[str]] = None,
+) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """Build (and write, if output_dir is set) the bundles of interface.json."""
+    interface = load_interface()
+    entries = task_entries(interface)
+    wanted = set(names) if names else None
+    cache: Dict[Path, ParsedLayer] = {}
+    bundles, errors = [], []
+    for name, paths in resource_layers(interface):
+        if wanted is not None and name not in wanted:
+            continue
+        bundle, bundle_errors = build_bundle(name, paths, entries, cache)
+        bundles.append(bundle)
+        errors.extend(f"{name}: {e}" for e in bundle_errors)
+        if output_dir is not None:
+            path = write_bundle(bundle, output_dir)
+            print(f"{name}: {len(bundle['nodes'])} nodes -> {path}")
+    return bundles, errors
+
+
+def load_or_build(
+    output_dir: Path = default_output_dir,
+) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """Reuse bundles whose sources are unchanged, rebuild (and write) the rest."""
+    interface = load_interface()
+    entries = task_entries(interface)
+    cache: Dict[Path, ParsedLayer] = {}
+    bundles, errors = [], []
+    for name, paths in resource_layers(interface):
+        bundle = None
+        path = output_dir / f"{paths[-1].name if paths else name}.json"
+        if path.exists():
+            try:
+                bundle = load_bundle(path)
+            except ValueError:
+                bundle = None
+        layers = [relative(p) for p in paths]
+        if (
+            bundle is None
+            or bundle.get("layers") != layers
+            or bundle.get("entries") != entries
+            or not is_fresh(bundle)
+        ):
+            bundle, _ = build_bundle(name, paths, entries, cache)
+            write_bundle(bundle, output_dir)
+        else:
+            print(f"{name}: pipeline 未变化，复用 {path}")
+        bundles.append(bundle)
+        errors.extend(f"{name}: {e}" for e in bundle["errors"])
+    return bundles, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="合并并校验各资源的 pipeline")
+    parser.add_argument("--output", type=Path, default=default_output_dir)
+    parser.add_argument("--resource", action="append", help="只构建指定资源，可重复")
+    parser.add_argument("--check", action="store_true", help="只校验，不写文件")
+    args = parser.parse_args()
+
+    _, errors = build_all(None if args.check else args.output, args.resource)
+    for error in errors:
+        print(f"Error: {error}")
+    if errors:
+        print(f"{len(errors)} errors.")
+        sys.exit(1)
+    print("Pipeline bundles OK.")
+
+
+if __name__ == "__main__":
+    main()
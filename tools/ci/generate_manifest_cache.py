@@ -6,126 +6,460 @@
 在打包时调用，将远程 manifest 的时间戳信息保存到本地，
 使用户首次启动时可以跳过不必要的检查。
 
-注意：使用 urllib 而不是 requests，因为 CI 环境中的 embed Python 可能没有 requests。
+manifest 树按层并发抓取：每个工作线程对同一主机保持一条 keep-alive 连接，
+已有缓存时带上 ETag / Last-Modified 发条件请求，未变化的 manifest 直接复用
+缓存中的时间戳和子 manifest 列表，耗时随树的深度而不是 manifest 数量增长。
+
+随安装包发布的 manifest_cache.json 只有时间戳；条件请求用到的 ETag、子 manifest
+和文件列表保存在不发布的 build/manifest_http_cache.json 中。
+
+    python tools/ci/generate_manifest_cache.py [output_dir] [--jobs 8]
+        [--base-url URL] [--serve DIR] [--http-cache FILE]
+
+--serve 会在本地启动一个静态 HTTP 服务代替远程 API，用于测试。
+
+注意：使用标准库而不是 requests，因为 CI 环境中的 embed Python 可能没有 requests。
 """
 
+import gzip
 import json
-import urllib.request
-import urllib.error
+import threading
+import time
+import http.client
+import http.server
+import urllib.parse
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import partial
 from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 
 API_BASE_URL = "https://api.1999.fan/api"
 MANIFEST_URL = f"{API_BASE_URL}/manifest.json"
+ROOT_MANIFEST = "manifest.json"
 REQUEST_TIMEOUT = 10
+MAX_WORKERS = 8
+MAX_REDIRECTS = 3
+CACHE_FILE = "manifest_cache.json"
+# 条件请求用的缓存，不随安装包发布
+HTTP_CACHE_FILE = (
+    Path(__file__).parent.parent.parent / "build" / "manifest_http_cache.json"
+)
+# http 缓存保存的字段，304 时据此复用
+HTTP_CACHE_KEYS = ("updated", "children", "files", "etag", "last_modified")
 
 # 忽略的目录（不需要热更新）
 IGNORED_DIRS = {"images"}
 
+# 复用的连接可能已被服务端关闭，遇到这些错误时重连一次
+_STALE_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.CannotSendRequest,
+    ConnectionResetError,
+    BrokenPipeError,
+)
 
-def _fetch_json(opener, url: str) -> dict:
-    """获取 JSON 数据"""
-    with opener.open(url, timeout=REQUEST_TIMEOUT) as response:
-        return json.loads(response.read().decode("utf-8"))
 
+class HttpClient:
+    """
+    线程安全的 GET 客户端，每个线程对每个主机保持一条 keep-alive 连接
 
-def _collect_all_manifests(opener, manifest_path: str, collected: dict):
+    http.client 不读取系统代理设置，与原先不使用代理的 opener 一致（国内服务器直连更快）。
     """
-    递归收集所有 manifest 的 updated 时间戳
+
+    def __init__(self, timeout: float = REQUEST_TIMEOUT):
+        self.timeout = timeout
+        self.requests = 0
+        self.connections = 0
+        self._local = threading.local()
+        self._opened: List[http.client.HTTPConnection] = []
+        self._lock = threading.Lock()
+
+    def _connection(self, scheme: str, netloc: str) -> http.client.HTTPConnection:
+        pool = self._local.__dict__.setdefault("pool", {})
+        conn = pool.get((scheme, netloc))
+        if conn is None:
+            cls = (
+                http.client.HTTPSConnection
+                if scheme == "https"
+                else http.client.HTTPConnection
+            )
+            conn = cls(netloc, timeout=self.timeout)
+            pool[(scheme, netloc)] = conn
+            with self._lock:
+                self._opened.append(conn)
+                self.connections += 1
+        return conn
+
+    def _drop(self, scheme: str, netloc: str) -> None:
+        conn = self._local.pool.pop((scheme, netloc), None)
+        if conn is not None:
+            conn.close()
+
+    def get(
+        self, url: str, headers: Optional[Dict[str, str]] = None
+    ) -> Tuple[int, http.client.HTTPMessage, bytes]:
+        """
+        发送 GET 请求
+
+        Returns:
+            (状态码, 响应头, 响应体)，响应体已解压
+        """
+        headers = {"Accept-Encoding": "gzip", **(headers or {})}
+        for _ in range(MAX_REDIRECTS + 1):
+            parts = urllib.parse.urlsplit(url)
+            path = parts.path or "/"
+            if parts.query:
+                path += "?" + parts.query
+            status, response_headers, body = self._request(
+                parts.scheme, parts.netloc, path, headers
+            )
+            location = response_headers.get("Location")
+            if status in (301, 302, 303, 307, 308) and location:
+                url = urllib.parse.urljoin(url, location)
+                continue
+            if response_headers.get("Content-Encoding") == "gzip":
+                body = gzip.decompress(body)
+            return status, response_headers, body
+        raise http.client.HTTPException(f"Too many redirects: {url}")
+
+    def _request(self, scheme, netloc, path, headers):
+        for attempt in range(2):
+            reused = (scheme, netloc) in self._local.__dict__.get("pool", {})
+            conn = self._connection(scheme, netloc)
+            try:
+                conn.request("GET", path, headers=headers)
+                response = conn.getresponse()
+                body = response.read()
+            except _STALE_ERRORS:
+                self._drop(scheme, netloc)
+                if not reused or attempt:
+                    raise
+                continue
+            except Exception:
+                self._drop(scheme, netloc)
+                raise
+            with self._lock:
+                self.requests += 1
+            if response.will_close:
+                self._drop(scheme, netloc)
+            return response.status, response.headers, body
+
+    def close(self) -> None:
+        with self._lock:
+            for conn in self._opened:
+                conn.close()
+            self._opened.clear()
+
+
+def load_cache(cache_file: Path) -> dict:
+    """读取已有的缓存文件，不存在或损坏时返回空字典"""
+    try:
+        with open(cache_file, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def manifest_files(manifest: dict) -> Dict[str, dict]:
+    """
+    manifest 中列出的文件 {name: {"sha256", "size", "url"}}
+
+    files 可以是 [{"name": ..., "sha256": ..., "size": ...}] 或 {name: {...}}，
+    哈希字段也接受 "hash"，缺少的字段为 None。
+    """
+    files = manifest.get("files") or []
+    if isinstance(files, dict):
+        files = [{"name": name, **(info or {})} for name, info in files.items()]
+    result = {}
+    for info in files:
+        if not isinstance(info, dict) or not info.get("name"):
+            continue
+        digest = info.get("sha256") or info.get("hash")
+        result[info["name"]] = {
+            "sha256": digest.lower() if isinstance(digest, str) else None,
+            "size": info.get("size"),
+            "url": info.get("url"),
+        }
+    return result
+
+
+def _sub_manifests(manifest: dict, is_root: bool) -> List[str]:
+    children = []
+    for dir_info in manifest.get("directories", []):
+        # 跳过忽略的目录
+        if is_root and dir_info.get("name") in IGNORED_DIRS:
+            print(f"  Skipping ignored directory: {dir_info['name']}")
+            continue
+        sub_manifest = dir_info.get("manifest", "")
+        if sub_manifest:
+            children.append(sub_manifest)
+    return children
+
+
+def fetch_manifest(
+    client: HttpClient, base_url: str, manifest_path: str, previous: dict
+) -> dict:
+    """
+    获取一个 manifest，已有缓存时发送条件请求
 
     Args:
-        opener: urllib opener
+        client: HttpClient
+        base_url: API 地址
         manifest_path: manifest 路径（如 "resource/manifest.json"）
-        collected: 收集结果的字典 {manifest_path: updated}
+        previous: 旧缓存中该 manifest 的 http 信息，可为空
+
+    Returns:
+        dict: {"updated", "children", "files", "etag", "last_modified", "not_modified"}
     """
-    url = f"{API_BASE_URL}/{manifest_path}"
-    print(f"  Fetching: {manifest_path}")
+    headers = {}
+    if "files" not in previous:
+        # 旧格式的缓存没有文件列表，不能用 304 复用
+        previous = {}
+    if previous.get("etag"):
+        headers["If-None-Match"] = previous["etag"]
+    if previous.get("last_modified"):
+        headers["If-Modified-Since"] = previous["last_modified"]
 
-    try:
-        manifest = _fetch_json(opener, url)
-        collected[manifest_path] = manifest.get("updated", 0)
+    status, response_headers, body = client.get(f"{base_url}/{manifest_path}", headers)
+    if status == 304 and "updated" in previous:
+        return {**previous, "not_modified": True}
+    if status != 200:
+        raise http.client.HTTPException(f"HTTP {status}")
 
-        # 如果有子目录，递归获取
-        for dir_info in manifest.get("directories", []):
-            sub_manifest = dir_info.get("manifest", "")
-            if sub_manifest:
-                _collect_all_manifests(opener, sub_manifest, collected)
-    except Exception as e:
-        print(f"  Warning: Failed to fetch {manifest_path}: {e}")
+    manifest = json.loads(body.decode("utf-8"))
+    return {
+        "updated": manifest.get("updated", 0),
+        "children": _sub_manifests(manifest, manifest_path == ROOT_MANIFEST),
+        "files": manifest_files(manifest),
+        "etag": response_headers.get("ETag"),
+        "last_modified": response_headers.get("Last-Modified"),
+        "not_modified": False,
+    }
 
 
-def generate_manifest_cache(output_dir: Path) -> bool:
+def crawl_manifests(
+    client: HttpClient,
+    base_url: str = API_BASE_URL,
+    previous: Optional[dict] = None,
+    jobs: int = MAX_WORKERS,
+) -> Dict[str, dict]:
+    """
+    并发遍历 manifest 树
+
+    每个 manifest 一拿到就提交它的子 manifest，同一层的请求同时进行。
+    根 manifest 获取失败时抛出异常，子 manifest 失败只打印警告并跳过。
+
+    Returns:
+        dict: {manifest_path: fetch_manifest 的结果}
+    """
+    previous = previous or {}
+    results: Dict[str, dict] = {}
+    seen = {ROOT_MANIFEST}
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+
+        def submit(path: str):
+            return pool.submit(
+                fetch_manifest, client, base_url, path, previous.get(path, {})
+            )
+
+        futures = {submit(ROOT_MANIFEST): ROOT_MANIFEST}
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                manifest_path = futures.pop(future)
+                try:
+                    entry = future.result()
+                except Exception as e:
+                    if manifest_path == ROOT_MANIFEST:
+                        raise
+                    print(f"  Warning: Failed to fetch {manifest_path}: {e}")
+                    continue
+                state = "not modified" if entry["not_modified"] else "fetched"
+                print(f"  {manifest_path}: {state}")
+                results[manifest_path] = entry
+                for child in entry["children"]:
+                    if child not in seen:
+                        seen.add(child)
+                        futures[submit(child)] = child
+    return results
+
+
+def _manifest_paths(results: Dict[str, dict]) -> List[str]:
+    return [ROOT_MANIFEST] + sorted(p for p in results if p != ROOT_MANIFEST)
+
+
+def build_cache(results: Dict[str, dict]) -> dict:
+    """
+    由 crawl_manifests 的结果构建随安装包发布的缓存数据
+
+    扁平结构，只保存所有 manifest 的时间戳。
+    """
+    paths = _manifest_paths(results)
+    return {
+        "root_updated": results[ROOT_MANIFEST]["updated"],
+        "manifests": {path: results[path]["updated"] for path in paths},
+    }
+
+
+def build_http_cache(results: Dict[str, dict]) -> dict:
+    """
+    由 crawl_manifests 的结果构建 http 缓存
+
+    {manifest_path: ETag / Last-Modified / 子 manifest / 文件列表}，供下次抓取时
+    发条件请求，以及 update_resource.py 比较文件用；不随安装包发布。
+    """
+    return {
+        path: {key: results[path][key] for key in HTTP_CACHE_KEYS}
+        for path in _manifest_paths(results)
+    }
+
+
+def write_cache(cache_file: Path, cache: dict) -> None:
+    """原子地写入缓存文件"""
+    # 确保目录存在
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp = cache_file.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(cache, f, indent=2, ensure_ascii=False)
+    tmp.replace(cache_file)
+
+
+def generate_manifest_cache(
+    output_dir: Path,
+    base_url: str = API_BASE_URL,
+    jobs: int = MAX_WORKERS,
+    http_cache_file: Path = HTTP_CACHE_FILE,
+) -> bool:
     """
     从远程递归获取所有 manifest 并生成缓存文件
 
     Args:
         output_dir: 输出目录（如 install/config）
+        base_url: API 地址，测试时可指向本地服务
+        jobs: 并发请求数
+        http_cache_file: 条件请求用的缓存文件，不放在输出目录中
 
     Returns:
         bool: 是否成功
     """
+    cache_file = output_dir / CACHE_FILE
+    old_http = load_cache(http_cache_file).get("http")
+    client = HttpClient()
+    start = time.perf_counter()
     try:
-        print(f"Fetching root manifest from {MANIFEST_URL}...")
-        # 创建不使用代理的 opener（国内服务器直连更快）
-        no_proxy_handler = urllib.request.ProxyHandler({})
-        opener = urllib.request.build_opener(no_proxy_handler)
+        print(f"Fetching manifests from {base_url} ({jobs} workers)...")
+        results = crawl_manifests(client, base_url, old_http, jobs)
+    except (OSError, http.client.HTTPException, ValueError) as e:
+        print(f"Warning: Failed to fetch root manifest: {e}")
+        print("Skipping manifest cache generation.")
+        return False
+    finally:
+        client.close()
+    elapsed = time.perf_counter() - start
 
-        root_manifest = _fetch_json(opener, MANIFEST_URL)
+    cache = build_cache(results)
+    try:
+        write_cache(cache_file, cache)
+    except OSError as e:
+        print(f"Warning: Failed to write manifest cache: {e}")
+        return False
+    try:
+        write_cache(http_cache_file, {"http": build_http_cache(results)})
+    except OSError as e:
+        # 只影响下次生成时能否使用条件请求
+        print(f"Warning: Failed to write manifest http cache: {e}")
 
-        # 构建缓存数据（扁平结构，保存所有 manifest 的时间戳）
-        cache = {
-            "root_updated": root_manifest.get("updated", 0),
-            "manifests": {"manifest.json": root_manifest.get("updated", 0)},
-        }
+    not_modified = sum(entry["not_modified"] for entry in results.values())
+    print(f"\nGenerated manifest cache: {cache_file}")
+    print(f"  root_updated: {cache['root_updated']}")
+    print(
+        f"  Total manifests cached: {len(cache['manifests'])} "
+        f"({not_modified} not modified, {client.requests} requests "
+        f"over {client.connections} connections, {elapsed:.2f}s)"
+    )
+    for path, updated in cache["manifests"].items():
+        print(f"    {path}: {updated}")
+    return True
 
-        # 递归收集所有子 manifest 的时间戳
-        print("Collecting all sub-manifests...")
-        for dir_info in root_manifest.get("directories", []):
-            dir_name = dir_info["name"]
 
-            # 跳过忽略的目录
-            if dir_name in IGNORED_DIRS:
-                print(f"  Skipping ignored directory: {dir_name}")
-                continue
+class _StaticHandler(http.server.SimpleHTTPRequestHandler):
+    # HTTP/1.1 才能保持连接；SimpleHTTPRequestHandler 已支持 If-Modified-Since
+    protocol_version = "HTTP/1.1"
 
-            sub_manifest = dir_info.get("manifest", "")
-            if sub_manifest:
-                _collect_all_manifests(opener, sub_manifest, cache["manifests"])
+    def end_headers(self):
+        if getattr(self, "_etag", None):
+            self.send_header("ETag", self._etag)
+        super().end_headers()
 
-        # 确保目录存在
-        output_dir.mkdir(parents=True, exist_ok=True)
+    def send_head(self):
+        path = Path(self.translate_path(self.path))
+        self._etag = None
+        if path.is_file():
+            stat = path.stat()
+            self._etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+            if self.headers.get("If-None-Match") == self._etag:
+                self.send_response(304)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return None
+        return super().send_head()
 
-        # 写入缓存文件
-        cache_file = output_dir / "manifest_cache.json"
-        with open(cache_file, "w", encoding="utf-8") as f:
-            json.dump(cache, f, indent=2, ensure_ascii=False)
+    def log_message(self, format, *args):
+        pass
 
-        print(f"\nGenerated manifest cache: {cache_file}")
-        print(f"  root_updated: {cache['root_updated']}")
-        print(f"  Total manifests cached: {len(cache['manifests'])}")
-        for path, updated in cache["manifests"].items():
-            print(f"    {path}: {updated}")
 
-        return True
+def serve_directory(
+    root: Path, port: int = 0
+) -> Tuple[http.server.ThreadingHTTPServer, str]:
+    """
+    在后台线程中用本地目录模拟 manifest API
 
-    except urllib.error.URLError as e:
-        print(f"Warning: Failed to fetch manifest (URL error): {e}")
-        print("Skipping manifest cache generation.")
-        return False
-    except Exception as e:
-        print(f"Warning: Failed to generate manifest cache: {e}")
-        return False
+    目录结构与远程一致，例如 root/manifest.json、root/resource/manifest.json。
+
+    Returns:
+        (server, base_url)，用完后调用 server.shutdown()
+    """
+    handler = partial(_StaticHandler, directory=str(root))
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
 
 
 if __name__ == "__main__":
+    import argparse
     import sys
 
-    # 支持命令行指定输出目录
-    if len(sys.argv) > 1:
-        output_dir = Path(sys.argv[1])
-    else:
-        # 默认输出到 install/config
-        script_dir = Path(__file__).parent
-        output_dir = script_dir.parent.parent / "install" / "config"
+    parser = argparse.ArgumentParser(description="生成初始 manifest 缓存")
+    # 默认输出到 install/config
+    parser.add_argument(
+        "output_dir",
+        nargs="?",
+        type=Path,
+        default=Path(__file__).parent.parent.parent / "install" / "config",
+    )
+    parser.add_argument("--jobs", type=int, default=MAX_WORKERS, help="并发请求数")
+    parser.add_argument("--base-url", default=API_BASE_URL, help="API 地址")
+    parser.add_argument(
+        "--serve", type=Path, help="用本地目录启动测试服务，代替 --base-url"
+    )
+    parser.add_argument(
+        "--http-cache",
+        type=Path,
+        default=HTTP_CACHE_FILE,
+        help="条件请求用的缓存文件（不随安装包发布）",
+    )
+    args = parser.parse_args()
 
-    success = generate_manifest_cache(output_dir)
+    base_url = args.base_url
+    server = None
+    if args.serve:
+        server, base_url = serve_directory(args.serve)
+    try:
+        success = generate_manifest_cache(
+            args.output_dir, base_url, args.jobs, args.http_cache
+        )
+    finally:
+        if server is not None:
+            server.shutdown()
     sys.exit(0 if success else 1)
@@ -0,0 +1,340 @@
+"""Static analysis of the merged pipeline graph of every resource.
+
+Builds the node graph of each resource in interface.json (from the bundles
+of build_pipeline_bundle.py, plus the pipeline_override of tasks / options)
+and reports:
+
+- unreachable nodes: not reachable from any task entry, and not named in
+  the agent code (custom recognitions / actions run nodes by name)
+- cycles: strongly connected components of the next / on_error graph
+- fan-out cost: MaaFW tries every candidate of a node's next list on each
+  frame until one hits, so the worst case per frame is all of them. Each
+  candidate is weighed by its recognition type and ROI area, relative to
+  one full-frame template match.
+
+    python tools/ci/pipeline_graph.py [--resource NAME] [--top 15] [--json out.json]
+"""
+
+import argparse
+import ast
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from build_pipeline_bundle import (
+    anchors_of,
+    assets_dir,
+    default_output_dir,
+    load_interface,
+    load_or_build,
+    merge_node,
+    parse_reference,
+)
+
+agent_dir = assets_dir.parent / "agent"
+
+FRAME_AREA = 1280 * 720
+# 相对一次全屏模板匹配的耗时权重，只用于排序，不是实测值
+RECOGNITION_COST = {
+    "DirectHit": 0.0,
+    "TemplateMatch": 1.0,
+    "FeatureMatch": 4.0,
+    "ColorMatch": 0.3,
+    "OCR": 8.0,
+    "NeuralNetworkClassify": 6.0,
+    "NeuralNetworkDetect": 10.0,
+    "Custom": 8.0,
+}
+OCR_TYPES = ("OCR",)
+TEMPLATE_TYPES = ("TemplateMatch", "FeatureMatch")
+# OCR / 模板匹配的耗时不会随 ROI 缩小到 0，保留一个下限
+MIN_AREA_FACTOR = 0.05
+# 每帧都要尝试的候选列表
+FRAME_FIELDS = ("next", "interrupt")
+EDGE_FIELDS = ("next", "interrupt", "on_error")
+
+
+def recognition_of(node: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+    reco = node.get("recognition", "DirectHit")
+    if isinstance(reco, dict):
+        return reco.get("type") or "DirectHit", reco.get("param") or {}
+    return reco or "DirectHit", node
+
+
+def roi_area(roi: Any) -> int:
+    """Pixels searched; node-name / missing ROIs count as the full frame."""
+    if not isinstance(roi, list) or len(roi) != 4:
+        return FRAME_AREA
+    x, y, w, h = roi
+    w = w if w > 0 else 1280 - x
+    h = h if h > 0 else 720 - y
+    return max(0, min(w, 1280)) * max(0, min(h, 720))
+
+
+def recognition_cost(node: Dict[str, Any]) -> Dict[str, Any]:
+    """Estimated cost of running the node's recognition once."""
+    reco_type, params = recognition_of(node)
+    area = roi_area(params.get("roi"))
+    templates = params.get("template") or []
+    count = len(templates) if isinstance(templates, list) else 1
+    if reco_type not in TEMPLATE_TYPES:
+        count = 1
+    weight = RECOGNITION_COST.get(reco_type, RECOGNITION_COST["Custom"])
+    factor = max(area / FRAME_AREA, MIN_AREA_FACTOR)
+    return {
+        "type": reco_type,
+        "ocr": 1 if reco_type in OCR_TYPES else 0,
+        "template": count if reco_type in TEMPLATE_TYPES else 0,
+        "area": area,
+        "cost": weight * count * (factor if reco_type != "Custom" else 1.0),
+    }
+
+
+class PipelineGraph:
+    """Node graph of one resource."""
+
+    def __init__(
+        self,
+        name: str,
+        nodes: Dict[str, Dict[str, Any]],
+        entries: Iterable[str],
+        code_refs: Iterable[str] = (),
+    ):
+        self.name = name
+        self.nodes = nodes
+        self.entries = [e for e in entries if e in nodes]
+        self.code_refs = sorted(set(code_refs) & set(nodes))
+        self.anchors: Dict[str, List[str]] = {}
+        for node_name, node in nodes.items():
+            for anchor in anchors_of({node_name: node}):
+                self.anchors.setdefault(anchor, []).append(node_name)
+        self.edges: Dict[str, List[Tuple[str, str]]] = {
+            node_name: list(self._edges(node)) for node_name, node in nodes.items()
+        }
+
+    def _targets(self, item: Any) -> List[str]:
+        ref = parse_reference(item)
+        if ref is None:
+            return []
+        target, is_anchor = ref
+        # 锚点在运行时才确定指向哪个节点，这里按所有可能的节点算
+        return self.anchors.get(target, []) if is_anchor else [target]
+
+    def _edges(self, node: Dict[str, Any]) -> Iterator[Tuple[str, str]]:
+        for field in EDGE_FIELDS:
+            items = node.get(field) or []
+            for item in items if isinstance(items, list) else [items]:
+                for target in self._targets(item):
+                    if target in self.nodes:
+                        yield field, target
+        # roi / target 写节点名时会用到该节点的识别结果
+        _, params = recognition_of(node)
+        for key in ("roi", "target"):
+            if isinstance(params.get(key), str) and params[key] in self.nodes:
+                yield key, params[key]
+
+    def reachable(self) -> Set[str]:
+        seen: Set[str] = set()
+        stack = list(self.entries) + list(self.code_refs)
+        while stack:
+            node_name = stack.pop()
+            if node_name in seen:
+                continue
+            seen.add(node_name)
+            stack.extend(t for _, t in self.edges[node_name] if t not in seen)
+        return seen
+
+    def unreachable(self) -> List[str]:
+        reachable = self.reachable()
+        return sorted(n for n in self.nodes if n not in reachable)
+
+    def cycles(self) -> List[List[str]]:
+        """Strongly connected components with a cycle (Tarjan, iterative)."""
+        graph = {
+            n: [t for field, t in edges if field in EDGE_FIELDS]
+            for n, edges in self.edges.items()
+        }
+        index: Dict[str, int] = {}
+        low: Dict[str, int] = {}
+        on_stack: Set[str] = set()
+        stack: List[str] = []
+        result = []
+        counter = 0
+
+        for root in graph:
+            if root in index:
+                continue
+            work = [(root, 0)]
+            while work:
+                node_name, i = work.pop()
+                if i == 0:
+                    index[node_name] = low[node_name] = counter
+                    counter += 1
+                    stack.append(node_name)
+                    on_stack.add(node_name)
+                recurse = False
+                targets = graph[node_name]
+                while i < len(targets):
+                    target = targets[i]
+                    i += 1
+                    if target not in index:
+                        work.append((node_name, i))
+                        work.append((target, 0))
+                        recurse = True
+                        break
+                    if target in on_stack:
+                        low[node_name] = min(low[node_name], index[target])
+                if recurse:
+                    continue
+                if low[node_name] == index[node_name]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node_name:
+                            break
+                    if len(component) > 1 or node_name in graph[node_name]:
+                        result.append(sorted(component))
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node_name])
+        return sorted(result, key=len, reverse=True)
+
+    def frame_cost(self, node_name: str) -> Dict[str, Any]:
+        """Worst case per frame while waiting in node_name: every candidate misses."""
+        node = self.nodes[node_name]
+        totals = {"candidates": 0, "ocr": 0, "template": 0, "area": 0, "cost": 0.0}
+        seen = set()
+        for field in FRAME_FIELDS:
+            items = node.get(field) or []
+            for item in items if isinstance(items, list) else [items]:
+                for target in self._targets(item):
+                    if target in seen or target not in self.nodes:
+                        continue
+                    seen.add(target)
+                    cost = recognition_cost(self.nodes[target])
+                    totals["candidates"] += 1
+                    for key in ("ocr", "template", "area", "cost"):
+                        totals[key] += cost[key]
+        return totals
+
+    def report(self, top: int = 15) -> Dict[str, Any]:
+        costs = {n: self.frame_cost(n) for n in self.nodes}
+        ranked = sorted(costs.items(), key=lambda item: -item[1]["cost"])
+        return {
+            "name": self.name,
+            "nodes": len(self.nodes),
+            "entries": self.entries,
+            "unreachable": self.unreachable(),
+            "cycles": self.cycles(),
+            "fan_out": [{"node": n, **c} for n, c in ranked[:top] if c["candidates"]],
+        }
+
+
+def code_references(names: Set[str], root: Path = agent_dir) -> Set[str]:
+    """Node names used as string literals in the agent code."""
+    found = set()
+    for path in root.rglob("*.py"):
+        try:
+            tree = ast.parse(path.read_text(encoding="utf-8"))
+        except (SyntaxError, UnicodeDecodeError):
+            continue
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Constant) and isinstance(node.value, str):
+                if node.value in names:
+                    found.add(node.value)
+    return found
+
+
+def interface_overrides(interface: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """pipeline_override of every task and option case."""
+    overrides = [
+        task["pipeline_override"]
+        for task in interface.get("task", [])
+        if task.get("pipeline_override")
+    ]
+    for option in interface.get("option", {}).values():
+        for case in option.get("cases", []):
+            if case.get("pipeline_override"):
+                overrides.append(case["pipeline_override"])
+    return overrides
+
+
+def apply_overrides(
+    nodes: Dict[str, Dict[str, Any]], overrides: List[Dict[str, Any]]
+) -> Dict[str, Dict[str, Any]]:
+    """Nodes with every override applied; next lists of all cases are joined
+    so the graph covers each option the user may pick."""
+    merged = dict(nodes)
+    for override in overrides:
+        for node_name, data in override.items():
+            node = merge_node(merged.get(node_name, {}), data)
+            for field in EDGE_FIELDS:
+                old = (merged.get(node_name) or {}).get(field)
+                if field in data and isinstance(old, list):
+                    node[field] = old + [
+                        item for item in data[field] if item not in old
+                    ]
+            merged[node_name] = node
+    return merged
+
+
+def analyze(
+    names: Optional[Iterable[str]] = None, top: int = 15
+) -> List[Dict[str, Any]]:
+    interface = load_interface()
+    overrides = interface_overrides(interface)
+    bundles, _ = load_or_build(default_output_dir)
+    wanted = set(names) if names else None
+    reports = []
+    for bundle in bundles:
+        if wanted is not None and bundle["name"] not in wanted:
+            continue
+        nodes = apply_overrides(bundle["nodes"], overrides)
+        graph = PipelineGraph(
+            bundle["name"],
+            nodes,
+            bundle["entries"],
+            code_references(set(nodes)),
+        )
+        reports.append(graph.report(top))
+    return reports
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"== {report['name']}: {report['nodes']} nodes")
+    print(f"Unreachable ({len(report['unreachable'])}):")
+    for name in report["unreachable"]:
+        print(f"  {name}")
+    print(f"Cycles ({len(report['cycles'])}):")
+    for cycle in report["cycles"]:
+        print(
+            f"  [{len(cycle)}] {' / '.join(cycle[:6])}{' ...' if len(cycle) > 6 else ''}"
+        )
+    print("Worst-case recognitions per frame:")
+    for item in report["fan_out"]:
+        print(
+            f"  {item['cost']:6.2f}  {item['node']}: {item['candidates']} candidates, "
+            f"OCR {item['ocr']}, template {item['template']}, "
+            f"ROI {item['area'] / FRAME_AREA:.2f} frames"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分析 pipeline 节点图")
+    parser.add_argument("--resource", action="append", help="只分析指定资源，可重复")
+    parser.add_argument("--top", type=int, default=15, help="列出开销最大的节点数")
+    parser.add_argument("--json", type=Path, help="把结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    reports = analyze(args.resource, args.top)
+    for report in reports:
+        print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(reports, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
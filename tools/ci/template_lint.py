@@ -0,0 +1,245 @@
+"""Template metadata and ROI lint.
+
+Templates cut with MaaFW's image cropper are named
+
+    爬塔_商店主界面__442_338_66_145__392_288_166_245.png
+    <name>__<x>_<y>_<w>_<h>__<roi x>_<roi y>_<roi w>_<roi h>.png
+
+i.e. the box the template was cut from (on a 1280x720 screenshot) and the
+search ROI suggested for it. This tool only reports; it changes nothing
+that MaaFW or the agent load:
+
+- warns when a TemplateMatch node's roi is missing or much larger than
+  the ROIs its template names imply, or does not contain their boxes
+- checks the image size against the encoded box
+- reports border rows / columns that are pure green (ignored by
+  green_mask anyway), i.e. the minimal box the template could be cut to
+
+    python tools/ci/template_lint.py [--roi-only] [--ratio 4]
+
+The image checks need opencv-python; the roi lint does not.
+"""
+
+import argparse
+import re
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from build_pipeline_bundle import (
+    assets_dir,
+    default_output_dir,
+    load_or_build,
+    relative,
+)
+
+FRAME_WIDTH, FRAME_HEIGHT = 1280, 720
+GREEN = (0, 255, 0)  # BGR
+IMAGE_SUFFIXES = (".png", ".jpg", ".jpeg", ".bmp")
+# pipeline roi 面积超过文件名 ROI 的倍数时警告
+DEFAULT_RATIO = 4.0
+
+_ENCODED_NAME = re.compile(
+    r"^(?P<name>.+?)__(?P<box>\d+_\d+_\d+_\d+)__(?P<roi>\d+_\d+_\d+_\d+)$"
+)
+
+Box = Tuple[int, int, int, int]
+
+
+class TemplateMeta(NamedTuple):
+    name: str
+    box: Box
+    roi: Box
+
+
+def parse_template_name(path: str) -> Optional[TemplateMeta]:
+    """Box / ROI encoded in a template filename, or None."""
+    match = _ENCODED_NAME.match(Path(path).stem)
+    if not match:
+        return None
+    box = tuple(int(v) for v in match["box"].split("_"))
+    roi = tuple(int(v) for v in match["roi"].split("_"))
+    return TemplateMeta(match["name"], box, roi)
+
+
+def _area(box: Box) -> int:
+    return max(box[2], 0) * max(box[3], 0)
+
+
+def _contains(outer: Box, inner: Box) -> bool:
+    return (
+        outer[0] <= inner[0]
+        and outer[1] <= inner[1]
+        and inner[0] + inner[2] <= outer[0] + outer[2]
+        and inner[1] + inner[3] <= outer[1] + outer[3]
+    )
+
+
+def _union(boxes: List[Box]) -> Box:
+    x0 = min(b[0] for b in boxes)
+    y0 = min(b[1] for b in boxes)
+    x1 = max(b[0] + b[2] for b in boxes)
+    y1 = max(b[1] + b[3] for b in boxes)
+    return x0, y0, x1 - x0, y1 - y0
+
+
+def _pipeline_roi(roi: Any) -> Optional[Box]:
+    """Pipeline roi as a box; None for node-name ROIs (resolved at runtime)."""
+    if roi is None:
+        return 0, 0, FRAME_WIDTH, FRAME_HEIGHT
+    if not isinstance(roi, list) or len(roi) != 4:
+        return None
+    x, y, w, h = roi
+    return x, y, (w if w > 0 else FRAME_WIDTH - x), (h if h > 0 else FRAME_HEIGHT - y)
+
+
+def _template_params(node: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    reco = node.get("recognition")
+    if isinstance(reco, dict):
+        if reco.get("type") != "TemplateMatch":
+            return None
+        return reco.get("param") or {}
+    return node if reco == "TemplateMatch" else None
+
+
+def lint_rois(
+    nodes: Dict[str, Dict[str, Any]], ratio: float = DEFAULT_RATIO
+) -> List[str]:
+    warnings = []
+    for name, node in nodes.items():
+        params = _template_params(node)
+        if params is None:
+            continue
+        templates = params.get("template") or []
+        if isinstance(templates, str):
+            templates = [templates]
+        metas = [m for m in map(parse_template_name, templates) if m]
+        if not metas:
+            continue
+
+        roi = _pipeline_roi(params.get("roi"))
+        if roi is None:
+            continue
+        implied = _union([m.roi for m in metas])
+        if "roi" not in params:
+            warnings.append(
+                f"{name}: 没有设置 roi，整屏搜索；模板文件名建议 {list(implied)}"
+            )
+        elif _area(roi) > _area(implied) * ratio:
+            warnings.append(
+                f"{name}: roi {list(roi)} 是模板文件名 ROI {list(implied)} 的 "
+                f"{_area(roi) / _area(implied):.1f} 倍"
+            )
+        for meta in metas:
+            if not _contains(roi, meta.box):
+                warnings.append(
+                    f"{name}: roi {list(roi)} 不包含模板 {meta.name} 的位置 {list(meta.box)}"
+                )
+    return warnings
+
+
+def template_files(layers: List[str]) -> Iterator[Path]:
+    for layer in layers:
+        image_dir = assets_dir / layer / "image"
+        if image_dir.is_dir():
+            for path in sorted(image_dir.rglob("*")):
+                if path.suffix.lower() in IMAGE_SUFFIXES:
+                    yield path
+
+
+def _import_cv2():
+    try:
+        import cv2
+    except ImportError as e:
+        raise SystemExit("检查模板图片需要 opencv-python，或使用 --roi-only") from e
+    return cv2
+
+
+def _read_image(cv2, path: Path):
+    import numpy as np
+
+    # cv2.imread 不支持 Windows 上的中文路径
+    return cv2.imdecode(np.fromfile(str(path), dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+def trim_green(image) -> Tuple[Any, Box]:
+    """Drop border rows / columns that are entirely pure green.
+
+    Returns the trimmed image and its (x, y, w, h) inside the original.
+    """
+    import numpy as np
+
+    keep = np.any(image != np.array(GREEN, dtype=image.dtype), axis=2)
+    rows = np.flatnonzero(keep.any(axis=1))
+    cols = np.flatnonzero(keep.any(axis=0))
+    if rows.size == 0 or cols.size == 0:
+        return image, (0, 0, image.shape[1], image.shape[0])
+    y0, y1, x0, x1 = rows[0], rows[-1] + 1, cols[0], cols[-1] + 1
+    return image[y0:y1, x0:x1], (int(x0), int(y0), int(x1 - x0), int(y1 - y0))
+
+
+def template_entry(cv2, path: Path) -> Dict[str, Any]:
+    """Image size, green trim and the box / roi encoded in the filename."""
+    image = _read_image(cv2, path)
+    if image is None:
+        raise RuntimeError(f"无法读取模板 {path}")
+    _, trim = trim_green(image)
+    entry = {"size": [int(image.shape[1]), int(image.shape[0])], "trim": list(trim)}
+    meta = parse_template_name(path.name)
+    if meta:
+        entry["box"] = list(meta.box)
+        entry["roi"] = list(meta.roi)
+    return entry
+
+
+def size_warnings(path: Path, entry: Dict[str, Any]) -> List[str]:
+    warnings = []
+    box = entry.get("box")
+    if box and entry["size"] != box[2:]:
+        warnings.append(
+            f"{relative(path)}: 图片尺寸 {entry['size']} 与文件名中的 {box[2:]} 不一致"
+        )
+    trim = entry["trim"]
+    if trim[2:] != entry["size"]:
+        trimmed = [trim[0] + (box[0] if box else 0), trim[1] + (box[1] if box else 0)]
+        warnings.append(
+            f"{relative(path)}: 去掉绿色边框后为 {trim[2]}x{trim[3]}，"
+            f"位于 {trimmed + trim[2:]}"
+        )
+    return warnings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="模板与 roi 检查")
+    parser.add_argument(
+        "--roi-only", action="store_true", help="只检查 roi，不读取模板图片"
+    )
+    parser.add_argument(
+        "--ratio", type=float, default=DEFAULT_RATIO, help="roi 面积警告倍数"
+    )
+    args = parser.parse_args()
+
+    bundles, _ = load_or_build(default_output_dir)
+
+    warnings = []
+    layers = []
+    for bundle in bundles:
+        for warning in lint_rois(bundle["nodes"], args.ratio):
+            if warning not in warnings:
+                warnings.append(warning)
+        layers.extend(l for l in bundle["layers"] if l not in layers)
+
+    if not args.roi_only:
+        cv2 = _import_cv2()
+        total = 0
+        for path in template_files(layers):
+            warnings.extend(size_warnings(path, template_entry(cv2, path)))
+            total += 1
+        print(f"{total} templates checked.")
+
+    for warning in warnings:
+        print(f"Warning: {warning}")
+    print(f"{len(warnings)} warnings.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,488 @@
+# -*- coding: utf-8 -*-
+
+"""
+按文件增量更新资源
+
+比较远程 manifest 与上次更新时记录的文件列表及本地文件的 sha256，只下载内容
+变化的 pipeline / 图片 / 模型文件：
+
+1. 并发抓取 manifest 树，未变化的 manifest 用条件请求直接复用缓存
+2. 找出哈希与本地不同的文件，以及远程已删除的文件
+3. 按 sha256 并发下载到 .update/objects/<sha256>，校验哈希和大小；
+   本地已有相同内容的文件直接复制，同一内容只下载一次
+4. 全部下载并校验成功后才写入日志 .update/journal.json，再逐个 os.replace
+   到目标位置；中途退出时，下次启动按日志继续完成替换，不会留下新旧混杂的资源
+
+config/manifest_cache.json 仍只写入时间戳（与安装包中的格式相同）；manifest 的
+http 缓存和本地文件哈希属于本机状态，保存在 .update/state.json，不写入 config。
+
+manifest 中的文件列表格式：
+
+    {"updated": 1700000000, "directories": [...],
+     "files": [{"name": "pipeline/a.json", "sha256": "...", "size": 123}]}
+
+文件地址默认为 <base_url>/<manifest 所在目录>/<name>，也可以用 "url" 指定。
+
+    python tools/ci/update_resource.py [--root install] [--jobs 8]
+        [--base-url URL] [--serve DIR] [--dry-run]
+    python tools/ci/update_resource.py --make-manifests DIR
+
+--make-manifests 为目录下的每个子目录生成 manifest.json，配合 --serve 在本地测试。
+"""
+
+import hashlib
+import json
+import os
+import posixpath
+import shutil
+import sys
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+sys.path.append(str(Path(__file__).parent))
+
+from generate_manifest_cache import (
+    API_BASE_URL,
+    CACHE_FILE,
+    MAX_WORKERS,
+    HttpClient,
+    build_cache,
+    build_http_cache,
+    crawl_manifests,
+    load_cache,
+    serve_directory,
+    write_cache,
+)
+
+# 只更新这些目录下的文件
+UPDATE_PREFIXES = ("resource/",)
+UPDATE_DIR = ".update"
+# 本机状态：manifest 的 http 缓存和本地文件哈希
+STATE_FILE = "state.json"
+CHUNK_SIZE = 1 << 16
+
+
+class UpdateError(Exception):
+    pass
+
+
+def _sha256_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _local_path(manifest_path: str, name: str) -> Optional[str]:
+    """manifest 中文件相对安装目录的路径，越出安装目录时返回 None"""
+    path = posixpath.normpath(posixpath.join(posixpath.dirname(manifest_path), name))
+    if path.startswith("../") or path == ".." or posixpath.isabs(path):
+        return None
+    return path
+
+
+def remote_files(
+    results: Dict[str, dict], base_url: str
+) -> Dict[str, Tuple[dict, bool]]:
+    """
+    所有 manifest 中需要更新的文件
+
+    Returns:
+        dict: {相对路径: (文件信息含 "url", 所在 manifest 是否未变化)}
+    """
+    files = {}
+    for manifest_path, entry in results.items():
+        manifest_url = f"{base_url}/{manifest_path}"
+        for name, info in (entry.get("files") or {}).items():
+            path = _local_path(manifest_path, name)
+            if path is None:
+                print(f"  Warning: Ignored file outside root: {name}")
+                continue
+            if not path.startswith(UPDATE_PREFIXES):
+                continue
+            url = urllib.parse.urljoin(manifest_url, info["url"] or name)
+            files[path] = ({**info, "url": url}, entry.get("not_modified", False))
+    return files
+
+
+class LocalIndex:
+    """本地文件的 sha256，大小和修改时间不变时不重新计算"""
+
+    def __init__(self, root: Path, cached: Optional[dict] = None):
+        self.root = root
+        self.entries: Dict[str, list] = dict(cached or {})
+
+    def sha256(self, path: str) -> Optional[str]:
+        file = self.root / path
+        try:
+            stat = file.stat()
+        except OSError:
+            self.entries.pop(path, None)
+            return None
+        cached = self.entries.get(path)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2]
+        digest = _sha256_file(file)
+        self.entries[path] = [stat.st_size, stat.st_mtime_ns, digest]
+        return digest
+
+    def find(self, digest: str) -> Optional[Path]:
+        """本地已有的相同内容的文件"""
+        for path, entry in self.entries.items():
+            if entry[2] == digest and (self.root / path).is_file():
+                return self.root / path
+        return None
+
+
+def plan_update(
+    root: Path,
+    files: Dict[str, Tuple[dict, bool]],
+    old_files: Dict[str, dict],
+    index: LocalIndex,
+) -> Tuple[Dict[str, dict], List[str]]:
+    """
+    比较远程与本地文件
+
+    Args:
+        files: remote_files 的结果
+        old_files: 上次更新时远程的文件列表 {相对路径: 文件信息}
+        index: 本地文件哈希
+
+    Returns:
+        (需要下载的文件 {相对路径: 文件信息}, 需要删除的文件)
+    """
+    changed = {}
+    for path, (info, not_modified) in files.items():
+        if info["sha256"]:
+            if index.sha256(path) != info["sha256"]:
+                changed[path] = info
+            continue
+        # 没有哈希的文件只能比较大小，并在 manifest 变化时重新下载
+        local = root / path
+        if (
+            not local.is_file()
+            or (info["size"] is not None and local.stat().st_size != info["size"])
+            or (not not_modified and old_files.get(path) != info)
+        ):
+            changed[path] = info
+
+    removed = [
+        path
+        for path in sorted(old_files)
+        if path not in files and (root / path).is_file()
+    ]
+    return changed, removed
+
+
+class Downloader:
+    """按 sha256 去重、并发下载到对象目录并校验"""
+
+    def __init__(self, client: HttpClient, objects_dir: Path, index: LocalIndex):
+        self.client = client
+        self.objects_dir = objects_dir
+        self.index = index
+        self.downloaded = 0
+        self.reused = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+
+    def _count(self, reused: int = 0, downloaded: int = 0, size: int = 0) -> None:
+        with self._lock:
+            self.reused += reused
+            self.downloaded += downloaded
+            self.bytes += size
+
+    def object_path(self, info: dict, path: str) -> Path:
+        key = info["sha256"] or hashlib.sha256(path.encode("utf-8")).hexdigest()
+        return self.objects_dir / key
+
+    def _verify(self, file: Path, info: dict) -> bool:
+        if info["size"] is not None and file.stat().st_size != info["size"]:
+            return False
+        return not info["sha256"] or _sha256_file(file) == info["sha256"]
+
+    def fetch(self, path: str, info: dict) -> Path:
+        target = self.object_path(info, path)
+        # 上次下载失败时已校验过的对象可以直接用
+        if target.is_file() and info["sha256"] and self._verify(target, info):
+            self._count(reused=1)
+            return target
+
+        tmp = target.with_name(f"{target.name}.{os.getpid()}.part")
+        source = self.index.find(info["sha256"]) if info["sha256"] else None
+        if source is not None:
+            shutil.copyfile(source, tmp)
+            self._count(reused=1)
+        else:
+            status, _, body = self.client.get(info["url"])
+            if status != 200:
+                raise UpdateError(f"{path}: HTTP {status}")
+            tmp.write_bytes(body)
+            self._count(downloaded=1, size=len(body))
+
+        if not self._verify(tmp, info):
+            tmp.unlink()
+            raise UpdateError(f"{path}: 哈希或大小校验失败")
+        tmp.replace(target)
+        return target
+
+    def fetch_all(self, changed: Dict[str, dict], jobs: int) -> Dict[str, Path]:
+        """下载所有文件，返回 {相对路径: 对象文件}；任一失败则抛出 UpdateError"""
+        if not changed:
+            return {}
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        # 相同内容只下载一次
+        unique: Dict[Path, Tuple[str, dict]] = {}
+        for path, info in changed.items():
+            unique.setdefault(self.object_path(info, path), (path, info))
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(self.fetch, p, i) for p, i in unique.values()]
+            errors = []
+            for future in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    errors.append(str(e))
+        if errors:
+            raise UpdateError("；".join(errors))
+        return {path: self.object_path(info, path) for path, info in changed.items()}
+
+
+def _journal_path(root: Path) -> Path:
+    return root / UPDATE_DIR / "journal.json"
+
+
+def _state_path(root: Path) -> Path:
+    return root / UPDATE_DIR / STATE_FILE
+
+
+def _apply_journal(root: Path, journal: dict) -> None:
+    """按日志替换 / 删除文件并写入新缓存和状态，可重复执行"""
+    for staged, path in journal["replace"]:
+        staged_file = root / staged
+        if staged_file.exists():
+            (root / path).parent.mkdir(parents=True, exist_ok=True)
+            staged_file.replace(root / path)
+    for path in journal["remove"]:
+        try:
+            (root / path).unlink()
+        except FileNotFoundError:
+            pass
+    write_cache(root / "config" / CACHE_FILE, journal["cache"])
+    write_cache(_state_path(root), journal["state"])
+    _journal_path(root).unlink()
+    # 状态文件保留，下载和暂存的文件已经用不到了
+    for name in ("staging", "objects"):
+        shutil.rmtree(root / UPDATE_DIR / name, ignore_errors=True)
+
+
+def recover(root: Path) -> bool:
+    """上次更新在替换途中退出时继续完成；返回是否有未完成的更新"""
+    journal_path = _journal_path(root)
+    if not journal_path.exists():
+        return False
+    with open(journal_path, encoding="utf-8") as f:
+        journal = json.load(f)
+    print(f"Resuming interrupted update ({len(journal['replace'])} files)...")
+    _apply_journal(root, journal)
+    return True
+
+
+def swap_in(
+    root: Path,
+    objects: Dict[str, Path],
+    removed: List[str],
+    cache: dict,
+    state: dict,
+) -> None:
+    """先把所有文件放到 .update/staging，写入日志后再替换到目标位置"""
+    staging = root / UPDATE_DIR / "staging"
+    replace = []
+    for path, obj in sorted(objects.items()):
+        staged = staging / path
+        staged.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(obj, staged)
+        replace.append([staged.relative_to(root).as_posix(), path])
+
+    journal = {"replace": replace, "remove": removed, "cache": cache, "state": state}
+    tmp = _journal_path(root).with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(journal, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    # 日志落盘之后的替换即使中断，下次也会继续完成
+    tmp.replace(_journal_path(root))
+    _apply_journal(root, journal)
+
+
+def update_resources(
+    root: Path,
+    base_url: str = API_BASE_URL,
+    jobs: int = MAX_WORKERS,
+    dry_run: bool = False,
+) -> bool:
+    """
+    增量更新 root 下的资源文件
+
+    Args:
+        root: 安装目录（包含 resource/ 和 config/）
+        base_url: API 地址，测试时可指向本地服务
+        jobs: 并发请求数
+        dry_run: 只列出需要更新的文件
+
+    Returns:
+        bool: 是否成功（没有需要更新的文件也算成功）
+    """
+    start = time.perf_counter()
+    if not dry_run:
+        recover(root)
+
+    cache_file = root / "config" / CACHE_FILE
+    old_state = load_cache(_state_path(root))
+    old_http = old_state.get("http") or {}
+    client = HttpClient()
+    try:
+        print(f"Fetching manifests from {base_url} ({jobs} workers)...")
+        try:
+            results = crawl_manifests(client, base_url, old_http, jobs)
+        except Exception as e:
+            print(f"Warning: Failed to fetch root manifest: {e}")
+            return False
+        missing = {
+            child for entry in results.values() for child in entry["children"]
+        } - set(results)
+        if missing:
+            # 缺少某个 manifest 时无法判断哪些文件被删除，不做更新
+            print(f"Warning: {len(missing)} manifests unavailable, update skipped.")
+            return False
+
+        files = remote_files(results, base_url)
+        old_files = {
+            path: info
+            for path, (info, _) in remote_files(
+                {k: v for k, v in old_http.items() if "files" in v}, base_url
+            ).items()
+        }
+        index = LocalIndex(root, old_state.get("local"))
+        changed, removed = plan_update(root, files, old_files, index)
+
+        print(f"{len(files)} files, {len(changed)} changed, {len(removed)} removed")
+        for path in sorted(changed):
+            print(f"  update: {path}")
+        for path in removed:
+            print(f"  remove: {path}")
+        if dry_run:
+            return True
+
+        downloader = Downloader(client, root / UPDATE_DIR / "objects", index)
+        try:
+            objects = downloader.fetch_all(changed, jobs)
+        except (UpdateError, OSError) as e:
+            print(f"Warning: Download failed, resources left unchanged: {e}")
+            return False
+    finally:
+        client.close()
+
+    cache = build_cache(results)
+    for path in removed:
+        index.entries.pop(path, None)
+    state = {"http": build_http_cache(results), "local": index.entries}
+    if changed or removed:
+        swap_in(root, objects, removed, cache, state)
+        # 替换后的文件修改时间变了，下次按新的大小 / 时间重新记录
+        for path in changed:
+            index.entries.pop(path, None)
+            index.sha256(path)
+        state["local"] = index.entries
+    write_cache(cache_file, cache)
+    write_cache(_state_path(root), state)
+
+    print(
+        f"Updated {len(changed)} files ({downloader.downloaded} downloaded, "
+        f"{downloader.reused} reused, {downloader.bytes} bytes), "
+        f"removed {len(removed)}, {client.requests} requests, "
+        f"{time.perf_counter() - start:.2f}s"
+    )
+    return True
+
+
+def make_manifests(root: Path, updated: Optional[int] = None) -> None:
+    """
+    为 root 下的每个目录生成 manifest.json，模拟远程 API 的目录结构
+
+    每个 manifest 列出本目录的文件（含 sha256 和大小）和子目录的 manifest。
+    """
+    updated = int(time.time()) if updated is None else updated
+
+    def write(directory: Path) -> None:
+        rel = directory.relative_to(root).as_posix()
+        prefix = "" if rel == "." else f"{rel}/"
+        manifest = {"updated": updated, "directories": [], "files": []}
+        for child in sorted(directory.iterdir()):
+            if child.is_dir():
+                write(child)
+                manifest["directories"].append(
+                    {
+                        "name": child.name,
+                        "manifest": f"{prefix}{child.name}/manifest.json",
+                    }
+                )
+            elif child.name != "manifest.json":
+                manifest["files"].append(
+                    {
+                        "name": child.name,
+                        "sha256": _sha256_file(child),
+                        "size": child.stat().st_size,
+                    }
+                )
+        with open(directory / "manifest.json", "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    write(root)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="按文件增量更新资源")
+    # 默认更新 install 目录
+    parser.add_argument(
+        "--root",
+        type=Path,
+        default=Path(__file__).parent.parent.parent / "install",
+    )
+    parser.add_argument("--jobs", type=int, default=MAX_WORKERS, help="并发请求数")
+    parser.add_argument("--base-url", default=API_BASE_URL, help="API 地址")
+    parser.add_argument(
+        "--serve", type=Path, help="用本地目录启动测试服务，代替 --base-url"
+    )
+    parser.add_argument("--dry-run", action="store_true", help="只列出需要更新的文件")
+    parser.add_argument(
+        "--make-manifests", type=Path, help="为目录生成 manifest.json 后退出"
+    )
+    args = parser.parse_args()
+
+    if args.make_manifests:
+        make_manifests(args.make_manifests)
+        print(f"Generated manifests under {args.make_manifests}")
+        return
+
+    base_url = args.base_url
+    server = None
+    if args.serve:
+        server, base_url = serve_directory(args.serve)
+    try:
+        success = update_resources(args.root, base_url, args.jobs, args.dry_run)
+    finally:
+        if server is not None:
+            server.shutdown()
+    sys.exit(0 if success else 1)
+
+
+if __name__ == "__main__":
+    main()